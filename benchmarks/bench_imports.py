@@ -0,0 +1,146 @@
+"""
+起動時間（import時間）のベンチマーク・回帰チェック
+
+ログイン画面・認証モジュール・スクレイパーの--helpをそれぞれ新しいPythonプロセスで起動し、
+起動にかかった時間（中央値）と、-X importtimeで計測したimport時間を記録する。
+読み込んではいけない重い依存（pandas・supabaseなど）が読み込まれていたら失敗にする。
+保存したベースラインと比較して閾値以上遅くなっていれば終了コード1を返す。
+
+使い方:
+    # 計測してベースラインを保存
+    python benchmarks/bench_imports.py --save-baseline benchmarks/import_baseline.json
+
+    # ベースラインと比較（20%以上遅くなったら失敗）
+    python benchmarks/bench_imports.py --baseline benchmarks/import_baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 計測対象: 名前 → (Pythonに渡す引数, 読み込まれてはいけないトップレベルのモジュール)
+TARGETS = {
+    "auth": (["-c", "import src.auth.auth"], ("supabase", "dotenv", "streamlit", "pandas")),
+    "login_page": (["-c", "import src.pages.home"], ("supabase", "dotenv", "pandas")),
+    "scraper_help": ([os.path.join("src", "pages", "scraper_facilities.py"), "--help"],
+                     ("supabase", "streamlit", "pandas", "bs4", "requests", "lxml")),
+}
+
+# ベースライン比較の対象（小さいほど良い指標）
+COMPARED_METRICS = ("wall_seconds", "import_seconds")
+
+
+def run_benchmark(targets=None, repeat=5):
+    """各対象の起動時間・import時間・読み込んだモジュールを計測する"""
+    result = {}
+    for name in targets or TARGETS:
+        args, forbidden = TARGETS[name]
+        # 1回目は.pycの作成を含むため計測に使わない
+        _run(args)
+        wall_times = [_run(args)[0] for _ in range(repeat)]
+        _, stderr = _run(args, importtime=True)
+        timings = _parse_importtime(stderr)
+        loaded = {module.split(".")[0] for module in timings}
+        result[name] = {
+            "wall_seconds": statistics.median(wall_times),
+            # トップレベルのimport（字下げなし）の累積時間の合計
+            "import_seconds": sum(cumulative for cumulative, top_level in timings.values() if top_level) / 1e6,
+            "modules": len(timings),
+            "forbidden_modules": sorted(module for module in forbidden if module in loaded),
+            "slowest": sorted(((module, cumulative / 1e6) for module, (cumulative, top_level) in timings.items() if top_level),
+                              key=lambda item: item[1], reverse=True)[:5],
+        }
+    return result
+
+
+def compare_with_baseline(result, baseline, threshold):
+    """ベースラインよりthreshold（割合）以上悪化した指標のリストを返す"""
+    regressions = []
+    for name, metrics in result.items():
+        for metric in COMPARED_METRICS:
+            before = baseline.get(name, {}).get(metric)
+            after = metrics.get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before - 1.0
+            if ratio > threshold:
+                regressions.append((f"{name}.{metric}", before, after, ratio))
+    return regressions
+
+
+def _run(args, importtime=False):
+    """新しいプロセスで実行し、(経過時間, 標準エラー出力) を返す"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    env = dict(os.environ, PYTHONPATH=root_path)
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=root_path, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise SystemExit(f"起動に失敗しました: {' '.join(args)}\n{completed.stderr[-2000:]}")
+    return elapsed, completed.stderr
+
+
+def _parse_importtime(stderr):
+    """-X importtimeの出力を {モジュール名: (累積時間[μs], トップレベルか)} にする"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(cumulative), not name[1:].startswith(" "))
+    return timings
+
+
+def _print_result(result):
+    for name, metrics in result.items():
+        print(f"{name}: 起動 {metrics['wall_seconds'] * 1000:.0f} ms / import {metrics['import_seconds'] * 1000:.0f} ms"
+              f"（{metrics['modules']}モジュール）")
+        for module, seconds in metrics["slowest"]:
+            print(f"  - {module}: {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='起動時間（import時間）のベンチマーク')
+    parser.add_argument('--target', action='append', choices=tuple(TARGETS), help='計測する対象（複数指定可、デフォルト: すべて）')
+    parser.add_argument('--repeat', type=int, default=5, help='繰り返し回数（中央値を採用）')
+    parser.add_argument('--baseline', help='比較するベースラインのJSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='許容する悪化の割合（デフォルト: 0.2 = 20%%）')
+    parser.add_argument('--save-baseline', help='計測結果をベースラインとして保存するパス')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+
+    args = parser.parse_args()
+
+    result = run_benchmark(args.target, repeat=args.repeat)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        _print_result(result)
+
+    failed = False
+    for name, metrics in result.items():
+        if metrics["forbidden_modules"]:
+            failed = True
+            print(f"エラー: {name}で重い依存が読み込まれています: {', '.join(metrics['forbidden_modules'])}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"ベースラインを{args.save_baseline}に保存しました")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(result, baseline, args.threshold)
+        for metric, before, after, ratio in regressions:
+            print(f"性能低下: {metric} {before:.4g} → {after:.4g}（+{ratio * 100:.0f}%）")
+        if regressions:
+            failed = True
+        else:
+            print(f"ベースラインからの悪化はありません（閾値 {args.threshold * 100:.0f}%）")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,317 @@
+"""
+スクレイパーのベンチマーク・回帰チェック
+
+保存済みの一覧ページHTML（フィクスチャ）だけを使い、ネットワークなしで
+fetch / parse / extract / persist の各段階の処理時間、パースのスループット（件/秒）、
+ピークメモリを計測する。persistはDBライター（SupabaseBatchWriter）のバッチ化とリクエスト本文のJSON化までで、
+Supabaseへの通信時間は含まない。保存したベースラインと比較して閾値以上遅くなっていれば終了コード1を返す。
+
+使い方:
+    # フィクスチャを記録（実際にサイトへアクセスする）
+    python benchmarks/bench_scraper.py record --ward 中央区 --ward 世田谷区
+
+    # 計測してベースラインを保存
+    python benchmarks/bench_scraper.py run --save-baseline benchmarks/baseline.json
+
+    # ベースラインと比較（20%以上遅くなったら失敗）
+    python benchmarks/bench_scraper.py run --baseline benchmarks/baseline.json --threshold 0.2
+
+    benchmarks/fixtures には一覧ページの構造をまねて作った合成HTML（中央区の3ページと崩れたHTMLの例）を、
+    benchmarks/baseline.json にはそのフィクスチャでの計測値をコミットしてある（計測環境が変わったら--save-baselineで取り直す）。
+    fixtures/expected.json は現在の行の形（building_id・detail_urlを含む）で書いた期待値で、
+    この2列を除いた値は変更前のスクレイパーの抽出結果と一致することを確認済み
+
+    # 各パーサーの抽出結果がフィクスチャの期待値（expected.json）と一致するか確認
+    python benchmarks/bench_scraper.py check
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# プロジェクトのルートパスを動的に計算
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root_path)
+
+from src.scraper.db_writer import SupabaseBatchWriter
+from src.scraper.extract import extract_price_range, extract_size_range
+from src.scraper.parsers import EXACT_BACKENDS, PARSER_BACKENDS, parse_listing_page, resolve_backend, verify_backends
+
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+MANIFEST_NAME = "manifest.json"
+# フィクスチャごとの抽出結果の期待値 {"properties", "next_url", "element_count"}
+EXPECTED_NAME = "expected.json"
+
+# ベースライン比較の対象（小さいほど良い指標）
+COMPARED_METRICS = ("fetch_seconds", "parse_seconds", "extract_seconds", "persist_seconds", "peak_memory_bytes")
+
+
+def record_fixtures(ward_names, fixture_dir, max_pages=None):
+    """指定した区の一覧ページを全ページ取得してフィクスチャとして保存する"""
+    from src.pages.scraper_facilities import MAX_LISTING_PAGES, REGIONS, fetch_page_html
+    from src.scraper.regions import listing_url
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    manifest = _load_manifest(fixture_dir, missing_ok=True)
+    pages = [page for page in manifest["pages"] if page["ward"] not in ward_names]
+    expected = _load_expected(fixture_dir)
+
+    for ward_name in ward_names:
+        region = REGIONS[ward_name]
+        url = listing_url(region)
+        visited = set()
+        while url and url not in visited and len(visited) < (max_pages or MAX_LISTING_PAGES):
+            visited.add(url)
+            html = fetch_page_html(url)
+            if html is None:
+                break
+            filename = f"{region.slug}-{len(visited)}.html"
+            with open(os.path.join(fixture_dir, filename), "w", encoding="utf-8") as f:
+                f.write(html)
+            pages.append({"ward": ward_name, "url": url, "file": filename})
+            print(f"{ward_name}: {url} を {filename} に保存しました")
+            # 期待値はデフォルトのバックエンド（bs4 = 従来の抽出処理と同じ結果）で記録する
+            page = parse_listing_page(html, url)
+            expected[filename] = {"properties": page.properties, "next_url": page.next_url, "element_count": page.element_count}
+            url = page.next_url
+            time.sleep(2)
+
+    manifest["pages"] = pages
+    with open(os.path.join(fixture_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(fixture_dir, EXPECTED_NAME), "w", encoding="utf-8") as f:
+        json.dump(expected, f, ensure_ascii=False, indent=1)
+
+
+def run_benchmark(fixture_dir, backend=None, repeat=5):
+    """フィクスチャに対して各段階を計測し、結果のdictを返す"""
+    manifest = _load_manifest(fixture_dir)
+    if not manifest["pages"]:
+        raise SystemExit(f"フィクスチャがありません: {fixture_dir}（recordで記録してください）")
+    backend = resolve_backend(backend)
+
+    fetch_times, parse_times, extract_times, persist_times = [], [], [], []
+    facility_count = 0
+    for _ in range(repeat):
+        # fetch: フィクスチャの読み込み（ネットワークの代わり）
+        started = time.perf_counter()
+        pages = [(page["url"], _read_fixture(fixture_dir, page)) for page in manifest["pages"]]
+        fetch_times.append(time.perf_counter() - started)
+
+        # parse: HTMLの解析と物件データの抽出
+        started = time.perf_counter()
+        properties = []
+        for url, html in pages:
+            properties.extend(parse_listing_page(html, url, backend=backend).properties)
+        parse_times.append(time.perf_counter() - started)
+        facility_count = len(properties)
+
+        # extract: 価格・広さテキストの数値化
+        price_texts, size_texts = _collect_raw_texts(pages)
+        started = time.perf_counter()
+        for text in price_texts:
+            extract_price_range(text)
+        for text in size_texts:
+            extract_size_range(text)
+        extract_times.append(time.perf_counter() - started)
+
+        # persist: DBライターでのバッチ書き込み（通信の代わりにリクエスト本文をJSON化するだけのクライアント）
+        writer = SupabaseBatchWriter(client=_MemoryClient())
+        started = time.perf_counter()
+        writer.add_many(properties)
+        writer.flush()
+        persist_times.append(time.perf_counter() - started)
+
+    parse_seconds = statistics.median(parse_times)
+    return {
+        "backend": backend,
+        "pages": len(manifest["pages"]),
+        "facilities": facility_count,
+        "fetch_seconds": statistics.median(fetch_times),
+        "parse_seconds": parse_seconds,
+        "extract_seconds": statistics.median(extract_times),
+        "persist_seconds": statistics.median(persist_times),
+        "facilities_per_second": facility_count / parse_seconds if parse_seconds else 0.0,
+        "peak_memory_bytes": _measure_peak_memory(pages, backend),
+        "parser_mismatches": check_backends(fixture_dir),
+    }
+
+
+def compare_with_baseline(result, baseline, threshold):
+    """ベースラインよりthreshold（割合）以上悪化した指標のリストを返す"""
+    regressions = []
+    for metric in COMPARED_METRICS:
+        before = baseline.get(metric)
+        after = result.get(metric)
+        if not before or after is None:
+            continue
+        ratio = after / before - 1.0
+        if ratio > threshold:
+            regressions.append((metric, before, after, ratio))
+    return regressions
+
+
+def _collect_raw_texts(pages):
+    """価格・広さの生テキストを集める（計測対象外の前処理）"""
+    from bs4 import BeautifulSoup
+
+    price_texts, size_texts = [], []
+    for _, html in pages:
+        soup = BeautifulSoup(html, "html.parser")
+        price_texts.extend(span.text.strip() for span in soup.select("div.spec dl.fee dd span"))
+        size_texts.extend(span.text.strip() for span in soup.select("div.spec dl.breadth dd span"))
+    return price_texts, size_texts
+
+
+def _measure_peak_memory(pages, backend):
+    # tracemallocはPython側の確保のみを数える（lxml/libxml2のC側の確保は含まない）
+    tracemalloc.start()
+    try:
+        for url, html in pages:
+            parse_listing_page(html, url, backend=backend)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def check_backends(fixture_dir, backends=None):
+    """
+    各バックエンドの抽出結果がフィクスチャの期待値と一致するか確認し、一致しないページのリストを返す
+    各要素は {"file", "url", "backend", "exact"}。exactがTrueのバックエンド（bs4）の不一致は回帰として扱う
+    """
+    manifest = _load_manifest(fixture_dir)
+    expected = _load_expected(fixture_dir)
+    mismatches = []
+    for page in manifest["pages"]:
+        if page["file"] not in expected:
+            continue
+        html = _read_fixture(fixture_dir, page)
+        for backend in verify_backends(html, page["url"], expected=expected[page["file"]], backends=backends):
+            mismatches.append({"file": page["file"], "url": page["url"], "backend": backend, "exact": backend in EXACT_BACKENDS})
+    return mismatches
+
+
+def _report_mismatches(mismatches):
+    """不一致を表示し、回帰（exactなバックエンドの不一致）があればTrueを返す"""
+    failed = False
+    for mismatch in mismatches:
+        if mismatch["exact"]:
+            failed = True
+            print(f"エラー: {mismatch['backend']}の抽出結果が期待値と一致しません: {mismatch['file']}（{mismatch['url']}）")
+        else:
+            print(f"注意: {mismatch['backend']}の抽出結果が期待値と異なります: {mismatch['file']}（{mismatch['url']}）")
+    return failed
+
+
+def _load_manifest(fixture_dir, missing_ok=False):
+    path = os.path.join(fixture_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        if missing_ok:
+            return {"pages": []}
+        raise SystemExit(f"フィクスチャがありません: {path}（recordで記録してください）")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_expected(fixture_dir):
+    path = os.path.join(fixture_dir, EXPECTED_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_fixture(fixture_dir, page):
+    with open(os.path.join(fixture_dir, page["file"]), encoding="utf-8") as f:
+        return f.read()
+
+
+class _MemoryClient:
+    """Supabaseクライアントの代わりに、upsertする行をJSON化して件数だけ数えるクライアント"""
+
+    def __init__(self):
+        self.rows = 0
+        self.payload_bytes = 0
+
+    def table(self, table_name):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.payload_bytes += len(json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8"))
+        self.rows += len(rows)
+        return self
+
+    def execute(self):
+        return self
+
+
+def _print_result(result):
+    print(f"バックエンド: {result['backend']} / {result['pages']}ページ / {result['facilities']}件")
+    print(f"- fetch:   {result['fetch_seconds'] * 1000:.1f} ms")
+    print(f"- parse:   {result['parse_seconds'] * 1000:.1f} ms（{result['facilities_per_second']:.0f}件/秒）")
+    print(f"- extract: {result['extract_seconds'] * 1000:.1f} ms")
+    print(f"- persist: {result['persist_seconds'] * 1000:.1f} ms（DBライター、通信なし）")
+    print(f"- ピークメモリ: {result['peak_memory_bytes'] / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='スクレイパーのベンチマーク')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR, help='フィクスチャのディレクトリ')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='一覧ページを取得してフィクスチャに保存')
+    record_parser.add_argument('--ward', action='append', required=True, help='記録する区（複数指定可）')
+    record_parser.add_argument('--max-pages', type=int, help='区ごとの最大ページ数')
+
+    check_parser = subparsers.add_parser('check', help='各パーサーの抽出結果をフィクスチャの期待値と照合')
+    check_parser.add_argument('--parser', action='append', choices=PARSER_BACKENDS, help='照合するパーサー（複数指定可、デフォルト: 使えるものすべて）')
+
+    run_parser = subparsers.add_parser('run', help='フィクスチャに対して計測')
+    run_parser.add_argument('--parser', choices=('auto',) + PARSER_BACKENDS, default='auto', help='計測するパーサー')
+    run_parser.add_argument('--repeat', type=int, default=5, help='繰り返し回数（中央値を採用）')
+    run_parser.add_argument('--baseline', help='比較するベースラインのJSON')
+    run_parser.add_argument('--threshold', type=float, default=0.2, help='許容する悪化の割合（デフォルト: 0.2 = 20%%）')
+    run_parser.add_argument('--save-baseline', help='計測結果をベースラインとして保存するパス')
+    run_parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record_fixtures(args.ward, args.fixtures, max_pages=args.max_pages)
+        sys.exit(0)
+
+    if args.command == 'check':
+        mismatches = check_backends(args.fixtures, backends=args.parser)
+        failed = _report_mismatches(mismatches)
+        if not mismatches:
+            print("すべてのパーサーの抽出結果が期待値と一致しました")
+        sys.exit(1 if failed else 0)
+
+    result = run_benchmark(args.fixtures, backend=args.parser, repeat=args.repeat)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        _print_result(result)
+
+    failed = _report_mismatches(result["parser_mismatches"])
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"ベースラインを{args.save_baseline}に保存しました")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(result, baseline, args.threshold)
+        for metric, before, after, ratio in regressions:
+            print(f"性能低下: {metric} {before:.4g} → {after:.4g}（+{ratio * 100:.0f}%）")
+        if regressions:
+            failed = True
+        else:
+            print(f"ベースラインからの悪化はありません（閾値 {args.threshold * 100:.0f}%）")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,149 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# 集計結果（マテリアライズした集計テーブル）の保存先（SnapshotStoreのルート直下）
+# "_"で始まるディレクトリはpyarrowのデータセット探索の対象外になる
+SUMMARY_DIR = "_summaries"
+MANIFEST_NAME = "manifest.json"
+
+# 集計テーブル
+#   ward_daily:      日・区ごとの物件数・賃料・単価・空室率
+#   size_band_daily: 日・区・面積帯ごとの物件数と構成比
+#   supply_demand:   町丁目ごとの世帯数と物件数・面積の需給（supply_demand.pyで作成）
+SUMMARY_TABLES = ("ward_daily", "size_band_daily", "supply_demand")
+
+# 全区合計の行の区名
+ALL_WARDS = "全体"
+
+# 面積帯（㎡、min_sizeで判定。右端を含まない）
+SIZE_BAND_EDGES = [0, 1, 2, 3, 5, 10, np.inf]
+SIZE_BAND_LABELS = ["〜1㎡", "1〜2㎡", "2〜3㎡", "3〜5㎡", "5〜10㎡", "10㎡〜"]
+
+# 集計に使う列
+SOURCE_COLUMNS = ["building_id", "min_price", "min_size", "status", "scrape_date", "ward"]
+
+
+def compute_area_stats(df):
+    """
+    物件スナップショットのDataFrameからエリア指標を計算する
+    戻り値は {"ward_daily": DataFrame, "size_band_daily": DataFrame}
+    賃料は各物件の最低賃料（min_price）、単価はmin_price / min_sizeで計算する
+    """
+    df = _prepare(df)
+
+    # 区ごとの行に全区合計の行を加える
+    both = pd.concat([df, df.assign(ward=ALL_WARDS)], ignore_index=True)
+
+    grouped = both.groupby(["scrape_date", "ward"], observed=True)
+    ward_daily = grouped.agg(
+        facility_count=("building_id", "size"),
+        mean_price=("price", "mean"),
+        median_price=("price", "median"),
+        mean_price_per_sqm=("price_per_sqm", "mean"),
+        median_price_per_sqm=("price_per_sqm", "median"),
+        vacancy_rate=("is_vacant", "mean"),
+    ).reset_index().sort_values(["ward", "scrape_date"], ignore_index=True)
+    # 空室率の推移（前回のスクレイピング日との差）
+    ward_daily["vacancy_rate_change"] = ward_daily.groupby("ward")["vacancy_rate"].diff()
+
+    band_grouped = both.groupby(["scrape_date", "ward", "size_band"], observed=True)
+    size_band_daily = band_grouped.agg(
+        facility_count=("building_id", "size"),
+        median_price=("price", "median"),
+        median_price_per_sqm=("price_per_sqm", "median"),
+    ).reset_index()
+    totals = size_band_daily.groupby(["scrape_date", "ward"])["facility_count"].transform("sum")
+    size_band_daily["share"] = size_band_daily["facility_count"] / totals
+
+    return {"ward_daily": ward_daily, "size_band_daily": size_band_daily}
+
+
+def _prepare(df):
+    df = df.loc[:, [column for column in SOURCE_COLUMNS if column in df.columns]].copy()
+    df["scrape_date"] = df["scrape_date"].astype(str)
+    df["ward"] = df["ward"].astype(str)
+
+    # 同じ日に同じ区を再実行した場合の重複を除く
+    df = df.drop_duplicates(["scrape_date", "ward", "building_id"], keep="last")
+
+    price = pd.to_numeric(df["min_price"], errors="coerce").astype(float)
+    size = pd.to_numeric(df["min_size"], errors="coerce").astype(float)
+    df["price"] = price.where(price > 0)
+    df["price_per_sqm"] = (price / size).where((price > 0) & (size > 0))
+    df["size_band"] = pd.cut(size.where(size > 0), SIZE_BAND_EDGES, right=False, labels=SIZE_BAND_LABELS)
+
+    # 空室状況がない物件（一覧ページのみの取得）は空室率の計算から除く
+    status = df["status"].astype(object) if "status" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    df["is_vacant"] = np.where(status.isna(), np.nan, (status == "空室").astype(float))
+    return df
+
+
+def refresh_area_stats(store, dates=None):
+    """
+    SnapshotStoreの新しいスクレイピング日の分だけ集計して集計テーブルを更新する
+    datesを指定した場合はその日付を再集計する（スナップショットのない日付は飛ばす）。更新後のマニフェストを返す
+    """
+    summary_dir = os.path.join(store.root, SUMMARY_DIR)
+    manifest = load_manifest(store.root)
+    done = set(manifest.get("dates", []))
+    target_dates = sorted(set(dates) if dates else set(store.dates()) - done)
+    if not target_dates:
+        return manifest
+
+    # 空室率の推移は前日との差なので、直前の集計済みの日も含めて計算する
+    previous = [d for d in sorted(done) if d < target_dates[0]][-1:]
+    snapshot = store.read(columns=SOURCE_COLUMNS, start_date=(previous or target_dates)[0], end_date=target_dates[-1])
+    snapshot = snapshot[snapshot["scrape_date"].astype(str).isin(set(target_dates) | set(previous))]
+    # データのない日付は集計済みとして記録しない（後からスナップショットが書き込まれたときに集計する）
+    present = set(snapshot["scrape_date"].astype(str))
+    target_dates = [d for d in target_dates if d in present]
+    if not target_dates:
+        return manifest
+    computed = compute_area_stats(snapshot)
+
+    os.makedirs(summary_dir, exist_ok=True)
+    for table, fresh in computed.items():
+        fresh = fresh[fresh["scrape_date"].isin(target_dates)]
+        path = os.path.join(summary_dir, f"{table}.parquet")
+        if os.path.exists(path):
+            existing = pd.read_parquet(path)
+            existing = existing[~existing["scrape_date"].isin(target_dates)]
+            fresh = pd.concat([existing, fresh], ignore_index=True)
+        fresh = fresh.sort_values(["ward", "scrape_date"], ignore_index=True)
+        fresh.to_parquet(path, index=False)
+
+    return update_manifest(store.root, dates=sorted(done | set(target_dates)))
+
+
+def update_manifest(root, **fields):
+    """マニフェストの項目を更新し、versionを新しくする（ダッシュボードのキャッシュが読み直される）"""
+    manifest = load_manifest(root)
+    manifest.update(fields)
+    manifest["version"] = datetime.datetime.now(datetime.UTC).isoformat()
+    summary_dir = os.path.join(root, SUMMARY_DIR)
+    os.makedirs(summary_dir, exist_ok=True)
+    with open(os.path.join(summary_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def load_manifest(root):
+    path = os.path.join(root, SUMMARY_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"dates": [], "version": None}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_summary(root, table):
+    """マテリアライズ済みの集計テーブルを読み込む（未作成なら空のDataFrame）"""
+    if table not in SUMMARY_TABLES:
+        raise ValueError(f"不明な集計テーブルです: {table}")
+    path = os.path.join(root, SUMMARY_DIR, f"{table}.parquet")
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_parquet(path)
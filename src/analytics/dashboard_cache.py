@@ -0,0 +1,76 @@
+import streamlit as st
+
+from src.analytics.area_stats import load_manifest, read_summary
+
+# 集計テーブルのキャッシュ保持時間（秒）
+CACHE_TTL_SECONDS = 60 * 60
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def _load_summary(root, table, version):
+    # versionはキャッシュキーにだけ使う（新しいスクレイピングが集計されると別のキーになる）
+    return read_summary(root, table)
+
+
+def load_area_stats(root, table="ward_daily"):
+    """
+    ダッシュボード用に集計テーブルを返す
+    集計済みテーブルを読むだけなので、物件数が増えても表示時間は変わらない。
+    refresh_area_statsで集計が更新されるとマニフェストのversionが変わり、自動的に読み直す
+    """
+    return _load_summary(root, table, load_manifest(root).get("version"))
+
+
+def invalidate_area_stats():
+    """集計テーブルのキャッシュを明示的に破棄する"""
+    _load_summary.clear()
+
+
+def load_supply_demand(root):
+    """
+    地図表示用の需給グリッド（町丁目ごとの世帯数・物件数・面積）を返す
+    build_supply_demand_gridで作成済みのテーブルを読むだけで、表示のたびに再計算しない
+    """
+    return _load_summary(root, "supply_demand", load_manifest(root).get("version"))
+
+
+@st.cache_resource
+def get_facility_cache(path=None):
+    """
+    ダッシュボードで共有する物件データのローカルキャッシュ（LocalFacilityCache）を返す
+    物件・履歴の読み込みはSupabaseではなくこのキャッシュから行う
+    """
+    from src.storage.local_cache import DEFAULT_CACHE_PATH, LocalFacilityCache
+
+    return LocalFacilityCache(path or DEFAULT_CACHE_PATH)
+
+
+@st.cache_resource(show_spinner=False)
+def _load_facility_columns(root, scrape_date):
+    from src.storage.snapshot_store import SnapshotStore
+
+    return SnapshotStore(root).read_columns(start_date=scrape_date, end_date=scrape_date)
+
+
+def load_latest_facilities(root):
+    """
+    最新のスクレイピング日の物件データをFacilityColumnsで返す（複数エリア比較用）
+    スクレイピング日ごとに1回だけ読み込み、候補地を変えて比較し直すときは読み込まない
+    """
+    from src.storage.snapshot_store import SnapshotStore
+
+    dates = SnapshotStore(root).dates()
+    if not dates:
+        return None
+    return _load_facility_columns(root, dates[-1])
+
+
+@st.cache_resource
+def get_report_queue(root, cache_dir=None, geocode_table=None):
+    """
+    ダッシュボードで共有するPDFレポートのジョブキュー（ReportJobQueue）を返す
+    レポートの作成はワーカープロセスで行い、画面はジョブの状態を確認するだけにする
+    """
+    from src.reports.jobs import DEFAULT_REPORT_DIR, ReportJobQueue
+
+    return ReportJobQueue(root, cache_dir=cache_dir or DEFAULT_REPORT_DIR, geocode_table=geocode_table)
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from src.geo.spatial import FacilityIndex
+from src.scraper.facility import FLAG_FIELDS
+from src.storage.facility_columns import FacilityColumns
+
+# 候補地ごとの半径のデフォルト（km）
+DEFAULT_RADIUS_KM = 1.0
+
+# 比較表の列（候補地の情報 + 指標）
+SITE_COLUMNS = ["name", "address", "latitude", "longitude", "geocode_level", "radius_km"]
+METRIC_COLUMNS = (
+    ["facility_count", "priced_count", "median_price_per_sqm"]
+    + [f"{flag}_share" for flag in FLAG_FIELDS]
+    + ["indoor_share", "outdoor_share"]
+)
+
+
+def compare_sites(facilities, sites, radii=(DEFAULT_RADIUS_KM,), geocoder=None):
+    """
+    複数の候補地について、半径内の物件の指標をまとめて計算した比較表を返す
+
+    facilities: 物件データ（FacilityColumns、DataFrame、または辞書のリスト）。
+        1日分のスナップショットを想定し、同じ物件IDが複数あれば最後の行を使う
+    sites: 候補地のリスト。各要素は住所の文字列、(緯度, 経度) のタプル、または
+        {"name", "address", "latitude", "longitude", "radius_km"} の一部を持つ辞書
+    radii: radius_kmを持たない候補地に使う半径（km）。複数指定すると候補地 × 半径の行になる
+    geocoder: 住所だけの候補地に座標を付けるGeocoder
+
+    指標は物件数、単価（min_price / min_size）のある物件数と単価の中央値、
+    特徴フラグ（has_*）を持つ物件の割合、屋内・屋外の割合。
+    半径内の物件は物件の空間インデックス（FacilityIndex）で探すため、数百件の候補地でも数秒で終わる。
+    座標が分からない候補地は表に含めず、attrs["unresolved_sites"]に入れる
+    """
+    site_table = resolve_sites(sites, radii, geocoder)
+    resolved = site_table["latitude"].notna() & site_table["longitude"].notna()
+    unresolved = site_table.loc[~resolved, ["name", "address"]].to_dict("records")
+    site_table = site_table[resolved].reset_index(drop=True)
+
+    metrics = _compute_metrics(
+        _facility_arrays(facilities),
+        site_table["latitude"].to_numpy(dtype=float),
+        site_table["longitude"].to_numpy(dtype=float),
+        site_table["radius_km"].to_numpy(dtype=float),
+    )
+    result = pd.concat([site_table, pd.DataFrame(metrics, columns=METRIC_COLUMNS)], axis=1)
+    result["facility_count"] = result["facility_count"].astype(int)
+    result["priced_count"] = result["priced_count"].astype(int)
+    result.attrs["unresolved_sites"] = unresolved
+    return result
+
+
+def resolve_sites(sites, radii=(DEFAULT_RADIUS_KM,), geocoder=None):
+    """
+    候補地のリストを SITE_COLUMNS の列を持つDataFrameにそろえる
+    住所だけの候補地はgeocoderで座標を付ける（付けられなければ緯度経度は欠損のまま）
+    """
+    if isinstance(sites, pd.DataFrame):
+        sites = sites.to_dict("records")
+    radii = [radii] if np.isscalar(radii) else list(radii)
+
+    rows = []
+    for number, site in enumerate(sites, start=1):
+        if isinstance(site, str):
+            site = {"address": site}
+        elif isinstance(site, (tuple, list)):
+            site = {"latitude": site[0], "longitude": site[1]}
+        address = site.get("address") or None
+        latitude = _to_float(site.get("latitude"))
+        longitude = _to_float(site.get("longitude"))
+        level = "coordinates" if latitude is not None and longitude is not None else None
+        if level is None and address and geocoder is not None:
+            point = geocoder.geocode(address)
+            if point:
+                latitude, longitude, level = point
+        name = site.get("name") or address or f"候補地{number}"
+
+        site_radius = _to_float(site.get("radius_km"))
+        for radius in [site_radius] if site_radius is not None else radii:
+            rows.append({
+                "name": name,
+                "address": address,
+                "latitude": latitude,
+                "longitude": longitude,
+                "geocode_level": level,
+                "radius_km": float(radius),
+            })
+    return pd.DataFrame(rows, columns=SITE_COLUMNS).astype({"latitude": float, "longitude": float, "radius_km": float})
+
+
+def _facility_arrays(facilities):
+    """物件データを距離計算・集計に使う配列にする（座標のない物件は除く）"""
+    if isinstance(facilities, pd.DataFrame):
+        columns = FacilityColumns.from_pandas(facilities)
+    elif isinstance(facilities, FacilityColumns):
+        columns = facilities
+    else:
+        columns = FacilityColumns.from_records(list(facilities))
+
+    # 同じ物件IDは最後の行だけを使う（IDのない行はそのまま残す）
+    ids = columns.codes["building_id"]
+    reversed_ids = ids[::-1]
+    _, first_from_end = np.unique(reversed_ids, return_index=True)
+    keep = np.zeros(len(ids), dtype=bool)
+    keep[len(ids) - 1 - first_from_end] = True
+    keep |= ids < 0
+
+    latitudes = columns.numeric["latitude"]
+    longitudes = columns.numeric["longitude"]
+    keep &= ~(np.isnan(latitudes) | np.isnan(longitudes))
+
+    price = columns.numeric["min_price"].astype(float)
+    size = columns.numeric["min_size"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_per_sqm = np.where((price > 0) & (size > 0), price / size, np.nan)
+
+    location_type = np.asarray(columns.string("location_type"), dtype=object)
+    # 割合の分子（特徴フラグ + 屋内 + 屋外）を1つの行列にまとめ、候補地ごとに半径内の行を合計する
+    shares = np.column_stack(
+        [columns.has(flag) for flag in FLAG_FIELDS] + [location_type == "屋内", location_type == "屋外"]
+    ).astype(np.float32)
+    return {
+        "latitude": latitudes[keep],
+        "longitude": longitudes[keep],
+        "price_per_sqm": price_per_sqm[keep],
+        "shares": shares[keep],
+    }
+
+
+def _compute_metrics(arrays, site_latitudes, site_longitudes, radii):
+    """候補地ごとの指標を METRIC_COLUMNS の順に並べた配列（候補地数 × 列数）を返す"""
+    metrics = np.full((len(site_latitudes), len(METRIC_COLUMNS)), np.nan)
+    metrics[:, :2] = 0
+    if len(site_latitudes) == 0 or len(arrays["latitude"]) == 0:
+        return metrics
+
+    # インデックスは全候補地で共有し、各候補地では円に重なるセルの物件だけを距離で絞り込む
+    index = FacilityIndex(arrays["latitude"], arrays["longitude"])
+    for site, (latitude, longitude, radius_km) in enumerate(zip(site_latitudes, site_longitudes, radii)):
+        inside, _ = index.query_radius(latitude, longitude, radius_km)
+        if len(inside) == 0:
+            continue
+        price_per_sqm = arrays["price_per_sqm"][inside]
+        priced = price_per_sqm[~np.isnan(price_per_sqm)]
+        metrics[site, 0] = len(inside)
+        metrics[site, 1] = len(priced)
+        # 単価のある物件がなければ中央値はNaNのまま
+        if len(priced):
+            metrics[site, 2] = np.median(priced)
+        metrics[site, 3:] = arrays["shares"][inside].sum(axis=0) / len(inside)
+    return metrics
+
+
+def _to_float(value):
+    try:
+        value = float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+    return None if value is None or np.isnan(value) else value
@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.area_stats import SUMMARY_DIR, update_manifest
+from src.geo.geocode import address_keys
+
+SUPPLY_DEMAND_TABLE = "supply_demand"
+
+# 世帯数ファイルの列名の候補（先に見つかったものを使う）
+HOUSEHOLD_COLUMN_CANDIDATES = {
+    "city": ("city", "市区町村名", "CITYNAME"),
+    "town": ("town", "町丁字名", "大字・町名", "町丁目名", "NAME"),
+    "households": ("households", "世帯数", "世帯総数", "一般世帯数"),
+    "area_code": ("area_code", "KEY_CODE", "地域コード"),
+}
+
+
+def load_households(path, columns=None):
+    """
+    町丁目単位の世帯数ファイル（国勢調査 小地域集計など）を読み込む
+    戻り値の列: area_key, area_code, city, town, households
+    columnsで {"city": ..., "town": ..., "households": ..., "area_code": ...} の列名を指定できる
+    区全体・町全体の集計行は、より細かい行がある場合は二重計上を避けるため除く
+    """
+    try:
+        raw = pd.read_csv(path, dtype=str, encoding="utf-8")
+    except UnicodeDecodeError:
+        raw = pd.read_csv(path, dtype=str, encoding="cp932")
+
+    mapping = dict(columns or {})
+    for name, candidates in HOUSEHOLD_COLUMN_CANDIDATES.items():
+        if name not in mapping:
+            mapping[name] = next((c for c in candidates if c in raw.columns), None)
+    missing = [name for name in ("city", "town", "households") if not mapping.get(name)]
+    if missing:
+        raise ValueError(f"世帯数ファイルに必要な列がありません: {', '.join(missing)}")
+
+    df = pd.DataFrame({
+        "area_code": raw[mapping["area_code"]] if mapping.get("area_code") else None,
+        "city": raw[mapping["city"]].fillna(""),
+        "town": raw[mapping["town"]].fillna(""),
+        "households": pd.to_numeric(raw[mapping["households"]].str.replace(",", ""), errors="coerce"),
+    })
+    df = df[(df["town"] != "") & df["households"].notna()]
+
+    # 町丁目のキー（住所の照合と同じ正規化）
+    keys = (df["city"] + df["town"]).map(_most_detailed_key)
+    df = df.assign(area_key=keys.str[1], level=keys.str[0]).dropna(subset=["area_key"])
+
+    # 丁目の行がある町は町全体の行を除く
+    chome_towns = set(df.loc[df["level"] == "chome", "area_key"].str.replace(r"\d+丁目$", "", regex=True))
+    df = df[~((df["level"] == "town") & df["area_key"].isin(chome_towns))]
+    return df.drop(columns="level").drop_duplicates("area_key").reset_index(drop=True)
+
+
+def _most_detailed_key(address):
+    for level, key in address_keys(address):
+        if level in ("chome", "town"):
+            return (level, key)
+    return (None, None)
+
+
+def build_area_lookup(addresses, area_keys):
+    """
+    住所 → 町丁目キーの対応表を作る（住所の重複はまとめて1回だけ解析する）
+    area_keysに存在するキーのうち最も細かいものを割り当てる
+    """
+    known = set(area_keys)
+    lookup = {}
+    for address in pd.unique(pd.Series(addresses, dtype=object).dropna()):
+        lookup[address] = next((key for level, key in address_keys(address)
+                                if level in ("chome", "town") and key in known), None)
+    return lookup
+
+
+def compute_supply_demand(facilities, households, area_lookup=None, centroids=None):
+    """
+    町丁目ごとの需給指標を計算する
+    facilities: address, min_size, max_size 列を持つ物件データのDataFrame
+    households: load_householdsの戻り値
+    area_lookup: 住所 → 町丁目キー（省略時はbuild_area_lookupで作成）
+    centroids: 町丁目キー → (緯度, 経度)（地図表示用、省略可）
+    戻り値の列: area_key, area_code, city, town, households, facility_count, capacity_sqm,
+                facilities_per_1000_households, sqm_per_household, latitude, longitude
+    capacity_sqmは各物件の最大区画面積（max_size）の合計で、供給量の目安
+    """
+    if area_lookup is None:
+        area_lookup = build_area_lookup(facilities["address"], households["area_key"])
+
+    assigned = pd.DataFrame({
+        "area_key": facilities["address"].map(area_lookup),
+        "capacity_sqm": pd.to_numeric(facilities["max_size"], errors="coerce").fillna(0.0),
+    }).dropna(subset=["area_key"])
+    supply = assigned.groupby("area_key").agg(
+        facility_count=("capacity_sqm", "size"),
+        capacity_sqm=("capacity_sqm", "sum"),
+    )
+
+    grid = households.merge(supply, left_on="area_key", right_index=True, how="left")
+    grid["facility_count"] = grid["facility_count"].fillna(0).astype(int)
+    grid["capacity_sqm"] = grid["capacity_sqm"].fillna(0.0)
+    households_count = grid["households"].where(grid["households"] > 0)
+    grid["facilities_per_1000_households"] = grid["facility_count"] / households_count * 1000
+    grid["sqm_per_household"] = grid["capacity_sqm"] / households_count
+
+    if centroids:
+        points = grid["area_key"].map(centroids)
+        grid["latitude"] = points.map(lambda p: p[0] if isinstance(p, tuple) else np.nan)
+        grid["longitude"] = points.map(lambda p: p[1] if isinstance(p, tuple) else np.nan)
+    else:
+        grid["latitude"] = np.nan
+        grid["longitude"] = np.nan
+
+    grid.attrs["unassigned_facilities"] = int(len(facilities) - len(assigned))
+    return grid
+
+
+def build_supply_demand_grid(store, households_path, scrape_date=None, geocoder=None, columns=None):
+    """
+    SnapshotStoreの指定日（省略時は最新日）の物件から需給グリッドを作り、集計テーブルとして保存する
+    geocoderを渡すと町丁目の代表点を地図表示用の緯度経度として付ける
+    """
+    dates = store.dates()
+    if not dates:
+        raise ValueError("スナップショットがありません")
+    scrape_date = scrape_date or dates[-1]
+
+    households = load_households(households_path, columns=columns)
+    facilities = store.read(columns=["building_id", "address", "max_size"], start_date=scrape_date, end_date=scrape_date)
+    facilities = facilities.drop_duplicates("building_id", keep="last")
+
+    centroids = None
+    if geocoder is not None:
+        centroids = {}
+        for key in households["area_key"]:
+            result = geocoder.geocode(key)
+            if result:
+                centroids[key] = (result[0], result[1])
+
+    grid = compute_supply_demand(facilities, households, centroids=centroids)
+    grid["scrape_date"] = scrape_date
+
+    summary_dir = os.path.join(store.root, SUMMARY_DIR)
+    os.makedirs(summary_dir, exist_ok=True)
+    grid.to_parquet(os.path.join(summary_dir, f"{SUPPLY_DEMAND_TABLE}.parquet"), index=False)
+    update_manifest(store.root, supply_demand_date=scrape_date)
+    return grid
@@ -1,45 +1,236 @@
 import os
-from dotenv import load_dotenv
-import streamlit as st
-from supabase import create_client, Client
 import datetime
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-# .envファイルを読み込む
-load_dotenv()
+if TYPE_CHECKING:
+    from supabase import Client
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# python-dotenvとsupabaseは最初にクライアントを作るときに読み込む
+# （ログイン画面の表示やスクレイパーの--helpでsupabase一式を読み込まないため）
 
-@st.cache_resource
-def get_supabase_client() -> Client:
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+# アクセストークンの有効期限までこの秒数を切っていたら、使う前にその場で更新する
+TOKEN_REFRESH_MARGIN = 60
+
+# 有効期限までこの秒数を切ったら、バックグラウンドで先回りして更新する（画面の応答は待たせない）
+TOKEN_REFRESH_AHEAD = 5 * 60
+
+# ユーザープロフィール（usersテーブルの行）を手元に保持する秒数
+PROFILE_CACHE_TTL = 5 * 60
+
+# アクセストークンごとのクライアントを保持する最大数（古いものから捨てる）
+MAX_AUTHED_CLIENTS = 256
+
+# usersテーブルへの書き込みなど、待たなくてよい処理を実行するスレッド数
+BACKGROUND_WORKERS = 4
+
+_authed_clients = OrderedDict()
+_authed_clients_lock = threading.Lock()
+_profile_cache = {}
+_profile_cache_lock = threading.Lock()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _credentials():
+    from dotenv import load_dotenv
+
+    # .envファイルを読み込む
+    load_dotenv()
+    return os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+
+@lru_cache(maxsize=None)
+def get_supabase_client() -> "Client":
+    """
+    Supabaseクライアントを返す（プロセス内で1つを共有する）
+    Streamlitに依存しないようにst.cache_resourceではなくlru_cacheでキャッシュする。
+    ログインなどのユーザーごとの状態は持たせない（認証はそれぞれ専用のクライアントで行う）
+    """
+    from supabase import create_client
+
+    return create_client(*_credentials())
+
+def _new_client(access_token=None) -> "Client":
+    """
+    セッションを持たないクライアントを作る（トークンの自動更新・保存はしない）
+    access_tokenを渡すとそのユーザーとしてDBにアクセスする（RLSが効く）
+    """
+    from supabase import ClientOptions, create_client
+
+    headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+    options = ClientOptions(headers=headers, auto_refresh_token=False, persist_session=False)
+    return create_client(*_credentials(), options=options)
+
+def _background():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="auth")
+        return _executor
+
+# ========= ログイン・新規登録 ==========
 
 def login(email: str, password: str):
-    supabase = get_supabase_client()
-    result = supabase.auth.sign_in_with_password({"email": email, "password": password})
+    # 共有クライアントでサインインすると全ユーザーの接続がそのユーザーの権限になるため、専用のクライアントを使う
+    result = _new_client().auth.sign_in_with_password({"email": email, "password": password})
     return result
 
 def signup(email: str, password: str):
-    supabase = get_supabase_client()
-    result = supabase.auth.sign_up({"email": email, "password": password})
+    result = _new_client().auth.sign_up({"email": email, "password": password})
 
-    if result.user:  # サインアップ成功時だけDBにも登録する
-        user_id = result.user.id
-        insert_user_to_db(user_id, email)
+    if result.user:  # サインアップ成功時だけDBにも登録する（完了は待たない）
+        upsert_user_async(result.user.id, email, session=session_from_response(result))
 
     return result
 
-def insert_user_to_db(user_id: str, email: str):
-    supabase = get_supabase_client()
+def session_from_response(result):
+    """
+    ログイン・新規登録の結果からst.session_stateに保存するセッション（辞書）を作る
+    メール確認待ちなどでセッションがない場合はNone
+    """
+    if result is None or result.session is None:
+        return None
+    session = result.session
+    expires_at = session.expires_at or (time.time() + (session.expires_in or 0))
+    return {
+        "access_token": session.access_token,
+        "refresh_token": session.refresh_token,
+        "expires_at": float(expires_at),
+        "user": {"id": result.user.id, "email": result.user.email},
+    }
+
+# ========= トークンの更新 ==========
+
+def ensure_fresh_session(session):
+    """
+    セッションのアクセストークンが使える状態であることを確認して返す（sessionの辞書をその場で更新する）
+    - 有効期限までTOKEN_REFRESH_MARGIN秒を切っていれば、その場で更新してから返す
+    - TOKEN_REFRESH_AHEAD秒を切っていれば、バックグラウンドで更新を始めて今のトークンのまま返す
+    更新できなかった場合（リフレッシュトークンの失効など）はNoneを返す（再ログインが必要）
+    """
+    if not session:
+        return None
+    remaining = session["expires_at"] - time.time()
+    if remaining < TOKEN_REFRESH_MARGIN:
+        return session if _refresh_session(session) else None
+    if remaining < TOKEN_REFRESH_AHEAD:
+        refresh_token = session["refresh_token"]
+        with _refreshing_lock:
+            if refresh_token in _refreshing:
+                return session
+            _refreshing.add(refresh_token)
+        _background().submit(_refresh_in_background, session, refresh_token)
+    return session
+
+def _refresh_in_background(session, refresh_token):
+    try:
+        _refresh_session(session)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(refresh_token)
+
+def _refresh_session(session):
+    old_token = session["access_token"]
+    try:
+        result = _new_client().auth.refresh_session(session["refresh_token"])
+    except Exception as e:
+        print(f"アクセストークンの更新に失敗しました: {str(e)}")
+        return False
+    refreshed = session_from_response(result)
+    if refreshed is None:
+        return False
+    session.update(refreshed)
+    forget_session({"access_token": old_token})
+    return True
+
+# ========= ユーザーとしてのDBアクセス ==========
+
+def get_authed_client(session) -> "Client":
+    """
+    ログイン中のユーザーの権限でDBにアクセスするクライアントを返す（RLSが効く）
+    アクセストークンごとにクライアントを使い回し、必要ならトークンを先に更新する。
+    セッションがない・更新できない場合はNone
+    """
+    session = ensure_fresh_session(session)
+    if session is None:
+        return None
+    access_token = session["access_token"]
+    with _authed_clients_lock:
+        client = _authed_clients.get(access_token)
+        if client is not None:
+            _authed_clients.move_to_end(access_token)
+            return client
+    client = _new_client(access_token)
+    with _authed_clients_lock:
+        client = _authed_clients.setdefault(access_token, client)
+        while len(_authed_clients) > MAX_AUTHED_CLIENTS:
+            _authed_clients.popitem(last=False)
+    return client
+
+def forget_session(session):
+    """ログアウト時などに、そのセッションのクライアントを破棄する"""
+    if session:
+        with _authed_clients_lock:
+            _authed_clients.pop(session["access_token"], None)
+
+def get_user_profile(user_id: str, session=None):
+    """
+    usersテーブルのユーザーの行を返す（なければNone）
+    PROFILE_CACHE_TTL秒の間は手元のキャッシュから返し、DBに問い合わせない
+    """
+    now = time.monotonic()
+    with _profile_cache_lock:
+        cached = _profile_cache.get(user_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    supabase = (get_authed_client(session) if session else None) or get_supabase_client()
+    rows = supabase.table("users").select("*").eq("id", user_id).limit(1).execute().data
+    profile = rows[0] if rows else None
+    _cache_profile(user_id, profile)
+    return profile
+
+def _cache_profile(user_id, profile):
+    with _profile_cache_lock:
+        _profile_cache[user_id] = (time.monotonic() + PROFILE_CACHE_TTL, profile)
+
+def insert_user_to_db(user_id: str, email: str, session=None):
+    """usersテーブルにユーザーを登録する（既にあれば何もしない）"""
+    supabase = (get_authed_client(session) if session else None) or get_supabase_client()
     data = {
         "id": user_id,
         "email": email,
-        "created_at": datetime.datetime.utcnow().isoformat()
+        "created_at": datetime.datetime.now(datetime.UTC).isoformat()
     }
-    # データはリストで渡す
-    result = supabase.table("users").insert([data]).execute()
+    # データはリストで渡す。2回目のログインなどで既に行があれば登録日時（created_at）を上書きしないよう何もしない
+    result = supabase.table("users").upsert([data], on_conflict="id", ignore_duplicates=True).execute()
+    if result.data:
+        _cache_profile(user_id, result.data[0])
+    else:
+        # 既存の行は返らないため、次のget_user_profileでDBから読み直す
+        with _profile_cache_lock:
+            _profile_cache.pop(user_id, None)
     return result
 
+def upsert_user_async(user_id: str, email: str, session=None):
+    """
+    insert_user_to_dbをバックグラウンドで実行する（ログイン・新規登録の応答を待たせない）
+    戻り値はFuture。失敗はログに出すだけで呼び出し元には伝えない
+    """
+    future = _background().submit(insert_user_to_db, user_id, email, session)
+    future.add_done_callback(_print_upsert_error)
+    return future
+
+def _print_upsert_error(future):
+    if future.exception() is not None:
+        print(f"usersテーブルへの登録に失敗しました: {str(future.exception())}")
+
 # --- ここから下がテスト用コード ---
 if __name__ == "__main__":
     import getpass
@@ -53,7 +244,7 @@ if __name__ == "__main__":
     if mode == "1":
         result = login(email, password)
         if result.user:
-            insert_user_to_db(result.user.id, result.user.email)
+            insert_user_to_db(result.user.id, result.user.email, session=session_from_response(result))
             print("ログイン成功！ユーザー情報もDBに追加されました。")
         else:
             print("ログイン失敗:", result)
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+
+# 住所の丁目を漢数字から算用数字に変換するための対応表
+_KANJI_DIGITS = {"〇": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+_KANJI_CHOME_RE = re.compile(r"([〇一二三四五六七八九十]+)丁目")
+_PREFECTURE_RE = re.compile(r"^(東京都|北海道|(?:京都|大阪)府|.{2,3}県)")
+# 例: "中央区銀座1丁目2-3", "中央区銀座1-2-3", "世田谷区玉川台"
+_ADDRESS_RE = re.compile(
+    r"^(?P<city>.+?区|.+?市|.+?[町村])(?P<town>[^\d]*)(?:(?P<chome>\d+)(?:丁目-?|-)?(?P<block>\d+)?)?"
+)
+
+# 照合の精度（細かい順）
+GEOCODE_LEVELS = ("block", "chome", "town", "city")
+
+
+def _kanji_to_int(text):
+    """「二十三」のような漢数字を整数に変換する"""
+    if "十" not in text:
+        value = 0
+        for char in text:
+            value = value * 10 + _KANJI_DIGITS[char]
+        return value
+    tens, _, ones = text.partition("十")
+    return (_KANJI_DIGITS[tens] if tens else 1) * 10 + (_KANJI_DIGITS[ones] if ones else 0)
+
+
+def normalize_address(address):
+    """全角・漢数字の丁目・空白・都道府県名の違いを吸収した住所文字列を返す"""
+    text = unicodedata.normalize("NFKC", address or "")
+    text = re.sub(r"\s+", "", text)
+    text = _PREFECTURE_RE.sub("", text)
+    text = _KANJI_CHOME_RE.sub(lambda m: f"{_kanji_to_int(m.group(1))}丁目", text)
+    return text
+
+
+def address_keys(address):
+    """
+    住所から照合用のキーを細かい順に返す
+    例: "東京都中央区銀座一丁目2-3" → [("block", "中央区銀座1丁目2"), ("chome", "中央区銀座1丁目"),
+                                        ("town", "中央区銀座"), ("city", "中央区")]
+    """
+    match = _ADDRESS_RE.match(normalize_address(address))
+    if not match:
+        return []
+    city, town, chome, block = match.group("city", "town", "chome", "block")
+    keys = []
+    if town and chome and block:
+        keys.append(("block", f"{city}{town}{chome}丁目{block}"))
+    if town and chome:
+        keys.append(("chome", f"{city}{town}{chome}丁目"))
+    if town:
+        keys.append(("town", f"{city}{town}"))
+    keys.append(("city", city))
+    return keys
+
+
+class Geocoder:
+    """
+    ローカルの住所→座標テーブルで住所に緯度経度を付与するジオコーダ
+
+    テーブルは次のいずれかの列を持つCSV（UTF-8またはShift_JIS）:
+      - address, latitude, longitude
+      - 国土交通省「位置参照情報」形式: 都道府県名, 市区町村名, 大字・丁目名, (街区符号・地番), 緯度, 経度
+    街区・丁目・町・区の各段階の代表点（平均座標）を作っておき、住所と最も細かく一致した段階の座標を返す。
+    結果は住所ごとにメモリとcache_path（JSON）にキャッシュする。
+    """
+
+    def __init__(self, table_path, cache_path=None):
+        self.table_path = table_path
+        self.cache_path = cache_path
+        self.points = self._load_table(table_path)
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                self.cache = json.load(f)
+
+    def _load_table(self, table_path):
+        import pandas as pd
+
+        try:
+            df = pd.read_csv(table_path, dtype=str, encoding="utf-8")
+        except UnicodeDecodeError:
+            df = pd.read_csv(table_path, dtype=str, encoding="cp932")
+
+        if "address" in df.columns:
+            addresses = df["address"]
+            latitudes, longitudes = df["latitude"], df["longitude"]
+        else:
+            addresses = df["市区町村名"].fillna("") + df["大字・丁目名"].fillna("")
+            if "街区符号・地番" in df.columns:
+                addresses = addresses + df["街区符号・地番"].fillna("").map(lambda x: f"-{x}" if x else "")
+            latitudes, longitudes = df["緯度"], df["経度"]
+
+        rows = []
+        for address, lat, lon in zip(addresses, pd.to_numeric(latitudes), pd.to_numeric(longitudes)):
+            for level, key in address_keys(address):
+                rows.append((level, key, lat, lon))
+
+        # 同じキーに複数の点があれば平均座標を代表点にする
+        points = pd.DataFrame(rows, columns=["level", "key", "latitude", "longitude"]).dropna()
+        centroids = points.groupby(["level", "key"])[["latitude", "longitude"]].mean()
+        table = {level: {} for level in GEOCODE_LEVELS}
+        for (level, key), lat, lon in zip(centroids.index, centroids["latitude"], centroids["longitude"]):
+            table[level][key] = (lat, lon)
+        return table
+
+    def geocode(self, address):
+        """住所の (緯度, 経度, 精度) を返す。一致しなければNone"""
+        if not address:
+            return None
+        with self.lock:
+            if address in self.cache:
+                cached = self.cache[address]
+                return tuple(cached) if cached else None
+
+        result = None
+        for level, key in address_keys(address):
+            point = self.points.get(level, {}).get(key)
+            if point is not None:
+                result = (float(point[0]), float(point[1]), level)
+                break
+
+        with self.lock:
+            self.cache[address] = list(result) if result else None
+            self.dirty = True
+        return result
+
+    def geocode_records(self, records):
+        """物件データにlatitude / longitudeを付与する。座標が付いた件数を返す"""
+        count = 0
+        for record in records:
+            result = self.geocode(record.get("address"))
+            record["latitude"], record["longitude"] = (result[0], result[1]) if result else (None, None)
+            if result:
+                count += 1
+        return count
+
+    def save_cache(self):
+        """キャッシュをcache_pathに書き出す"""
+        if not self.cache_path or not self.dirty:
+            return
+        with self.lock:
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
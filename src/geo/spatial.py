@@ -0,0 +1,124 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# 緯度1度あたりの距離（km）
+KM_PER_DEGREE_LAT = 110.574
+# 経度1度あたりの距離（km、赤道上）
+KM_PER_DEGREE_LON = 111.320
+
+
+def haversine_km(lat, lon, latitudes, longitudes):
+    """1点から配列の各点までの大円距離（km）をまとめて計算する"""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - np.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class FacilityIndex:
+    """
+    物件の緯度経度に対するグリッド型の空間インデックス
+
+    各点を平面（km）に投影してcell_km四方のセルに振り分け、セル番号でソートした配列を持つ。
+    半径検索では円に重なるセルの点だけを取り出して正確な距離で絞り込むため、
+    数千〜数万件でも1回の検索はミリ秒単位で終わる。
+
+    例:
+        index = FacilityIndex.from_records(properties)
+        for record, distance in index.nearby(35.6717, 139.7650, radius_km=1.0):
+            ...
+    """
+
+    def __init__(self, latitudes, longitudes, records=None, cell_km=1.0):
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+
+        self.records = records
+        self.cell_km = float(cell_km)
+        self.size = int(valid.sum())
+        # 座標のない物件はインデックスに入れず、元の位置（records上の添字）だけ覚えておく
+        self.positions = np.flatnonzero(valid)
+        self.latitudes = latitudes[valid]
+        self.longitudes = longitudes[valid]
+
+        # 投影の基準点（全体の中心）
+        self.origin_lat = float(self.latitudes.mean()) if self.size else 0.0
+        self.origin_lon = float(self.longitudes.mean()) if self.size else 0.0
+        self.km_per_lon = KM_PER_DEGREE_LON * np.cos(np.radians(self.origin_lat))
+
+        cell_x, cell_y = self._cells(self.latitudes, self.longitudes)
+        keys = self._cell_keys(cell_x, cell_y)
+        order = np.argsort(keys, kind="stable")
+        self.order = order
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+    @classmethod
+    def from_records(cls, records, cell_km=1.0):
+        """latitude / longitude を持つ物件データのリストから作成する"""
+        records = list(records)
+        latitudes = [_to_float(record.get("latitude")) for record in records]
+        longitudes = [_to_float(record.get("longitude")) for record in records]
+        return cls(latitudes, longitudes, records=records, cell_km=cell_km)
+
+    def _cells(self, latitudes, longitudes):
+        x = (np.asarray(longitudes) - self.origin_lon) * self.km_per_lon
+        y = (np.asarray(latitudes) - self.origin_lat) * KM_PER_DEGREE_LAT
+        return np.floor(x / self.cell_km).astype(np.int64), np.floor(y / self.cell_km).astype(np.int64)
+
+    @staticmethod
+    def _cell_keys(cell_x, cell_y):
+        # 2つのセル番号を1つの整数にまとめる（各32bitに収まる範囲を想定）
+        return (cell_x << 32) + (cell_y & 0xFFFFFFFF)
+
+    def query_radius(self, lat, lon, radius_km):
+        """
+        中心から半径radius_km以内の物件を近い順に返す
+        戻り値は (元の添字の配列, 距離kmの配列)
+        """
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        center_x, center_y = self._cells([lat], [lon])
+        # 投影は基準点の緯度で行っているため、検索点の緯度での経度方向の縮尺の違いを見込んで広めに取る
+        scale_x = self.km_per_lon / (KM_PER_DEGREE_LON * max(np.cos(np.radians(lat)), 1e-6))
+        reach_x = int(np.ceil(radius_km * scale_x / self.cell_km)) + 1
+        reach_y = int(np.ceil(radius_km / self.cell_km)) + 1
+        xs = np.arange(center_x[0] - reach_x, center_x[0] + reach_x + 1)
+        ys = np.arange(center_y[0] - reach_y, center_y[0] + reach_y + 1)
+        wanted = self._cell_keys(np.repeat(xs, len(ys)), np.tile(ys, len(xs)))
+
+        # 存在するセルだけを二分探索で取り出す
+        slots = np.searchsorted(self.cell_keys, wanted)
+        found = slots < len(self.cell_keys)
+        found[found] = self.cell_keys[slots[found]] == wanted[found]
+        slots = slots[found]
+        if len(slots) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = np.concatenate([
+            self.order[start:start + count]
+            for start, count in zip(self.cell_starts[slots], self.cell_counts[slots])
+        ])
+
+        distances = haversine_km(lat, lon, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        nearest = np.argsort(distances, kind="stable")
+        return self.positions[candidates[nearest]], distances[nearest]
+
+    def nearby(self, lat, lon, radius_km):
+        """中心から半径radius_km以内の (物件データ, 距離km) を近い順に返す"""
+        if self.records is None:
+            raise ValueError("物件データなしで作成したインデックスです（query_radiusを使ってください）")
+        indices, distances = self.query_radius(lat, lon, radius_km)
+        return [(self.records[i], float(d)) for i, d in zip(indices, distances)]
+
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
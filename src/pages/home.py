@@ -1,12 +1,15 @@
 import os
 import sys
 
-# プロジェクトのルートパスを動的に計算
-root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-sys.path.insert(0, root_path)
+# パッケージとしてインストールされていない場合（streamlit runで直接実行）はプロジェクトのルートをパスに追加
+try:
+    import src  # noqa: F401
+except ImportError:
+    root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    sys.path.insert(0, root_path)
 
 import streamlit as st
-from src.auth.auth import login, signup, get_supabase_client
+from src.auth.auth import ensure_fresh_session, forget_session, login, session_from_response, signup
 
 def main():
     st.title("認証ページ")
@@ -16,13 +19,18 @@ def main():
         st.session_state.authenticated = False
     if "user" not in st.session_state:
         st.session_state.user = None
+    if "auth_session" not in st.session_state:
+        st.session_state.auth_session = None
     
-    # すでに認証済みの場合
+    # すでに認証済みの場合（アクセストークンは期限が近ければ更新し、更新できなければログアウトする）
     if st.session_state.authenticated:
+        if st.session_state.auth_session and ensure_fresh_session(st.session_state.auth_session) is None:
+            _logout()
+            st.warning("セッションの有効期限が切れました。もう一度ログインしてください。")
+            return
         st.success(f"ログイン中: {st.session_state.user['email']}")
         if st.button("ログアウト"):
-            st.session_state.authenticated = False
-            st.session_state.user = None
+            _logout()
             st.rerun()
         return
     
@@ -45,6 +53,7 @@ def main():
                                 "id": result.user.id,
                                 "email": result.user.email
                             }
+                            st.session_state.auth_session = session_from_response(result)
                             st.success("ログインに成功しました！")
                             st.rerun()
                         else:
@@ -74,6 +83,7 @@ def main():
                                     "id": result.user.id,
                                     "email": result.user.email
                                 }
+                                st.session_state.auth_session = session_from_response(result)
                                 st.success("アカウントが作成されました！")
                                 st.rerun()
                             else:
@@ -83,5 +93,11 @@ def main():
             else:
                 st.warning("すべての項目を入力してください。")
 
+def _logout():
+    forget_session(st.session_state.auth_session)
+    st.session_state.authenticated = False
+    st.session_state.user = None
+    st.session_state.auth_session = None
+
 if __name__ == "__main__":
     main()
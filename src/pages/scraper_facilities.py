@@ -1,63 +1,165 @@
 import os
 import sys
-import requests
-from bs4 import BeautifulSoup
 import datetime
 import time
 import json
 import argparse
-import pandas as pd
-
-# プロジェクトのルートパスを動的に計算
-root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-sys.path.insert(0, root_path)
-
-from src.auth.auth import get_supabase_client
-
-# 東京23区の区名と対応するURL部分
-TOKYO_23_WARDS = {
-    "千代田区": "chiyoda-city",
-    "中央区": "chuo-city",
-    "港区": "minato-city",
-    "新宿区": "shinjuku-city",
-    "文京区": "bunkyo-city",
-    "台東区": "taito-city",
-    "墨田区": "sumida-city",
-    "江東区": "koto-city",
-    "品川区": "shinagawa-city",
-    "目黒区": "meguro-city",
-    "大田区": "ota-city",
-    "世田谷区": "setagaya-city",
-    "渋谷区": "shibuya-city",
-    "中野区": "nakano-city",
-    "杉並区": "suginami-city",
-    "豊島区": "toshima-city",
-    "北区": "kita-city",
-    "荒川区": "arakawa-city",
-    "板橋区": "itabashi-city",
-    "練馬区": "nerima-city",
-    "足立区": "adachi-city",
-    "葛飾区": "katsushika-city",
-    "江戸川区": "edogawa-city"
-}
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# パッケージとしてインストールされていない場合（スクリプトとして直接実行）はプロジェクトのルートをパスに追加
+try:
+    import src  # noqa: F401
+except ImportError:
+    root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    sys.path.insert(0, root_path)
+
+# pandas・BeautifulSoup・Supabaseクライアントは使う関数の中で読み込む（--helpや1区だけの実行を速くする）
+from src.geo.geocode import Geocoder
+from src.scraper.db_writer import SupabaseBatchWriter
+from src.scraper.detail import DEFAULT_DETAIL_WORKERS, DetailEnricher
+from src.scraper.history import IncrementalHistoryWriter
+from src.scraper.http_client import DEFAULT_POOL_SIZE, configure_http, fetch_html, is_offline
+from src.scraper.metrics import ERRORS, FACILITIES, PARSE_FAILURES, PARSE_SECONDS, REGISTRY, STAGE_SECONDS
+from src.scraper.parsers import DEFAULT_BACKEND, PARSER_BACKENDS, parse_listing_page, resolve_backend, scan_next_page_url
+from src.scraper.rate_limit import HostRateLimiter
+from src.scraper.regions import DEFAULT_REGION_SET, LISTING_URL_TEMPLATE, listing_url, load_regions
+from src.scraper.run_queue import DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BACKOFF, DEFAULT_RUN_DB, RunQueue
+
+# スクレイピング対象の地域（configure_regionsで設定、デフォルトは東京23区）
+REGIONS = load_regions(DEFAULT_REGION_SET)
+
+# 一覧ページを辿る最大ページ数（ページネーションのループ対策）
+MAX_LISTING_PAGES = 50
+
+# DB保存時の1バッチあたりの行数
+DEFAULT_BATCH_SIZE = 500
+
+# 並列実行時のデフォルトのリクエスト数/秒（従来の2秒待機に相当）
+DEFAULT_RPS = 0.5
+
+# ホストごとのレートリミッタ（configure_rate_limitで設定）
+_rate_limiter = None
+
+# 一覧ページのパーサーバックエンド（configure_parserで設定）
+_parser_backend = DEFAULT_BACKEND
+
+# 一覧ページを解析するワーカープロセスのプール（configure_parse_workersで設定）
+_parse_pool = None
+
+# 詳細ページの補完（configure_detail_enrichmentで設定）
+_detail_enricher = None
+
+def configure_parser(backend):
+    """一覧ページのパーサーバックエンドを設定する（auto / bs4 / lxml）"""
+    global _parser_backend
+    resolve_backend(backend)
+    _parser_backend = backend or DEFAULT_BACKEND
+    return _parser_backend
+
+def configure_parse_workers(workers):
+    """
+    一覧ページの解析を複数プロセスで行う（workersはプロセス数）
+    取得は従来どおりスレッドで行い、取得したHTMLをワーカープロセスに渡して解析する。
+    iter_trunkroom_properties（件数制限なし）は解析を待たずに次のページを取得するため、逐次実行でも取得と解析が重なる。
+    作業キュー（--run-db）の実行はページごとに結果を記録するため、区の中では解析を待ってから次のページを取得する。
+    0やNoneを渡すとプールを終了して同じプロセス内での解析に戻す
+    """
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.close()
+        _parse_pool = None
+    if workers:
+        from src.scraper.parse_pool import ParsePool
+        _parse_pool = ParsePool(workers)
+    return _parse_pool
+
+def configure_detail_enrichment(workers=DEFAULT_DETAIL_WORKERS, state_path=None, verbose=False):
+    """
+    各物件の詳細ページから区画ごとの広さ・料金・空室状況を取得する段階を有効にする
+    workersは同時に取得する詳細ページ数、state_pathは前回の詳細ページのハッシュ値の保存先（JSON）。
+    Noneや0を渡すと無効にする
+    """
+    global _detail_enricher
+    _detail_enricher = DetailEnricher(workers, state_path=state_path, verbose=verbose) if workers else None
+    return _detail_enricher
+
+def configure_regions(spec):
+    """スクレイピング対象の地域を設定する（組み込みの地域セット名またはJSONファイル、カンマ区切りで複数可）"""
+    global REGIONS
+    REGIONS = load_regions(spec)
+    return REGIONS
+
+def parse_page(html, url, limit=None, verbose=False):
+    """
+    一覧ページを解析する（ワーカープールが設定されていればワーカープロセスで解析）
+    解析時間と項目ごとの抽出失敗数をメトリクスに記録する
+    """
+    with PARSE_SECONDS.time(backend=resolve_backend(_parser_backend)):
+        if _parse_pool is not None:
+            page = _parse_pool.parse(html, url, backend=_parser_backend, limit=limit, verbose=verbose)
+        else:
+            page = parse_listing_page(html, url, backend=_parser_backend, limit=limit, verbose=verbose)
+    _record_parse_failures(page)
+    return page
+
+def submit_parse(html, url, verbose=False):
+    """
+    ワーカープールに一覧ページの解析を依頼してListingPageのFutureを返す（結果を待たない）
+    解析時間（プールでの待ち時間を含む）は解析が終わったときにメトリクスに記録する
+    """
+    backend = resolve_backend(_parser_backend)
+    started = time.perf_counter()
+    future = _parse_pool.submit(html, url, backend=backend, verbose=verbose)
+    future.add_done_callback(lambda _: PARSE_SECONDS.observe(time.perf_counter() - started, backend=backend))
+    return future
+
+def _record_parse_failures(page):
+    for field, count in (page.parse_failures or {}).items():
+        PARSE_FAILURES.inc(count, field=field)
+
+def configure_rate_limit(rps, burst=1):
+    """
+    ホストごとのレート制限を設定する
+    rpsにNoneを渡すとレート制限を解除する
+    """
+    global _rate_limiter
+    _rate_limiter = HostRateLimiter(rps, burst) if rps else None
+    return _rate_limiter
+
+def ensure_rate_limit():
+    """
+    レート制限が設定されていなければデフォルト（DEFAULT_RPS = 従来の2秒間隔）を設定する
+    一覧ページを何ページも辿るため、逐次実行でも同じホストへ間隔を空けずにアクセスしない。
+    オフライン再生時はネットワークにアクセスしないので設定しない
+    """
+    if _rate_limiter is None and not is_offline():
+        configure_rate_limit(DEFAULT_RPS)
+    return _rate_limiter
 
 def scrape_website(url):
     """
     指定されたURLからHTMLを取得し、BeautifulSoupオブジェクトを返す
+    取得は共有セッション（keep-alive）とレスポンスキャッシュを通して行う
     """
+    html = fetch_page_html(url)
+    if html is None:
+        return None
+    
+    # HTMLをBeautifulSoupでパース
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'html.parser')
+
+def fetch_page_html(url):
+    """指定されたURLのHTMLを文字列で取得する（失敗時はNone）"""
+    from requests.exceptions import RequestException
+
     try:
-        # User-Agentを設定してブロックを回避
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # エラーがあれば例外を発生させる
-        
-        # HTMLをBeautifulSoupでパース
-        soup = BeautifulSoup(response.text, 'html.parser')
-        return soup
+        # レート制限が設定されていればトークンを取得するまで待機してから取得
+        return fetch_html(url, rate_limiter=_rate_limiter)
     
-    except requests.exceptions.RequestException as e:
+    except RequestException as e:
+        ERRORS.inc(stage="fetch")
         print(f"スクレイピング中にエラーが発生しました: {str(e)}")
         return None
 
@@ -66,6 +168,7 @@ def save_to_database(data, table_name="storage_facilities"):
     スクレイピングしたデータをデータベースに保存
     """
     try:
+        from src.auth.auth import get_supabase_client
         supabase = get_supabase_client()
         
         # データに現在時刻を追加
@@ -76,292 +179,439 @@ def save_to_database(data, table_name="storage_facilities"):
         return result
     
     except Exception as e:
+        ERRORS.inc(stage="db")
         print(f"データベース保存中にエラーが発生しました: {str(e)}")
         return None
 
-def scrape_trunkroom_properties(ward_url_part, limit=None, verbose=False):
-    """特定の区のトランクルーム物件情報をスクレイピングする"""
-    base_url = f"https://www.japantrunkroom.com/tokyo/{ward_url_part}/"
-    properties = []
+def scrape_trunkroom_properties(ward_url_part, limit=None, verbose=False, prefecture="tokyo"):
+    """特定の区のトランクルーム物件情報をスクレイピングする（全ページ分をリストで返す）"""
+    return list(iter_trunkroom_properties(ward_url_part, limit=limit, verbose=verbose, prefecture=prefecture))
+
+def iter_trunkroom_properties(ward_url_part, limit=None, verbose=False, max_pages=MAX_LISTING_PAGES, prefecture="tokyo"):
+    """
+    特定の区のトランクルーム物件情報を一覧ページを辿りながらスクレイピングし、
+    物件を1件抽出するごとにyieldするジェネレータ
+    ward_url_part / prefectureはURLの区市町村部分・都道府県部分（Region.slug / Region.prefecture）
+    """
+    url = LISTING_URL_TEMPLATE.format(prefecture=prefecture, slug=ward_url_part)
+    ensure_rate_limit()
+    remaining = limit if limit is not None and limit > 0 else None
     
-    if verbose:
-        print(f"URLをスクレイピング中: {base_url}")
+    # ワーカープールがあれば解析中に次のページを取得する（件数制限があるとページごとの残り件数が必要なため逐次）
+    if _parse_pool is not None and remaining is None:
+        pages = _iter_listing_pages_pipelined(url, verbose, max_pages)
+    else:
+        pages = _iter_listing_pages(url, remaining, verbose, max_pages)
     
     try:
-        soup = scrape_website(base_url)
-        if not soup:
-            return properties
-        
-        # 物件データを含むdiv要素を取得（spec クラス）
-        property_elements = soup.select("div.spec")
-        
-        if verbose:
-            print(f"{len(property_elements)}件の物件情報を検出しました")
-        
-        # 制限数を設定
-        if limit is not None and limit > 0:
-            property_elements = property_elements[:limit]
+        for page in pages:
             if verbose:
-                print(f"物件数を{limit}件に制限します")
-        
-        for element in property_elements:
-            try:
-                # データ属性から物件IDを取得
-                building_id = element.get('data-building_id', '')
-                
-                if verbose:
-                    print(f"物件ID {building_id} を処理中...")
-                
-                # 物件コンテナの検索方法を変更
-                property_container = element.find_parent('div', class_='detailListContents')
-                if not property_container and verbose:
-                    print(f"物件ID {building_id} のコンテナが見つかりません")
-                    continue
-                
-                # 物件名取得 - 修正
-                # h3要素を直接探す（親要素を特定せず）
-                h3_element = property_container.find_previous('h3') if property_container else None
-                
-                # h3から物件名を抽出
-                name = "不明"
-                if h3_element:
-                    # aタグがある場合はそこから取得（物件名）
-                    a_element = h3_element.find('a')
-                    if a_element:
-                        name = a_element.text.strip()
-                    # aタグがなければh3のテキスト全体を取得
-                    else:
-                        name = h3_element.text.strip()
-                
-                # ========= 改善: 価格情報抽出 ==========
-                fee_element = element.select_one("dl.fee")
-                min_price, max_price = 0, 0
-                if fee_element:
-                    # spanタグから直接価格テキストを取得
-                    price_span = fee_element.select_one("dd span")
-                    if price_span:
-                        price_text = price_span.text.strip()
-                        min_price, max_price = extract_price_range(price_text)
-                
-                # ========= 改善: 広さ情報抽出 ==========
-                breadth_element = element.select_one("dl.breadth")
-                min_size, max_size = 0.0, 0.0
-                if breadth_element:
-                    # spanタグから直接サイズテキストを取得
-                    size_span = breadth_element.select_one("dd span")
-                    if size_span:
-                        size_text = size_span.text.strip()
-                        min_size, max_size = extract_size_range(size_text)
-                
-                # ========= 改善: 住所情報抽出 ==========
-                address_element = element.select_one("dl.address")
-                address_text = ""
-                if address_element:
-                    # spanタグから直接住所テキストを取得
-                    address_span = address_element.select_one("dd span")
-                    if address_span:
-                        address_text = address_span.text.strip()
-                
-                # ========= 改善: アクセス情報抽出 ==========
-                access_element = element.select_one("dl.access")
-                access_text = ""
-                if access_element:
-                    # pタグから直接アクセステキストを取得
-                    access_p = access_element.select_one("dd p")
-                    if access_p:
-                        access_text = access_p.text.strip()
-                
-                # 屋内・屋外の情報取得 - 修正
-                location_type = "不明"
-                detail_list_title = property_container.find_previous('div', class_='detailListTitle') if property_container else None
-                if detail_list_title:
-                    type_element = detail_list_title.find('div', class_='type')
-                    if type_element:
-                        type_classes = type_element.get('class', [])
-                        if 'indoor' in type_classes:
-                            location_type = "屋内"
-                        elif 'outdoor' in type_classes:
-                            location_type = "屋外"
-                        else:
-                            location_type = type_element.get_text(strip=True)
-                
-                # HTMLの構造に合わせて特徴情報の取得方法を修正
-                option_div = None
-                if property_container:
-                    # 現在の方法
-                    option_div = property_container.find('div', class_='detailListOption')
-                    
-                    # 見つからない場合はセレクタを使用
-                    if not option_div:
-                        option_div = property_container.select_one('div.detailListOption')
-                    
-                    # それでも見つからない場合は親要素全体から検索
-                    if not option_div and property_container.parent:
-                        option_div = property_container.parent.find('div', class_='detailListOption')
-
-                features_list = None
-                if option_div:
-                    features_list = option_div.find('ul')
-
-                # 見つからなかったらデフォルト値を設定
-                has_alltime = False
-                has_parking = False
-                has_elevator = False
-                has_airconditioning = False
-                has_ventilator = False
-                has_security = False
-                
-                # 特徴リストがあれば処理
-                if features_list:
-                    # 各特徴を確認
-                    for feature in features_list.find_all('li'):
-                        feature_class = feature.get('class', [])
-                        if feature_class:
-                            # alltime（24時間利用可能）
-                            if 'alltime' in feature_class:
-                                has_alltime = 'disabled' not in feature_class
-                            # parking（駐車場）
-                            elif 'parking' in feature_class:
-                                has_parking = 'disabled' not in feature_class
-                            # elevator（エレベーター）
-                            elif 'elevator' in feature_class:
-                                has_elevator = 'disabled' not in feature_class
-                            # airconditioner（空調設備）
-                            elif 'airconditioner' in feature_class:
-                                has_airconditioning = 'disabled' not in feature_class
-                            # ventilator（換気設備）
-                            elif 'ventilator' in feature_class:
-                                has_ventilator = 'disabled' not in feature_class
-                            # security（防犯設備）
-                            elif 'security' in feature_class:
-                                has_security = 'disabled' not in feature_class
-                
-                property_data = {
-                    "name": name,
-                    "address": address_text,
-                    "location_type": location_type,
-                    "access": access_text,
-                    "min_size": min_size,
-                    "max_size": max_size,
-                    "min_price": min_price,
-                    "max_price": max_price,
-                    "has_alltime": has_alltime,
-                    "has_parking": has_parking,
-                    "has_elevator": has_elevator,
-                    "has_airconditioner": has_airconditioning,
-                    "has_ventilator": has_ventilator,
-                    "has_security": has_security
-                }
-                
-                properties.append(property_data)
-                
-                if verbose:
-                    print(f"物件「{name}」の情報を取得しました")
-                
-            except Exception as e:
+                print(f"{page.element_count}件の物件情報を検出しました")
+            
+            # 制限数を設定（ページをまたいで残り件数を数える）
+            if remaining is not None:
+                remaining -= min(page.element_count, remaining)
                 if verbose:
-                    import traceback
-                    print(f"物件情報の抽出中にエラー: {str(e)}")
-                    print(traceback.format_exc())
-                continue
-        
-        return properties
-        
+                    print(f"物件数を{limit}件に制限します")
+            
+            for property_data in page.properties:
+                yield property_data
+            
+            if remaining is not None and remaining <= 0:
+                return
+    
     except Exception as e:
+        ERRORS.inc(stage="scrape")
         if verbose:
             import traceback
             print(f"スクレイピング中にエラー: {str(e)}")
             print(traceback.format_exc())
-        return properties
 
-def extract_price_range(price_text):
-    """価格範囲テキストから最小・最大価格を抽出
-    例: "4,400円/月～24,200円/月" → (4400, 24200)
-    """
-    try:
-        import re
-        # 円/月の前の数字を抽出
-        match = re.search(r'([0-9,]+)円/月～([0-9,]+)円/月', price_text)
-        if match:
-            min_price = int(match.group(1).replace(',', ''))
-            max_price = int(match.group(2).replace(',', ''))
-            return min_price, max_price
+def _iter_listing_pages(url, remaining, verbose, max_pages):
+    """一覧ページを1ページずつ取得・解析してListingPageをyieldする（remainingは残り件数）"""
+    visited = set()
+    while url and url not in visited and len(visited) < max_pages:
+        visited.add(url)
+        
+        if verbose:
+            print(f"URLをスクレイピング中: {url}")
+        
+        html = fetch_page_html(url)
+        if html is None:
+            return
         
-        # 単一価格の場合
-        match = re.search(r'([0-9,]+)円/月', price_text)
-        if match:
-            price = int(match.group(1).replace(',', ''))
-            return price, price
+        # 物件データを含むdiv要素（spec クラス）から物件情報を抽出
+        page = parse_page(html, url, limit=remaining, verbose=verbose)
+        yield page
         
-        return 0, 0
-    except:
-        return 0, 0
+        if remaining is not None:
+            remaining -= min(page.element_count, remaining)
+        # 次の一覧ページへ
+        url = page.next_url
 
-def extract_size_range(size_text):
-    """サイズ範囲テキストから最小・最大サイズを抽出
-    例: "1.01m²～4.32m²" → (1.01, 4.32)
+def _iter_listing_pages_pipelined(url, verbose, max_pages):
     """
-    try:
-        import re
-        # 範囲表記の場合
-        match = re.search(r'([0-9.]+)m²～([0-9.]+)m²', size_text)
-        if match:
-            min_size = float(match.group(1))
-            max_size = float(match.group(2))
-            return min_size, max_size
+    一覧ページをワーカープールで解析しながら、解析の終わりを待たずに次のページを取得する
+    次ページのURLはHTMLのrel="next"から見込みで求め（scan_next_page_url）、解析が終わったページから順に
+    ListingPageをyieldする。解析結果のnext_urlが見込みと違えば、見込みで取得したページを捨てて辿り直す。
+    解析待ちのページ数はワーカープールの上限（max_pending）までに抑える
+    """
+    visited = set()
+    pending = deque()  # (URL, ListingPageのFuture)
+    failed_url = None  # 取得に失敗したURL（見込みが正しければそこで終了する）
+    while True:
+        while (url and url not in visited and len(visited) < max_pages
+               and len(pending) < _parse_pool.max_pending and failed_url is None):
+            visited.add(url)
+            if verbose:
+                print(f"URLをスクレイピング中: {url}")
+            html = fetch_page_html(url)
+            if html is None:
+                failed_url = url
+                break
+            pending.append((url, submit_parse(html, url, verbose=verbose)))
+            url = scan_next_page_url(html, url)
         
-        # 単一サイズの場合
-        match = re.search(r'([0-9.]+)m²', size_text)
-        if match:
-            size = float(match.group(1))
-            return size, size
+        if not pending:
+            return
+        _, future = pending.popleft()
+        page = future.result()
+        _record_parse_failures(page)
+        yield page
         
-        return 0.0, 0.0
-    except:
-        return 0.0, 0.0
+        # 見込みで辿ったURLが解析結果の次ページと一致するか確認する
+        expected = pending[0][0] if pending else (failed_url or url)
+        if page.next_url == expected:
+            if not pending and failed_url is not None:
+                return
+            continue
+        for stale_url, stale in pending:
+            stale.cancel()
+            visited.discard(stale_url)
+        pending.clear()
+        if failed_url is not None:
+            visited.discard(failed_url)
+            failed_url = None
+        url = page.next_url
+
+def scrape_all_tokyo_wards(limit_per_ward=None, verbose=False, save_to_db=False, concurrency=1,
+                           batch_size=DEFAULT_BATCH_SIZE, incremental=False, geocoder=None, snapshot_store=None,
+                           run_queue=None, resume_run_id=None, regions=None):
+    """
+    対象地域（regions: load_regionsの戻り値、デフォルトはconfigure_regionsで設定した地域 = 東京23区）すべての
+    トランクルーム物件情報をスクレイピング
+    concurrencyが2以上の場合は区ごとにスレッドで並列取得する。
+    結果の順序とDB保存の順序は逐次実行時と同じく区の順番になる
+    incremental=Trueの場合は前回から変化した物件だけをDBに書き込む
+    geocoderを渡すと各物件にlatitude / longitudeを付与する
+    snapshot_store（SnapshotStore）を渡すと区ごとにParquetへ追記する
+    run_queue（RunQueue）を渡すと区・ページ単位の進捗を記録し、resume_run_idの実行を途中から再開できる
+    (物件データのリスト, スクレイピング日) を返す。再開した実行のスクレイピング日は元の実行の日付になる
+    """
+    scrape_date = _resolve_scrape_date(run_queue, resume_run_id)
+    writer = create_db_writer(batch_size, verbose, incremental, snapshot_date=scrape_date) if save_to_db else None
+    regions = list((regions or REGIONS).values())
+    
+    if run_queue is not None:
+        all_properties, scrape_date = _scrape_wards_queued(run_queue, resume_run_id, regions, limit_per_ward, verbose,
+                                                           writer, geocoder, snapshot_store, concurrency, scrape_date)
+    elif concurrency is None or concurrency <= 1:
+        all_properties = _scrape_wards_sequential(regions, limit_per_ward, verbose, writer, geocoder, snapshot_store,
+                                                  scrape_date)
+    else:
+        all_properties = _scrape_wards_concurrent(regions, limit_per_ward, verbose, writer, geocoder, snapshot_store,
+                                                  concurrency, scrape_date)
+    
+    if writer is not None:
+        writer.flush()
+        _print_db_summary(writer)
+    _confirm_detail_state(writer)
+    
+    return all_properties, scrape_date
+
+def _resolve_scrape_date(run_queue, resume_run_id):
+    """実行のスクレイピング日（再開する場合は元の実行の日付、それ以外は今日）"""
+    if run_queue is not None and resume_run_id:
+        run = run_queue.get_run(resume_run_id)
+        if run is None:
+            raise ValueError(f"実行IDが見つかりません: {resume_run_id}")
+        if run["params"].get("scrape_date"):
+            return run["params"]["scrape_date"]
+    return datetime.date.today().isoformat()
 
-def scrape_all_tokyo_wards(limit_per_ward=None, verbose=False, save_to_db=False):
-    """東京23区すべての区のトランクルーム物件情報をスクレイピング"""
+def _scrape_wards_concurrent(regions, limit_per_ward, verbose, writer, geocoder, snapshot_store, concurrency, scrape_date=None):
+    """区ごとにスレッドで並列スクレイピングし、区の順番で結果をまとめる"""
+    # 並列実行時はホストごとのレート制限でサーバー負荷を抑える
+    ensure_rate_limit()
+    
+    all_properties = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            region.name: executor.submit(scrape_trunkroom_properties, region.slug, limit=limit_per_ward,
+                                         verbose=verbose, prefecture=region.prefecture)
+            for region in regions
+        }
+        
+        # 完了順ではなく区の順番で結果を受け取る
+        for ward_name, future in futures.items():
+            ward_properties = future.result()
+            print(f"{ward_name}のスクレイピングが完了しました")
+            print(f"- {len(ward_properties)}件の物件を取得しました")
+            FACILITIES.inc(len(ward_properties), ward=ward_name)
+            _geocode_ward_properties(ward_properties, geocoder)
+            _enrich_ward_properties(ward_properties, writer)
+            _save_ward_properties(ward_properties, writer)
+            _append_ward_snapshot(ward_name, ward_properties, snapshot_store, scrape_date)
+            all_properties.extend(ward_properties)
+    
+    return all_properties
+
+def _scrape_wards_sequential(regions, limit_per_ward, verbose, writer, geocoder, snapshot_store, scrape_date=None):
+    """区を1つずつ順番にスクレイピングする"""
     all_properties = []
     
-    for ward_name, ward_url_part in TOKYO_23_WARDS.items():
+    for region in regions:
+        ward_name = region.name
         print(f"{ward_name}のスクレイピングを開始...")
-        ward_properties = scrape_trunkroom_properties(ward_url_part, limit=limit_per_ward, verbose=verbose)
+        ward_properties = scrape_trunkroom_properties(region.slug, limit=limit_per_ward, verbose=verbose,
+                                                      prefecture=region.prefecture)
         
         print(f"- {len(ward_properties)}件の物件を取得しました")
-        
-        # データベースに直接保存するオプション
-        if save_to_db and ward_properties:
-            success_count = 0
-            print(f"- データベースに保存中...")
-            for prop in ward_properties:
-                result = save_to_database(prop)
-                if result:
-                    success_count += 1
-            print(f"- {success_count}/{len(ward_properties)}件のデータをDBに保存しました")
+        FACILITIES.inc(len(ward_properties), ward=ward_name)
+        _geocode_ward_properties(ward_properties, geocoder)
+        _enrich_ward_properties(ward_properties, writer)
+        _save_ward_properties(ward_properties, writer)
+        _append_ward_snapshot(ward_name, ward_properties, snapshot_store, scrape_date)
         
         all_properties.extend(ward_properties)
         
-        # サーバー負荷軽減のための待機
-        time.sleep(2)
+        # サーバー負荷軽減のための待機（レート制限がある場合はそちらに任せる）
+        if _rate_limiter is None and not is_offline():
+            time.sleep(2)
     
     return all_properties
 
-def save_to_csv(properties, filename=None):
-    """物件情報をCSVファイルに保存"""
-    if not properties:
-        print("保存するデータがありません")
-        return
+def _scrape_wards_queued(run_queue, resume_run_id, regions, limit_per_ward, verbose, writer, geocoder, snapshot_store, concurrency,
+                         scrape_date=None):
+    """
+    作業キューを使って区をスクレイピングする
+    取得済みのページは記録した物件データを使い、未完了・失敗したページだけを取得し直す。
+    区ごとにDBへの書き込みを確定（flush）してから保存済みにするため、
+    途中で止まっても保存されていない区だけが再開時に保存し直される
+    (物件データのリスト, 実行のスクレイピング日) を返す
+    """
+    if resume_run_id:
+        run = run_queue.get_run(resume_run_id)
+        if run is None:
+            raise ValueError(f"実行IDが見つかりません: {resume_run_id}")
+        run_id = resume_run_id
+        limit_per_ward = run["params"].get("limit_per_ward")
+        scrape_date = run["params"].get("scrape_date") or datetime.date.today().isoformat()
+        wards = [tuple(ward) for ward in run["params"]["wards"]]
+        retried = run_queue.reset_failed(run_id)
+        print(f"実行 {run_id} を再開します（失敗したページ{retried}件を再試行）")
+    else:
+        scrape_date = scrape_date or datetime.date.today().isoformat()
+        wards = [(region.name, listing_url(region)) for region in regions]
+        run_id = run_queue.create_run(wards, {"limit_per_ward": limit_per_ward, "scrape_date": scrape_date})
+        print(f"実行ID: {run_id}")
+    
+    # 逐次実行（concurrency=1）でも一覧ページを続けて取得するため、ホストごとのレート制限をかける
+    ensure_rate_limit()
+    
+    def fetch_ward(ward_name):
+        _fetch_ward_pages(run_queue, run_id, ward_name, limit_per_ward, verbose)
+    
+    all_properties = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or 1)) as executor:
+        futures = {ward_name: executor.submit(fetch_ward, ward_name) for ward_name, _ in wards}
+        
+        # 区の順番で保存する
+        for ward_name, future in futures.items():
+            future.result()
+            ward_properties, unsaved = run_queue.results(run_id, ward_name)
+            print(f"{ward_name}: {len(ward_properties)}件の物件を取得済み（未保存{len(unsaved)}件）")
+            FACILITIES.inc(len(ward_properties), ward=ward_name)
+            _geocode_ward_properties(ward_properties, geocoder)
+            
+            if unsaved:
+                failed_before = writer.summary()["failed"] if writer is not None else 0
+                _enrich_ward_properties(unsaved, writer)
+                _save_ward_properties(unsaved, writer)
+                if writer is not None:
+                    writer.flush()
+                _confirm_detail_state(writer, failed_before, [prop.get("building_id") for prop in unsaved])
+                # DBへの書き込みに失敗した区はParquetにも追記せず未保存のまま残し、再開時にまとめて保存し直す
+                # （先に追記すると再開のたびに同じ行がスナップショットに重複して追記される）
+                if writer is None or writer.summary()["failed"] == failed_before:
+                    _append_ward_snapshot(ward_name, unsaved, snapshot_store, scrape_date)
+                    run_queue.mark_saved(run_id, ward_name)
+            
+            all_properties.extend(ward_properties)
     
+    status, remaining = run_queue.finish_run(run_id)
+    if status == "completed":
+        print(f"実行 {run_id} が完了しました")
+    else:
+        print(f"実行 {run_id} は{remaining}ページが未完了です（--resume {run_id} で再開できます）")
+    return all_properties, scrape_date
+
+def _fetch_ward_pages(run_queue, run_id, ward_name, limit, verbose,
+                      max_pages=MAX_LISTING_PAGES, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_RETRY_BACKOFF):
+    """区の未完了の一覧ページを順に取得・解析して作業キューに記録する（失敗したページは待機して再試行）"""
+    while True:
+        item = run_queue.next_item(run_id, ward_name, max_attempts)
+        if item is None:
+            return
+        
+        visited, consumed = run_queue.ward_progress(run_id, ward_name)
+        remaining = max(limit - consumed, 0) if limit is not None and limit > 0 else None
+        
+        # 再試行は試行回数に応じて待機時間を倍にする
+        if item["attempts"] > 0 and not is_offline():
+            time.sleep(backoff * 2 ** (item["attempts"] - 1))
+        
+        if verbose:
+            print(f"URLをスクレイピング中: {item['url']}")
+        
+        try:
+            html = fetch_html(item["url"], rate_limiter=_rate_limiter)
+            page = parse_page(html, item["url"], limit=remaining, verbose=verbose)
+        except Exception as e:
+            ERRORS.inc(stage="scrape")
+            attempts = run_queue.mark_failed(run_id, ward_name, item["page_no"], e)
+            print(f"{ward_name} {item['page_no']}ページ目の取得に失敗しました（{attempts}/{max_attempts}回目）: {str(e)}")
+            continue
+        
+        used = page.element_count if remaining is None else min(page.element_count, remaining)
+        next_url = page.next_url
+        if (remaining is not None and remaining - used <= 0) or next_url in visited or item["page_no"] >= max_pages:
+            next_url = None
+        run_queue.mark_done(run_id, ward_name, item["page_no"], page.properties, consumed=used, next_url=next_url)
+
+def _geocode_ward_properties(ward_properties, geocoder):
+    """区ごとの取得結果に緯度経度を付与する"""
+    if geocoder is not None and ward_properties:
+        with STAGE_SECONDS.time(stage="geocode"):
+            count = geocoder.geocode_records(ward_properties)
+        print(f"- {count}/{len(ward_properties)}件に緯度経度を付与しました")
+
+def _enrich_ward_properties(ward_properties, writer):
+    """詳細ページから空室状況と区画ごとのデータを取得し、区画の行をバッチライターに渡す"""
+    if _detail_enricher is None or not ward_properties:
+        return
+    # 詳細ページもmax_workers件を同時に取得するため、一覧ページと同じくホストごとのレート制限をかける
+    rate_limiter = ensure_rate_limit()
+    with STAGE_SECONDS.time(stage="enrich"):
+        unit_rows = _detail_enricher.enrich(ward_properties, rate_limiter=rate_limiter)
+    if unit_rows:
+        print(f"- 詳細ページから{len(unit_rows)}区画の情報を取得しました")
+        if writer is not None:
+            writer.add_many(unit_rows)
+
+def _confirm_detail_state(writer, failed_before=0, building_ids=None):
+    """
+    DBへの書き込み（flush後）が確定した物件の詳細ページのハッシュ値を記録する
+    書き込みに失敗した、またはDBに保存しない場合は記録せず、次回も詳細ページを取得・書き込みし直す
+    """
+    if _detail_enricher is None:
+        return
+    if writer is not None and writer.summary()["failed"] == failed_before:
+        _detail_enricher.commit(building_ids)
+    else:
+        _detail_enricher.discard(building_ids)
+
+def iter_enriched_properties(properties, writer=None, chunk_size=None):
+    """
+    1件ずつ流れてくる物件データをchunk_size件ずつまとめて詳細ページで補完しながらyieldする
+    詳細ページの補完が設定されていなければそのまま流す
+    """
+    if _detail_enricher is None:
+        yield from properties
+        return
+    chunk_size = chunk_size or _detail_enricher.max_workers * 4
+    chunk = []
+    for prop in properties:
+        chunk.append(prop)
+        if len(chunk) >= chunk_size:
+            _enrich_ward_properties(chunk, writer)
+            yield from chunk
+            chunk = []
+    if chunk:
+        _enrich_ward_properties(chunk, writer)
+        yield from chunk
+
+def _save_ward_properties(ward_properties, writer):
+    """区ごとの取得結果をバッチライターに渡す（batch_size件たまるごとにupsert）"""
+    # データベースに直接保存するオプション
+    if writer is not None and ward_properties:
+        print(f"- データベースに保存中...")
+        with STAGE_SECONDS.time(stage="db"):
+            writer.add_many(ward_properties)
+
+def create_db_writer(batch_size=DEFAULT_BATCH_SIZE, verbose=False, incremental=False, snapshot_date=None):
+    """
+    DB保存用のライターを作成する（incrementalなら変更分だけを書き込む）
+    incrementalの場合は前回の状態をここで読み込む（スクレイピングを始める前に失敗が分かるようにする）。
+    snapshot_dateは履歴の日付（再開した実行では元の実行のスクレイピング日）
+    """
+    if incremental:
+        writer = IncrementalHistoryWriter(batch_size=batch_size, verbose=verbose, snapshot_date=snapshot_date)
+        writer.load_known_hashes()
+        return writer
+    return SupabaseBatchWriter(batch_size=batch_size, verbose=verbose)
+
+def _append_ward_snapshot(ward_name, ward_properties, snapshot_store, scrape_date=None):
+    """区ごとの取得結果をParquetのスナップショットに追記する"""
+    if snapshot_store is not None and ward_properties:
+        with STAGE_SECONDS.time(stage="snapshot"):
+            snapshot_store.append(ward_properties, ward_name, scrape_date)
+
+def _print_db_summary(writer):
+    """バッチ保存の結果を表示する"""
+    summary = writer.summary()
+    total = summary["saved"] + summary["failed"] + summary["skipped"]
+    print(f"{summary['saved']}/{total}件のデータをDBに保存しました"
+          f"（{summary['batches']}バッチ, 合計{summary['total_seconds']:.2f}秒, 最大{summary['max_batch_seconds']:.2f}秒/バッチ）")
+    if "changed" in summary:
+        print(f"- 新規{summary['new']}件, 変更{summary['changed']}件, 変更なし{summary['unchanged']}件")
+
+def save_to_csv(properties, filename=None, chunk_size=1000):
+    """
+    物件情報をCSVファイルに保存
+    リストだけでなくジェネレータも受け付け、chunk_size件ずつ追記するため
+    全件をメモリに保持せずに書き出せる
+    """
     if not filename:
         today = datetime.date.today().strftime("%Y%m%d")
         filename = f"trunkroom_data_{today}.csv"
     
-    df = pd.DataFrame(properties)
-    df.to_csv(filename, index=False, encoding='utf-8')
-    print(f"{len(properties)}件のデータを{filename}に保存しました")
+    total = 0
+    chunk = []
+    for prop in properties:
+        chunk.append(prop)
+        if len(chunk) >= chunk_size:
+            _write_csv_chunk(chunk, filename, first=(total == 0))
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        _write_csv_chunk(chunk, filename, first=(total == 0))
+        total += len(chunk)
+    
+    if total == 0:
+        print("保存するデータがありません")
+        return
+    
+    print(f"{total}件のデータを{filename}に保存しました")
     return filename
 
+def _write_csv_chunk(chunk, filename, first):
+    """CSVにチャンクを書き込む（最初のチャンクのみヘッダー付きで新規作成）"""
+    import pandas as pd
+
+    df = pd.DataFrame(chunk)
+    df.to_csv(filename, index=False, encoding='utf-8', mode='w' if first else 'a', header=first)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='トランクルーム物件情報スクレイパー')
     parser.add_argument('--ward', help='特定の区のみスクレイピング（例：中央区）')
@@ -370,46 +620,143 @@ if __name__ == "__main__":
     parser.add_argument('--db', action='store_true', help='データベースに直接保存')
     parser.add_argument('--csv', action='store_true', help='結果をCSVに保存')
     parser.add_argument('--output', help='CSVファイルの出力パス')
+    parser.add_argument('--incremental', action='store_true', help='前回から変化した物件だけをDBと履歴テーブルに書き込む（--dbと併用）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f'DB保存時の1バッチあたりの行数（デフォルト: {DEFAULT_BATCH_SIZE}）')
+    parser.add_argument('--concurrency', type=int, default=1, help='全区スクレイピング時の並列数（デフォルト: 1 = 逐次）')
+    parser.add_argument('--rps', type=float, help=f'ホストごとの最大リクエスト数/秒（デフォルト: {DEFAULT_RPS}）')
+    parser.add_argument('--geocode-table', help='住所→緯度経度のCSV（指定すると各物件にlatitude / longitudeを付与）')
+    parser.add_argument('--geocode-cache', help='ジオコーディング結果のキャッシュ（JSON）')
+    parser.add_argument('--parquet-dir', help='スクレイピング日・区で分割したParquetのスナップショットを追記するディレクトリ')
+    parser.add_argument('--households', help='町丁目別の世帯数CSV（--parquet-dirと併用すると需給グリッドを更新）')
+    parser.add_argument('--run-db', help=f'全区スクレイピングの進捗をこのSQLiteファイルに記録し、--resumeで再開できるようにする（--resumeのみ指定した場合: {DEFAULT_RUN_DB}）')
+    parser.add_argument('--resume', metavar='RUN_ID', help='指定した実行IDの全区スクレイピングを未完了のページから再開する（--run-dbの進捗を使う）')
+    parser.add_argument('--regions', default=DEFAULT_REGION_SET, help=f'対象地域（組み込みの地域セット名またはJSONファイル、カンマ区切りで複数可。デフォルト: {DEFAULT_REGION_SET}）')
+    parser.add_argument('--parse-workers', type=int, help='一覧ページを解析するワーカープロセス数（解析中に次のページを取得し、取得と解析を重ねる）')
+    parser.add_argument('--details', action='store_true', help='各物件の詳細ページから区画ごとの広さ・料金・空室状況を取得する')
+    parser.add_argument('--detail-workers', type=int, default=DEFAULT_DETAIL_WORKERS, help=f'詳細ページを同時に取得する数（デフォルト: {DEFAULT_DETAIL_WORKERS}）')
+    parser.add_argument('--detail-state', help='前回取得した詳細ページのハッシュ値の保存先（JSON、内容が変わっていない物件を飛ばす。--dbで書き込みが確定した物件だけ記録する）')
+    parser.add_argument('--metrics-json', help='計測結果（リクエスト時間・解析時間・DB書き込み時間など）のJSONレポートの出力先')
+    parser.add_argument('--metrics-prom', help='計測結果のPrometheusテキスト形式の出力先（node_exporterのtextfile collector向け）')
+    parser.add_argument('--parser', choices=(DEFAULT_BACKEND,) + PARSER_BACKENDS, default=DEFAULT_BACKEND, help='一覧ページのパーサー（デフォルト: auto = bs4。lxmlは高速だが崩れたHTMLで結果が異なる場合がある）')
+    parser.add_argument('--pool-size', type=int, help=f'HTTP接続プールのサイズ（デフォルト: {DEFAULT_POOL_SIZE}と並列数の大きい方）')
+    parser.add_argument('--cache-dir', help='レスポンスキャッシュの保存先（条件付きGETで未更新ページの再取得を省く）')
+    parser.add_argument('--offline', action='store_true', help='ネットワークにアクセスせず--cache-dirのHTMLだけで再実行する')
     
     args = parser.parse_args()
     
+    if args.offline and not args.cache_dir:
+        parser.error('--offlineには--cache-dirの指定が必要です')
+    if args.incremental and not args.db:
+        parser.error('--incrementalは--dbと併用してください')
+    if args.resume and args.ward:
+        parser.error('--resumeは全区スクレイピングでのみ使用できます')
+    if args.households and not args.parquet_dir:
+        parser.error('--householdsは--parquet-dirと併用してください')
+    
+    # HTTPセッション・キャッシュの設定
+    configure_http(
+        pool_size=args.pool_size or max(DEFAULT_POOL_SIZE, args.concurrency),
+        cache_dir=args.cache_dir,
+        offline=args.offline
+    )
+    
+    # パーサーの設定
+    configure_parser(args.parser)
+    
+    # 対象地域の設定
+    try:
+        configure_regions(args.regions)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    # 解析ワーカープロセスの設定
+    if args.parse_workers:
+        configure_parse_workers(args.parse_workers)
+    
+    # 詳細ページの補完の設定
+    if args.details:
+        configure_detail_enrichment(args.detail_workers, state_path=args.detail_state, verbose=args.verbose)
+    
+    # ジオコーダの設定
+    geocoder = Geocoder(args.geocode_table, cache_path=args.geocode_cache) if args.geocode_table else None
+    
+    # Parquetスナップショットの設定
+    snapshot_store = None
+    if args.parquet_dir:
+        from src.storage.snapshot_store import SnapshotStore
+        snapshot_store = SnapshotStore(args.parquet_dir)
+    
+    # レート制限の設定
+    if args.rps:
+        configure_rate_limit(args.rps)
+    
     # 特定の区だけスクレイピング
+    scrape_date = datetime.date.today().isoformat()
     if args.ward:
-        if args.ward in TOKYO_23_WARDS:
+        if args.ward in REGIONS:
+            region = REGIONS[args.ward]
             print(f"{args.ward}の物件情報をスクレイピングします...")
-            properties = scrape_trunkroom_properties(
-                TOKYO_23_WARDS[args.ward], 
+            properties = iter_trunkroom_properties(
+                region.slug, 
                 limit=args.limit, 
-                verbose=args.verbose
+                verbose=args.verbose,
+                prefecture=region.prefecture
             )
             
-            print(f"{len(properties)}件の物件情報を取得しました")
+            # 取得した物件を1件ずつDB・CSVへ流す
+            counts = {"total": 0}
+            writer = create_db_writer(args.batch_size, args.verbose, args.incremental, snapshot_date=scrape_date) if args.db else None
+            appender = snapshot_store.appender(args.ward, scrape_date) if snapshot_store is not None else None
             
-            # データベースに保存
-            if args.db:
-                success_count = 0
-                print("データベースに保存中...")
-                for prop in properties:
-                    result = save_to_database(prop)
-                    if result:
-                        success_count += 1
-                print(f"{success_count}/{len(properties)}件のデータをDBに保存しました")
+            def stream_properties():
+                for prop in iter_enriched_properties(properties, writer):
+                    counts["total"] += 1
+                    if geocoder is not None:
+                        geocoder.geocode_records([prop])
+                    # データベースに保存（バッチ単位でupsert）
+                    if writer is not None:
+                        writer.add(prop)
+                    if appender is not None:
+                        appender.add(prop)
+                    yield prop
             
             # CSVに保存
             if args.csv:
-                output_file = args.output or f"trunkroom_{TOKYO_23_WARDS[args.ward]}_{datetime.date.today().strftime('%Y%m%d')}.csv"
-                save_to_csv(properties, output_file)
+                output_file = args.output or f"trunkroom_{region.slug}_{datetime.date.today().strftime('%Y%m%d')}.csv"
+                save_to_csv(stream_properties(), output_file)
+            else:
+                for _ in stream_properties():
+                    pass
+            
+            print(f"{counts['total']}件の物件情報を取得しました")
+            FACILITIES.inc(counts["total"], ward=args.ward)
+            if appender is not None:
+                appender.flush()
+                print(f"{appender.written_count}件をParquetに保存しました: {args.parquet_dir}")
+            if writer is not None:
+                writer.flush()
+                _print_db_summary(writer)
+            _confirm_detail_state(writer)
         else:
             print(f"エラー: {args.ward}は有効な区名ではありません")
-            print(f"有効な区名: {', '.join(TOKYO_23_WARDS.keys())}")
+            print(f"有効な区名: {', '.join(REGIONS.keys())}")
     
     # 全区スクレイピング
     else:
-        print("東京23区すべての物件情報をスクレイピングします...")
-        properties = scrape_all_tokyo_wards(
+        print(f"{len(REGIONS)}地域すべての物件情報をスクレイピングします...")
+        # 進捗の記録（作業キュー）は--run-dbか--resumeを指定したときだけ使う
+        run_queue = RunQueue(args.run_db or DEFAULT_RUN_DB) if args.run_db or args.resume else None
+        properties, scrape_date = scrape_all_tokyo_wards(
             limit_per_ward=args.limit, 
             verbose=args.verbose,
-            save_to_db=args.db
+            save_to_db=args.db,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            incremental=args.incremental,
+            geocoder=geocoder,
+            snapshot_store=snapshot_store,
+            run_queue=run_queue,
+            resume_run_id=args.resume
         )
         
         print(f"合計{len(properties)}件の物件情報を取得しました")
@@ -417,4 +764,37 @@ if __name__ == "__main__":
         # CSVに保存
         if args.csv:
             output_file = args.output or f"trunkroom_all_wards_{datetime.date.today().strftime('%Y%m%d')}.csv"
-            save_to_csv(properties, output_file)
+            with STAGE_SECONDS.time(stage="csv"):
+                save_to_csv(properties, output_file)
+    
+    # 解析ワーカープロセスを終了
+    configure_parse_workers(None)
+    
+    # 詳細ページのハッシュ値を保存
+    if _detail_enricher is not None:
+        _detail_enricher.save_state()
+        summary = _detail_enricher.summary()
+        print(f"詳細ページ: 取得{summary['fetched']}件, 変更なし{summary['unchanged']}件, 失敗{summary['failed']}件, 区画{summary['units']}件")
+    
+    # ジオコーディング結果のキャッシュを保存
+    if geocoder is not None:
+        geocoder.save_cache()
+    
+    # Parquetに追記した場合はエリア指標の集計テーブルを更新
+    if snapshot_store is not None:
+        from src.analytics.area_stats import refresh_area_stats
+        manifest = refresh_area_stats(snapshot_store, dates=[scrape_date])
+        print(f"エリア指標の集計テーブルを更新しました（{len(manifest['dates'])}日分）")
+        
+        if args.households:
+            from src.analytics.supply_demand import build_supply_demand_grid
+            grid = build_supply_demand_grid(snapshot_store, args.households, geocoder=geocoder)
+            print(f"需給グリッドを更新しました（{len(grid)}町丁目、町丁目に割り当てられなかった物件: {grid.attrs['unassigned_facilities']}件）")
+    
+    # 計測結果を書き出す
+    if args.metrics_json:
+        REGISTRY.write_json(args.metrics_json, extra={"argv": sys.argv[1:]})
+        print(f"計測結果を保存しました: {args.metrics_json}")
+    if args.metrics_prom:
+        REGISTRY.write_prometheus(args.metrics_prom)
+        print(f"計測結果を保存しました: {args.metrics_prom}")
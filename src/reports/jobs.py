@@ -0,0 +1,265 @@
+import datetime
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.geo.geocode import address_keys, normalize_address
+
+# 作成したレポート（PDF）の保存先
+DEFAULT_REPORT_DIR = "reports"
+
+# レポートを作成するワーカープロセス数
+DEFAULT_REPORT_WORKERS = 2
+
+# 終わったジョブ（完了・失敗）の状態を保持する秒数と最大件数（超えたものは古い順に忘れる。作成済みのPDFは残す）
+FINISHED_JOB_TTL_SECONDS = 3600
+MAX_FINISHED_JOBS = 1000
+
+# ジョブの状態
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# ワーカープロセス内で使い回すデータ（同じ日付のレポートが続くときに読み込み直さない）
+_worker_facilities = {}
+_worker_geocoders = {}
+
+
+def report_cache_key(address, radius_km, scrape_date, latitude=None, longitude=None):
+    """レポートのキャッシュのキー（住所・半径・データ日付が同じなら同じキー）"""
+    if address:
+        place = normalize_address(address)
+    else:
+        place = f"{float(latitude):.6f},{float(longitude):.6f}"
+    text = f"{place}|{float(radius_km):g}|{scrape_date}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:20]
+
+
+class ReportJobQueue:
+    """
+    エリアレポート（PDF）をバックグラウンドのワーカープロセスで作成するジョブキュー
+
+    submit()はすぐにジョブIDを返し、グラフの描画とPDFの書き出しはワーカープロセスで行うため、
+    Streamlitのセッションは待たされない。画面からはstatus()で状態（queued / running / done / failed）を確認する。
+    作成済みのレポートは (住所, 半径, データ日付) をキーにcache_dirに保存し、
+    同じ条件の依頼には作成し直さずにすぐ完了したジョブを返す。作成中の同じ条件の依頼は同じジョブにまとめる
+    終わったジョブの状態はfinished_ttl秒後、またはmax_finished件を超えたときに古い順に忘れる
+    （status()はNoneを返すようになるが、作成済みのPDFはキャッシュとして残り、同じ条件の依頼にすぐ使われる）
+
+    例:
+        queue = ReportJobQueue("data/snapshots", geocode_table="geo.csv")
+        job_id = queue.submit("東京都中央区銀座1丁目", radius_km=1.0)
+        queue.status(job_id)  # {"status": "done", "path": "reports/....pdf", ...}
+    """
+
+    def __init__(self, snapshot_root, cache_dir=DEFAULT_REPORT_DIR, workers=DEFAULT_REPORT_WORKERS, geocode_table=None,
+                 finished_ttl=FINISHED_JOB_TTL_SECONDS, max_finished=MAX_FINISHED_JOBS):
+        self.snapshot_root = snapshot_root
+        self.cache_dir = cache_dir
+        self.geocode_table = geocode_table
+        self.jobs = {}
+        self.active = {}
+        # 終わったジョブのID → 終わった時刻（time.monotonic）。終わった順に並ぶ
+        self.finished = OrderedDict()
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self.workers = workers
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.executor = self._new_executor()
+
+    def _new_executor(self):
+        # Streamlitのサーバーは多数のスレッドを持つため、forkではなくspawnでワーカーを起動する
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def submit(self, address=None, radius_km=1.0, scrape_date=None, latitude=None, longitude=None):
+        """
+        レポートの作成を依頼してジョブIDを返す
+        住所（geocode_tableで座標に変換）か緯度経度のどちらかを指定する。
+        scrape_dateを省略すると最新のスクレイピング日のデータを使う
+        """
+        if not address and (latitude is None or longitude is None):
+            raise ValueError("住所か緯度経度を指定してください")
+        if scrape_date is None:
+            scrape_date = self.latest_date()
+            if scrape_date is None:
+                raise ValueError(f"スナップショットがありません: {self.snapshot_root}")
+        scrape_date = str(scrape_date)
+
+        key = report_cache_key(address, radius_km, scrape_date, latitude, longitude)
+        path = os.path.join(self.cache_dir, f"{scrape_date}_{key}.pdf")
+        job = {
+            "job_id": uuid.uuid4().hex[:12],
+            "key": key,
+            "address": address,
+            "radius_km": float(radius_km),
+            "scrape_date": scrape_date,
+            "status": QUEUED,
+            "path": None,
+            "error": None,
+            "cached": False,
+            "submitted_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            "finished_at": None,
+        }
+        with self.lock:
+            # 作成済みならすぐに完了したジョブを返す
+            self._evict_finished()
+            if os.path.exists(path):
+                job.update(status=DONE, path=path, cached=True, finished_at=job["submitted_at"])
+                self.jobs[job["job_id"]] = job
+                self._mark_finished(job["job_id"])
+                return job["job_id"]
+            # 同じ条件を作成中ならそのジョブを返す
+            if key in self.active:
+                return self.active[key]
+            self.jobs[job["job_id"]] = job
+            self.active[key] = job["job_id"]
+
+        args = (_render_report_job, self.snapshot_root, self.geocode_table, path,
+                address, latitude, longitude, float(radius_km), scrape_date)
+        try:
+            try:
+                future = self.executor.submit(*args)
+            except BrokenProcessPool:
+                # ワーカープロセスが異常終了したプールには投入できないため作り直して1度だけ再投入する
+                self._replace_broken_executor()
+                future = self.executor.submit(*args)
+        except Exception as e:
+            # 投入できなかったジョブは失敗にし、同じ条件の依頼がこのジョブを待ち続けないようにする
+            with self.lock:
+                self.active.pop(key, None)
+                job.update(status=FAILED, error=str(e), finished_at=datetime.datetime.now(datetime.UTC).isoformat())
+                self._mark_finished(job["job_id"])
+            print(f"レポートの作成を開始できませんでした（{address}）: {str(e)}")
+            return job["job_id"]
+        job["future"] = future
+        future.add_done_callback(lambda f, job_id=job["job_id"]: self._finish(job_id, f))
+        return job["job_id"]
+
+    def _replace_broken_executor(self):
+        with self.lock:
+            broken = self.executor
+            if getattr(broken, "_broken", False):
+                self.executor = self._new_executor()
+        if broken is not self.executor:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, job_id, future):
+        with self.lock:
+            job = self.jobs[job_id]
+            self.active.pop(job["key"], None)
+            job["finished_at"] = datetime.datetime.now(datetime.UTC).isoformat()
+            error = future.exception()
+            if error is None:
+                job.update(status=DONE, path=future.result())
+            else:
+                job.update(status=FAILED, error=str(error))
+                print(f"レポートの作成に失敗しました（{job['address']}）: {str(error)}")
+            self._mark_finished(job_id)
+
+    def _mark_finished(self, job_id):
+        # self.lockを持った状態で呼ぶ
+        self.finished[job_id] = time.monotonic()
+        self._evict_finished()
+
+    def _evict_finished(self):
+        """終わってからfinished_ttl秒を過ぎたジョブと、max_finished件を超えた古いジョブを忘れる（self.lockを持った状態で呼ぶ）"""
+        expires = time.monotonic() - self.finished_ttl
+        while self.finished:
+            job_id, finished = next(iter(self.finished.items()))
+            if finished > expires and len(self.finished) <= self.max_finished:
+                break
+            self.finished.popitem(last=False)
+            self.jobs.pop(job_id, None)
+
+    def status(self, job_id):
+        """ジョブの状態を返す（不明なジョブID、または状態を忘れた終わったジョブならNone）"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            status = {name: value for name, value in job.items() if name != "future"}
+        if status["status"] == QUEUED and job.get("future") is not None and job["future"].running():
+            status["status"] = RUNNING
+        return status
+
+    def wait(self, job_id, timeout=None):
+        """ジョブが終わるまで待って状態を返す（スクリプトやバッチ処理向け）"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            future = job.get("future") if job is not None else None
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.status(job_id)
+
+    def latest_date(self):
+        from src.storage.snapshot_store import SnapshotStore
+
+        dates = SnapshotStore(self.snapshot_root).dates()
+        return dates[-1] if dates else None
+
+    def close(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _render_report_job(snapshot_root, geocode_table, path, address, latitude, longitude, radius_km, scrape_date):
+    """ワーカープロセスで実行する: データを読み込み、集計してPDFを書き出す"""
+    from src.analytics.area_stats import read_summary
+    from src.reports.pdf_report import build_area_report_data, render_area_report
+
+    if latitude is None or longitude is None:
+        if not geocode_table:
+            raise ValueError("住所から座標を求めるにはgeocode_tableが必要です")
+        point = _worker_geocoder(geocode_table).geocode(address)
+        if point is None:
+            raise ValueError(f"住所の座標が見つかりません: {address}")
+        latitude, longitude = point[0], point[1]
+
+    facilities = _worker_snapshot(snapshot_root, scrape_date)
+    data = build_area_report_data(facilities, latitude, longitude, radius_km)
+
+    # 中心の区の推移（集計テーブルがあれば）
+    ward_trend = None
+    ward = next((key for level, key in address_keys(address or "") if level == "city"), None)
+    ward_daily = read_summary(snapshot_root, "ward_daily")
+    if ward and len(ward_daily):
+        ward_trend = ward_daily[(ward_daily["ward"] == ward) & (ward_daily["scrape_date"].astype(str) <= scrape_date)]
+
+    label = address or f"{latitude:.5f}, {longitude:.5f}"
+    return render_area_report(path, data, label, radius_km, scrape_date, ward_trend=ward_trend)
+
+
+def _worker_snapshot(snapshot_root, scrape_date):
+    key = (snapshot_root, scrape_date)
+    if key not in _worker_facilities:
+        from src.storage.snapshot_store import SnapshotStore
+
+        # メモリを抑えるため、ワーカーごとに保持するのは直近に使った1日分だけ
+        _worker_facilities.clear()
+        _worker_facilities[key] = SnapshotStore(snapshot_root).read_columns(start_date=scrape_date, end_date=scrape_date)
+    return _worker_facilities[key]
+
+
+def _worker_geocoder(geocode_table):
+    if geocode_table not in _worker_geocoders:
+        from src.geo.geocode import Geocoder
+
+        _worker_geocoders[geocode_table] = Geocoder(geocode_table)
+    return _worker_geocoders[geocode_table]
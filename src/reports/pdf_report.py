@@ -0,0 +1,262 @@
+import os
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.area_stats import SIZE_BAND_EDGES, SIZE_BAND_LABELS
+from src.analytics.site_comparison import compare_sites
+from src.geo.spatial import haversine_km
+from src.scraper.facility import FLAG_FIELDS
+from src.storage.facility_columns import FacilityColumns
+
+# 日本語フォントの候補（インストールされているものを先頭から探す）
+JAPANESE_FONT_CANDIDATES = (
+    "Noto Sans CJK JP", "Noto Sans JP", "IPAexGothic", "IPAGothic", "IPAPGothic",
+    "Hiragino Sans", "Hiragino Kaku Gothic ProN", "Yu Gothic", "Meiryo", "TakaoPGothic", "VL PGothic",
+)
+
+# 候補にない日本語フォントを使う場合にフォントファイル（.ttf / .otf）のパスを指定する環境変数
+FONT_PATH_ENV = "TRUNKROOM_REPORT_FONT"
+
+# A4縦（インチ）
+PAGE_SIZE = (8.27, 11.69)
+
+# 物件一覧に載せる最大件数と1ページあたりの行数
+MAX_LISTING_ROWS = 150
+LISTING_ROWS_PER_PAGE = 35
+
+# 特徴フラグの表示名
+FLAG_LABELS = {
+    "has_alltime": "24時間利用",
+    "has_parking": "駐車場",
+    "has_elevator": "エレベーター",
+    "has_airconditioner": "空調",
+    "has_ventilator": "換気",
+    "has_security": "セキュリティ",
+}
+
+
+@lru_cache(maxsize=None)
+def setup_japanese_font():
+    """
+    matplotlibで日本語を表示できるフォントを設定し、そのフォント名を返す
+    FONT_PATH_ENVのフォントファイル、JAPANESE_FONT_CANDIDATESの順に探し、
+    見つからなければ警告を出して標準フォントのまま描画する（日本語は□になる）
+    """
+    from matplotlib import font_manager, rcParams
+
+    font_path = os.getenv(FONT_PATH_ENV)
+    if font_path and os.path.exists(font_path):
+        font_manager.fontManager.addfont(font_path)
+        name = font_manager.FontProperties(fname=font_path).get_name()
+    else:
+        installed = {font.name for font in font_manager.fontManager.ttflist}
+        name = next((candidate for candidate in JAPANESE_FONT_CANDIDATES if candidate in installed), None)
+
+    if name is None:
+        warnings.warn(
+            f"日本語フォントが見つかりません。{FONT_PATH_ENV}でフォントファイルを指定するか、"
+            "Noto Sans CJK JPなどをインストールしてください（日本語は正しく表示されません）"
+        )
+        return None
+    rcParams["font.family"] = "sans-serif"
+    rcParams["font.sans-serif"] = [name] + [f for f in rcParams["font.sans-serif"] if f != name]
+    # 日本語フォントにマイナス記号がない場合の文字化けを防ぐ
+    rcParams["axes.unicode_minus"] = False
+    return name
+
+
+def build_area_report_data(facilities, latitude, longitude, radius_km):
+    """
+    中心から半径radius_km以内の物件の集計と一覧を作る
+    戻り値は {"summary": 指標の辞書（compare_sitesの1行）, "facilities": 近い順の物件のDataFrame（distance_km列付き）}
+    """
+    if not isinstance(facilities, FacilityColumns):
+        facilities = FacilityColumns.from_pandas(facilities) if isinstance(facilities, pd.DataFrame) \
+            else FacilityColumns.from_records(list(facilities))
+    summary = compare_sites(facilities, [(latitude, longitude)], radii=(radius_km,)).iloc[0].to_dict()
+
+    df = facilities.to_pandas()
+    located = df["latitude"].notna() & df["longitude"].notna()
+    df = df[located]
+    distances = haversine_km(latitude, longitude, df["latitude"].to_numpy(), df["longitude"].to_numpy())
+    nearby = df.assign(distance_km=distances)[distances <= radius_km]
+    # 同じ物件IDは最後の行だけを使う（compare_sitesと同じ）
+    nearby = nearby.drop_duplicates("building_id", keep="last").sort_values("distance_km", kind="stable")
+    return {"summary": summary, "facilities": nearby.reset_index(drop=True)}
+
+
+def render_area_report(path, data, address, radius_km, scrape_date, ward_trend=None):
+    """
+    エリア分析の結果（build_area_report_dataの戻り値）を複数ページのPDFに書き出す
+    ページ構成: 概要 → グラフ（単価の分布・面積帯・特徴・屋内外）→ 区の推移（ward_trendがあれば）→ 物件一覧
+    書き込み途中のファイルを読まれないように一時ファイルに書いてから置き換える
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    font = setup_japanese_font()
+    title = f"トランクルーム エリアレポート: {address}"
+    tmp_path = f"{path}.tmp"
+    with warnings.catch_warnings(), PdfPages(tmp_path) as pdf:
+        if font is None:
+            # フォントがないことは警告済みなので、文字ごとの警告は出さない
+            warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+        for figure in (
+            _summary_page(plt, title, data, address, radius_km, scrape_date),
+            _chart_page(plt, data),
+            _trend_page(plt, ward_trend) if ward_trend is not None and len(ward_trend) else None,
+            *_listing_pages(plt, data["facilities"]),
+        ):
+            if figure is None:
+                continue
+            pdf.savefig(figure)
+            plt.close(figure)
+        info = pdf.infodict()
+        info["Title"] = title
+        info["Subject"] = f"半径{radius_km:g}km / データ日付 {scrape_date}"
+    os.replace(tmp_path, path)
+    return path
+
+
+def _summary_page(plt, title, data, address, radius_km, scrape_date):
+    summary = data["summary"]
+    figure = plt.figure(figsize=PAGE_SIZE)
+    figure.text(0.08, 0.94, title, fontsize=15, weight="bold")
+    figure.text(0.08, 0.91, f"中心: {address}（緯度 {summary['latitude']:.5f}, 経度 {summary['longitude']:.5f}）", fontsize=9)
+    figure.text(0.08, 0.89, f"半径: {radius_km:g} km　データ日付: {scrape_date}", fontsize=9)
+
+    rows = [
+        ("物件数", f"{summary['facility_count']:,}件"),
+        ("単価のある物件数", f"{summary['priced_count']:,}件"),
+        ("単価の中央値（最低賃料 / 最小面積）", _format_yen(summary["median_price_per_sqm"], "円/㎡")),
+        ("屋内の割合", _format_share(summary["indoor_share"])),
+        ("屋外の割合", _format_share(summary["outdoor_share"])),
+    ] + [(f"{FLAG_LABELS.get(flag, flag)}の割合", _format_share(summary[f"{flag}_share"])) for flag in FLAG_FIELDS]
+    ax = figure.add_axes([0.08, 0.45, 0.84, 0.4])
+    ax.axis("off")
+    table = ax.table(cellText=rows, colLabels=("指標", "値"), colWidths=(0.65, 0.35), loc="upper left", cellLoc="left")
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.scale(1, 1.5)
+    return figure
+
+
+def _chart_page(plt, data):
+    summary = data["summary"]
+    df = data["facilities"]
+    price = pd.to_numeric(df["min_price"], errors="coerce").astype(float)
+    size = pd.to_numeric(df["min_size"], errors="coerce").astype(float)
+    price_per_sqm = (price / size).where((price > 0) & (size > 0)).dropna()
+
+    figure, axes = plt.subplots(2, 2, figsize=PAGE_SIZE)
+    figure.suptitle("エリア内の物件の分布", fontsize=13)
+
+    ax = axes[0][0]
+    if len(price_per_sqm):
+        ax.hist(price_per_sqm, bins=min(20, max(5, len(price_per_sqm) // 3)), color="#4c72b0")
+        ax.axvline(price_per_sqm.median(), color="#c44e52", linestyle="--", label="中央値")
+        ax.legend(fontsize=8)
+    ax.set_title("単価の分布（円/㎡）", fontsize=10)
+    ax.set_ylabel("物件数")
+
+    ax = axes[0][1]
+    bands = pd.cut(size.where(size > 0), SIZE_BAND_EDGES, right=False, labels=SIZE_BAND_LABELS)
+    counts = bands.value_counts().reindex(SIZE_BAND_LABELS, fill_value=0)
+    ax.bar(range(len(counts)), counts.to_numpy(), color="#55a868")
+    ax.set_xticks(range(len(counts)), counts.index, rotation=30, fontsize=8)
+    ax.set_title("面積帯（最小面積）", fontsize=10)
+    ax.set_ylabel("物件数")
+
+    ax = axes[1][0]
+    shares = [np.nan_to_num(summary[f"{flag}_share"]) * 100 for flag in FLAG_FIELDS]
+    ax.barh([FLAG_LABELS.get(flag, flag) for flag in FLAG_FIELDS], shares, color="#8172b2")
+    ax.set_xlim(0, 100)
+    ax.invert_yaxis()
+    ax.set_title("特徴を持つ物件の割合（%）", fontsize=10)
+
+    ax = axes[1][1]
+    indoor = np.nan_to_num(summary["indoor_share"])
+    outdoor = np.nan_to_num(summary["outdoor_share"])
+    other = max(0.0, 1.0 - indoor - outdoor) if summary["facility_count"] else 0.0
+    if summary["facility_count"]:
+        ax.pie([indoor, outdoor, other], labels=["屋内", "屋外", "不明"], autopct="%1.0f%%",
+               colors=["#4c72b0", "#dd8452", "#cccccc"], textprops={"fontsize": 8})
+    else:
+        ax.axis("off")
+        ax.text(0.5, 0.5, "物件がありません", ha="center", va="center")
+    ax.set_title("屋内・屋外の構成", fontsize=10)
+
+    figure.tight_layout(rect=(0, 0, 1, 0.96))
+    return figure
+
+
+def _trend_page(plt, ward_trend):
+    """区の集計（ward_daily）の推移"""
+    trend = ward_trend.sort_values("scrape_date")
+    dates = trend["scrape_date"].astype(str)
+    figure, axes = plt.subplots(2, 1, figsize=PAGE_SIZE, sharex=True)
+    figure.suptitle(f"{trend['ward'].iloc[0]}の推移", fontsize=13)
+    axes[0].plot(dates, trend["median_price_per_sqm"], marker="o", color="#4c72b0")
+    axes[0].set_title("単価の中央値（円/㎡）", fontsize=10)
+    axes[1].plot(dates, trend["vacancy_rate"] * 100, marker="o", color="#c44e52")
+    axes[1].set_title("空室率（%）", fontsize=10)
+    for label in axes[1].get_xticklabels():
+        label.set_rotation(45)
+        label.set_fontsize(7)
+    figure.tight_layout(rect=(0, 0, 1, 0.96))
+    return figure
+
+
+def _listing_pages(plt, df):
+    rows = df.head(MAX_LISTING_ROWS)
+    if len(rows) == 0:
+        return []
+    figures = []
+    for start in range(0, len(rows), LISTING_ROWS_PER_PAGE):
+        page = rows.iloc[start:start + LISTING_ROWS_PER_PAGE]
+        cells = [
+            (
+                _truncate(row["name"], 22),
+                f"{row['distance_km']:.2f}",
+                row["location_type"] if isinstance(row["location_type"], str) else "",
+                _format_range(row["min_size"], row["max_size"], "㎡"),
+                _format_range(row["min_price"], row["max_price"], "円"),
+            )
+            for _, row in page.iterrows()
+        ]
+        figure = plt.figure(figsize=PAGE_SIZE)
+        figure.text(0.08, 0.95, f"物件一覧（近い順、{start + 1}〜{start + len(page)}件目 / 全{len(df)}件）", fontsize=11)
+        ax = figure.add_axes([0.05, 0.05, 0.9, 0.88])
+        ax.axis("off")
+        table = ax.table(cellText=cells, colLabels=("名前", "距離(km)", "タイプ", "広さ", "賃料"),
+                         colWidths=(0.38, 0.1, 0.1, 0.2, 0.22), loc="upper center", cellLoc="left")
+        table.auto_set_font_size(False)
+        table.set_fontsize(7)
+        figures.append(figure)
+    return figures
+
+
+def _format_share(value):
+    return "-" if value is None or np.isnan(value) else f"{value * 100:.0f}%"
+
+
+def _format_yen(value, unit):
+    return "-" if value is None or np.isnan(value) else f"{value:,.0f}{unit}"
+
+
+def _format_range(low, high, unit):
+    if not low and not high:
+        return "-"
+    if not high or low == high:
+        return f"{low:,g}{unit}"
+    return f"{low:,g}〜{high:,g}{unit}"
+
+
+def _truncate(text, length):
+    text = text if isinstance(text, str) else ""
+    return text if len(text) <= length else text[:length - 1] + "…"
@@ -0,0 +1,140 @@
+import datetime
+import time
+
+from src.scraper.metrics import DB_ROWS, DB_WRITE_SECONDS
+
+# 物件を一意に識別するキー（Supabase側に同じ列のユニーク制約が必要。supabase/migrations を参照）
+FACILITY_KEY_COLUMNS = ("building_id", "unit")
+
+
+class SupabaseBatchWriter:
+    """
+    スクレイピング結果をバッチ単位でSupabaseにupsertするライター
+
+    add()で受け取った行をbatch_size件ずつまとめて1回のリクエストで書き込む。
+    building_id + unit をキーにupsertするため、日次で再実行しても行は増えない。
+    created_at（初めて掲載を確認した日時）はDB側のデフォルトで挿入時だけ設定し、
+    upsertのたびにupdated_at（最後に確認した日時）を更新する。
+    失敗したバッチは指数バックオフでmax_retries回まで再試行する。
+
+    例:
+        with SupabaseBatchWriter(batch_size=500) as writer:
+            for prop in properties:
+                writer.add(prop)
+        print(writer.summary())
+    """
+
+    def __init__(self, table_name="storage_facilities", batch_size=500, key_columns=FACILITY_KEY_COLUMNS,
+                 max_retries=3, backoff=1.0, verbose=False, client=None):
+        self.table_name = table_name
+        self.batch_size = max(1, batch_size)
+        self.key_columns = tuple(key_columns)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.verbose = verbose
+        self.client = client
+        self.buffer = []
+        self.saved_count = 0
+        self.failed_count = 0
+        self.skipped_count = 0
+        # バッチごとの結果 {"rows", "seconds", "attempts", "ok"}
+        self.batches = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def add(self, row):
+        """1行をバッファに追加し、batch_sizeに達したら書き込む"""
+        if not row.get(self.key_columns[0]):
+            # キーがない行はupsertで重複を防げないため保存しない
+            self.skipped_count += 1
+            return
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def flush(self):
+        """バッファ内の行を書き込む。書き込めた件数を返す"""
+        if not self.buffer:
+            return 0
+
+        rows = self._prepare_rows(self.buffer)
+        self.buffer = []
+
+        started = time.perf_counter()
+        ok, attempts = self._upsert_with_retry(rows)
+        seconds = time.perf_counter() - started
+
+        self.batches.append({"rows": len(rows), "seconds": seconds, "attempts": attempts, "ok": ok})
+        result = "ok" if ok else "failed"
+        DB_WRITE_SECONDS.observe(seconds, table=self.table_name, result=result)
+        DB_ROWS.inc(len(rows), table=self.table_name, result=result)
+        if ok:
+            self.saved_count += len(rows)
+        else:
+            self.failed_count += len(rows)
+
+        if self.verbose:
+            status = "成功" if ok else "失敗"
+            print(f"- バッチ{len(self.batches)}: {len(rows)}件 {seconds:.2f}秒 ({attempts}回目で{status})")
+
+        return len(rows) if ok else 0
+
+    def summary(self):
+        """書き込み結果の集計を返す"""
+        latencies = sorted(batch["seconds"] for batch in self.batches)
+        return {
+            "saved": self.saved_count,
+            "failed": self.failed_count,
+            "skipped": self.skipped_count,
+            "batches": len(self.batches),
+            "total_seconds": sum(latencies),
+            "max_batch_seconds": latencies[-1] if latencies else 0.0,
+            "median_batch_seconds": latencies[len(latencies) // 2] if latencies else 0.0,
+        }
+
+    def _prepare_rows(self, rows):
+        """キーの補完・更新日時の付与と、同一バッチ内のキー重複の除去を行う"""
+        now = datetime.datetime.now(datetime.UTC).isoformat()
+        unique_rows = {}
+        for row in rows:
+            data = dict(row)
+            for column in self.key_columns[1:]:
+                data.setdefault(column, "")
+            # created_atは送らない（既存の行の値を上書きしない）
+            data.pop("created_at", None)
+            data["updated_at"] = now
+            # 同じバッチ内で同じキーを2回upsertするとエラーになるため後勝ちで1行にする
+            unique_rows[tuple(str(data[column]) for column in self.key_columns)] = data
+        return list(unique_rows.values())
+
+    def _upsert_with_retry(self, rows):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                client = self._get_client()
+                client.table(self.table_name).upsert(rows, on_conflict=",".join(self.key_columns)).execute()
+                return True, attempt
+            except Exception as e:
+                if attempt > self.max_retries:
+                    print(f"データベース保存中にエラーが発生しました（{len(rows)}件）: {str(e)}")
+                    return False, attempt
+                wait = self.backoff * (2 ** (attempt - 1))
+                if self.verbose:
+                    print(f"- バッチ保存に失敗しました。{wait:.1f}秒後に再試行します: {str(e)}")
+                time.sleep(wait)
+
+    def _get_client(self):
+        if self.client is None:
+            from src.auth.auth import get_supabase_client
+            self.client = get_supabase_client()
+        return self.client
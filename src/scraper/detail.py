@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.scraper.extract import parse_price_range, parse_size_range
+from src.scraper.http_client import fetch_html
+from src.scraper.parsers import HAS_LXML
+
+# 詳細ページを同時に取得する数のデフォルト
+DEFAULT_DETAIL_WORKERS = 4
+
+# 区画の行とみなす要素（表の行、またはroom / unit / planを含むクラスの要素）
+UNIT_ROW_SELECTOR = "tr, li[class*=room], li[class*=unit], li[class*=plan], div[class*=room], div[class*=unit], div[class*=plan]"
+
+# 区画IDを持つデータ属性の候補
+UNIT_ID_ATTRIBUTES = ("data-unit_id", "data-room_id", "data-unit-id", "data-room-id", "data-id")
+
+# 空室状況の表記（「空室待ち」などを空室と誤判定しないよう満室側を先に判定する）
+FULL_LABELS = ("満室", "空室待ち", "空き待ち", "キャンセル待ち", "予約受付中")
+VACANT_LABELS = ("空室", "空きあり", "空き有", "空有", "即入居可")
+
+# ハッシュ計算の前に除く部分（アクセスごとに変わるトークンなどを含むため）
+_VOLATILE_RE = re.compile(r"<script\b.*?</script>|<!--.*?-->", re.DOTALL | re.IGNORECASE)
+
+
+def content_hash(html):
+    """詳細ページの内容のハッシュ値（script・コメントを除いて計算する）"""
+    return hashlib.sha1(_VOLATILE_RE.sub("", html).encode("utf-8")).hexdigest()
+
+
+def parse_status(text):
+    """テキストから空室状況（空室 / 満室）を判定する。判定できなければNone"""
+    if any(label in text for label in FULL_LABELS):
+        return "満室"
+    if any(label in text for label in VACANT_LABELS):
+        return "空室"
+    return None
+
+
+def parse_detail_page(html, building_id):
+    """
+    物件の詳細ページから区画ごとの {building_id, unit, size, price, status} を抽出する
+    広さと料金の両方が読み取れた行だけを区画とみなす。
+    区画IDは行のデータ属性、なければ広さ・料金・空室状況以外の最初のセルのテキスト、
+    それもなければページ内の通し番号にする
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml" if HAS_LXML else "html.parser")
+    rows = soup.select(UNIT_ROW_SELECTOR)
+    # 入れ子になった候補は最も内側の要素だけを使う（表の行はそのまま使う）
+    row_ids = {id(row) for row in rows}
+    rows = [row for row in rows
+            if row.name == "tr" or not any(id(child) in row_ids for child in row.find_all(True))]
+
+    units = []
+    seen = set()
+    for row in rows:
+        cells = [cell.get_text(" ", strip=True) for cell in row.find_all(["td", "th"] if row.name == "tr" else True, recursive=False)]
+        cells = [cell for cell in cells if cell] or [row.get_text(" ", strip=True)]
+
+        size = price = status = label = None
+        for cell in cells:
+            if size is None and (parsed := parse_size_range(cell)):
+                size = parsed[0]
+                continue
+            if price is None and (parsed := parse_price_range(cell)):
+                price = parsed[0]
+                continue
+            if status is None and (parsed := parse_status(cell)):
+                status = parsed
+                continue
+            if label is None:
+                label = cell
+        if size is None or price is None:
+            continue
+
+        unit = next((row.get(attr) for attr in UNIT_ID_ATTRIBUTES if row.get(attr)), None) or label or str(len(units) + 1)
+        if unit in seen:
+            unit = f"{unit}-{len(units) + 1}"
+        seen.add(unit)
+        units.append({
+            "building_id": building_id,
+            "unit": unit,
+            "size": size,
+            "price": price,
+            "status": status or parse_status(row.get_text(" ", strip=True)),
+        })
+    return units
+
+
+def building_status(units):
+    """区画の空室状況から物件全体の空室状況を決める（1区画でも空室なら空室）"""
+    statuses = [unit["status"] for unit in units if unit.get("status")]
+    if not statuses:
+        return None
+    return "空室" if "空室" in statuses else "満室"
+
+
+class DetailEnricher:
+    """
+    一覧ページで取得した物件の詳細ページを取得し、区画ごとの広さ・料金・空室状況を付け加える
+
+    詳細ページはmax_workers件まで同時に取得する。
+    前回取得した詳細ページの内容のハッシュ値をstate_path（JSON）に保存しておき、
+    内容が変わっていない物件は解析もDBへの書き込みもしない（物件の空室状況は前回の値を使う）。
+    ハッシュ値はenrich()の時点では保留にし、区画の行のDBへの書き込みが確定してからcommit()で記録する
+    （書き込みに失敗した物件はdiscard()で捨て、次回取得し直す）。
+    レスポンスキャッシュ（configure_http）を使っていれば、未更新のページは条件付きGETで本文も転送されない
+    """
+
+    def __init__(self, max_workers=DEFAULT_DETAIL_WORKERS, state_path=None, verbose=False):
+        self.max_workers = max(1, max_workers)
+        self.state_path = state_path
+        self.verbose = verbose
+        self.state = {}
+        # DBへの書き込みが確定していない物件のハッシュ値（building_id → {"hash", "status"}）
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.counts = {"fetched": 0, "unchanged": 0, "failed": 0, "units": 0}
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def enrich(self, properties, rate_limiter=None):
+        """
+        物件データに空室状況（status）を付与し、内容が変わった物件の区画の行を返す
+        区画の行は物件データのunit / status と広さ・料金（min_* / max_*）を区画の値にしたもの（(building_id, unit)でupsertする）
+        """
+        targets = [prop for prop in properties if prop.get("detail_url") and prop.get("building_id")]
+        if not targets:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda prop: self._enrich_one(prop, rate_limiter), targets))
+        return [row for rows in results for row in rows]
+
+    def _enrich_one(self, prop, rate_limiter):
+        building_id = str(prop["building_id"])
+        try:
+            html = fetch_html(prop["detail_url"], rate_limiter=rate_limiter)
+        except Exception as e:
+            with self.lock:
+                self.counts["failed"] += 1
+            if self.verbose:
+                print(f"物件ID {building_id} の詳細ページの取得に失敗しました: {str(e)}")
+            return []
+
+        hash_value = content_hash(html)
+        with self.lock:
+            previous = self.state.get(building_id)
+        if previous and previous.get("hash") == hash_value:
+            prop["status"] = previous.get("status")
+            with self.lock:
+                self.counts["unchanged"] += 1
+            return []
+
+        units = parse_detail_page(html, building_id)
+        status = building_status(units)
+        prop["status"] = status
+        rows = [
+            {**prop, "unit": unit["unit"], "status": unit["status"],
+             "min_size": unit["size"], "max_size": unit["size"], "min_price": unit["price"], "max_price": unit["price"]}
+            for unit in units
+        ]
+        with self.lock:
+            self.pending[building_id] = {"hash": hash_value, "status": status}
+            self.counts["fetched"] += 1
+            self.counts["units"] += len(rows)
+        return rows
+
+    def commit(self, building_ids=None):
+        """区画の行の書き込みが確定した物件のハッシュ値を記録する（building_ids省略時は保留中のすべて）"""
+        with self.lock:
+            for building_id in self._pending_ids(building_ids):
+                self.state[building_id] = self.pending.pop(building_id)
+                self.dirty = True
+
+    def discard(self, building_ids=None):
+        """書き込みに失敗した物件のハッシュ値を捨てる（次回は内容が同じでも取得・書き込みし直す）"""
+        with self.lock:
+            for building_id in self._pending_ids(building_ids):
+                del self.pending[building_id]
+
+    def _pending_ids(self, building_ids):
+        if building_ids is None:
+            return list(self.pending)
+        return [str(building_id) for building_id in building_ids if str(building_id) in self.pending]
+
+    def summary(self):
+        return dict(self.counts)
+
+    def save_state(self):
+        """詳細ページのハッシュ値をstate_pathに書き出す"""
+        if not self.state_path or not self.dirty:
+            return
+        with self.lock:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+            self.dirty = False
@@ -0,0 +1,146 @@
+import re
+import unicodedata
+
+# 1帖（畳）あたりの面積（㎡）。不動産の表示規約に合わせて1.62㎡で換算する
+JO_TO_SQUARE_METERS = 1.62
+
+# 正規表現は読み込み時に一度だけコンパイルする
+# 入力はNFKC正規化（全角数字・「～」「㎡」「m²」などを半角に統一）し、桁区切りと空白を除いてから照合する
+_RANGE_SEPARATOR = r"[~〜\-−]"
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_SIZE_UNIT = r"(m2|平米|平方メートル|帖|畳)"
+_JO_UNITS = ("帖", "畳")
+
+# 例: "4400円/月~24200円/月", "4400円(税込)~24200円(税込)"
+_PRICE_RANGE_RE = re.compile(r"(\d+)円[^\d~〜\-−]*" + _RANGE_SEPARATOR + r"(\d+)円")
+# 例: "4400円/月", "月額4400円(税込)"
+_PRICE_SINGLE_RE = re.compile(r"(\d+)円")
+# 例: "1.01m2~4.32m2", "1~4.5帖"（最小側の単位は省略可）
+_SIZE_RANGE_RE = re.compile(_NUMBER + _SIZE_UNIT + "?" + _RANGE_SEPARATOR + _NUMBER + _SIZE_UNIT)
+# 例: "2.5m2", "3帖"
+_SIZE_SINGLE_RE = re.compile(_NUMBER + _SIZE_UNIT)
+_NOISE_RE = re.compile(r"[,\s]")
+
+
+def _normalize(text):
+    return _NOISE_RE.sub("", unicodedata.normalize("NFKC", text))
+
+
+def _to_square_meters(value, unit):
+    size = float(value)
+    if unit in _JO_UNITS:
+        size = round(size * JO_TO_SQUARE_METERS, 2)
+    return size
+
+
+def parse_price_range(price_text):
+    """価格範囲テキストから (最小, 最大) を抽出する。読み取れなければNone"""
+    if not isinstance(price_text, str):
+        return None
+    text = _normalize(price_text)
+
+    # 範囲表記の場合
+    match = _PRICE_RANGE_RE.search(text)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+
+    # 単一価格の場合
+    match = _PRICE_SINGLE_RE.search(text)
+    if match:
+        price = int(match.group(1))
+        return price, price
+
+    return None
+
+
+def parse_size_range(size_text):
+    """サイズ範囲テキストから (最小, 最大) を㎡で抽出する。読み取れなければNone"""
+    if not isinstance(size_text, str):
+        return None
+    text = _normalize(size_text)
+
+    # 範囲表記の場合
+    match = _SIZE_RANGE_RE.search(text)
+    if match:
+        min_value, min_unit, max_value, max_unit = match.groups()
+        return _to_square_meters(min_value, min_unit or max_unit), _to_square_meters(max_value, max_unit)
+
+    # 単一サイズの場合
+    match = _SIZE_SINGLE_RE.search(text)
+    if match:
+        size = _to_square_meters(*match.groups())
+        return size, size
+
+    return None
+
+
+def extract_price_range(price_text):
+    """価格範囲テキストから最小・最大価格を抽出
+    例: "4,400円/月～24,200円/月" → (4400, 24200)
+    読み取れない場合は (0, 0)
+    """
+    return parse_price_range(price_text) or (0, 0)
+
+
+def extract_size_range(size_text):
+    """サイズ範囲テキストから最小・最大サイズを抽出
+    例: "1.01m²～4.32m²" → (1.01, 4.32)、"2帖" → (3.24, 3.24)
+    読み取れない場合は (0.0, 0.0)
+    """
+    return parse_size_range(size_text) or (0.0, 0.0)
+
+
+def _normalize_series(series):
+    return series.astype("string").str.normalize("NFKC").str.replace(_NOISE_RE.pattern, "", regex=True)
+
+
+def extract_price_ranges(price_texts):
+    """
+    価格テキストのSeriesから最小・最大価格をまとめて抽出する（ベクトル化版）
+    戻り値はmin_price / max_price（Int64、読み取れない行は<NA>）と
+    price_parse_failed（bool）の3列のDataFrame
+    """
+    import pandas as pd
+
+    text = _normalize_series(pd.Series(price_texts))
+    ranges = text.str.extract(_PRICE_RANGE_RE.pattern)
+    single = text.str.extract(_PRICE_SINGLE_RE.pattern)[0]
+
+    min_price = pd.to_numeric(ranges[0].fillna(single)).astype("Int64")
+    max_price = pd.to_numeric(ranges[1].fillna(single)).astype("Int64")
+    return pd.DataFrame({
+        "min_price": min_price,
+        "max_price": max_price,
+        "price_parse_failed": min_price.isna().to_numpy(dtype=bool),
+    }, index=text.index)
+
+
+def extract_size_ranges(size_texts):
+    """
+    サイズテキストのSeriesから最小・最大サイズ（㎡）をまとめて抽出する（ベクトル化版）
+    帖・畳は1.62㎡で換算する。戻り値はmin_size / max_size（float、読み取れない行はNaN）と
+    size_parse_failed（bool）の3列のDataFrame
+    """
+    import numpy as np
+    import pandas as pd
+
+    text = _normalize_series(pd.Series(size_texts))
+    ranges = text.str.extract(_SIZE_RANGE_RE.pattern)
+    single = text.str.extract(_SIZE_SINGLE_RE.pattern)
+
+    min_value = ranges[0].fillna(single[0])
+    max_value = ranges[2].fillna(single[0])
+    min_unit = ranges[1].fillna(ranges[3]).fillna(single[1])
+    max_unit = ranges[3].fillna(single[1])
+
+    def to_square_meters(values, units):
+        sizes = pd.to_numeric(values).astype(float).to_numpy()
+        is_jo = units.isin(_JO_UNITS).to_numpy(dtype=bool)
+        return np.where(is_jo, np.round(sizes * JO_TO_SQUARE_METERS, 2), sizes)
+
+    min_size = to_square_meters(min_value, min_unit)
+    return pd.DataFrame({
+        "min_size": min_size,
+        "max_size": to_square_meters(max_value, max_unit),
+        "size_parse_failed": np.isnan(min_size),
+    }, index=text.index)
@@ -0,0 +1,64 @@
+from dataclasses import dataclass, fields
+
+from src.scraper.parsers import FEATURE_KEYS
+
+# 特徴フラグ（has_*）の項目名。FacilityColumnsのビットフィールドではこの順にビット0, 1, ...を使う
+FLAG_FIELDS = tuple(key for _, key in FEATURE_KEYS)
+
+
+@dataclass(slots=True)
+class Facility:
+    """
+    一覧ページから抽出した1物件のデータ（parse_listing_pageの辞書と同じ項目）
+
+    __slots__を使うため辞書より1件あたりのメモリが小さい。
+    DB・CSVへの書き込みなど辞書が必要な箇所ではto_dict()で従来と同じ辞書に戻す
+    """
+
+    building_id: str | None = None
+    name: str = "不明"
+    address: str = ""
+    location_type: str = "不明"
+    access: str = ""
+    min_size: float = 0.0
+    max_size: float = 0.0
+    min_price: int = 0
+    max_price: int = 0
+    has_alltime: bool = False
+    has_parking: bool = False
+    has_elevator: bool = False
+    has_airconditioner: bool = False
+    has_ventilator: bool = False
+    has_security: bool = False
+    detail_url: str | None = None
+    status: str | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """物件データの辞書から作成する（未知の項目は無視する）"""
+        return cls(**{name: data[name] for name in FIELD_NAMES if name in data and data[name] is not None})
+
+    def to_dict(self):
+        """parse_listing_pageと同じ形式の辞書を返す（値のない任意項目は含めない）"""
+        data = {}
+        for name in FIELD_NAMES:
+            value = getattr(self, name)
+            if value is None and name in OPTIONAL_FIELDS:
+                continue
+            data[name] = value
+        return data
+
+    @property
+    def flags(self):
+        """特徴フラグのビットフィールド（FLAG_FIELDSの順にビット0, 1, ...）"""
+        bits = 0
+        for bit, name in enumerate(FLAG_FIELDS):
+            if getattr(self, name):
+                bits |= 1 << bit
+        return bits
+
+
+FIELD_NAMES = tuple(field.name for field in fields(Facility))
+OPTIONAL_FIELDS = ("detail_url", "status", "latitude", "longitude")
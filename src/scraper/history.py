@@ -0,0 +1,199 @@
+import datetime
+import hashlib
+import json
+import time
+
+from src.scraper.db_writer import FACILITY_KEY_COLUMNS, SupabaseBatchWriter
+
+# 変更検知の対象にする項目（ここに含まれない項目が変わっても履歴には残さない）
+HASHED_FIELDS = (
+    "name", "address", "location_type", "access",
+    "min_size", "max_size", "min_price", "max_price",
+    "has_alltime", "has_parking", "has_elevator", "has_airconditioner", "has_ventilator", "has_security",
+    "status",
+)
+
+# 既知の状態を読み込むときの1リクエストあたりの行数
+STATE_PAGE_SIZE = 1000
+
+
+def facility_key(record):
+    """物件を一意に識別するキー（building_id, unit）"""
+    return tuple(str(record.get(column) or "") for column in FACILITY_KEY_COLUMNS)
+
+
+def record_hash(record):
+    """変更検知の対象項目からハッシュ値を計算する"""
+    payload = {field: record.get(field) for field in HASHED_FIELDS}
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def build_history_event(record, change_type, snapshot_date, hash_value):
+    """履歴テーブルに書き込む1行（README の history: {date, status, price} に対応）"""
+    key = facility_key(record)
+    return {
+        "building_id": key[0],
+        "unit": key[1],
+        "date": snapshot_date,
+        "change_type": change_type,
+        "status": record.get("status"),
+        "price": record.get("min_price"),
+        "min_price": record.get("min_price"),
+        "max_price": record.get("max_price"),
+        "min_size": record.get("min_size"),
+        "max_size": record.get("max_size"),
+        "record_hash": hash_value,
+    }
+
+
+class IncrementalHistoryWriter:
+    """
+    前回の状態と比較して変化した物件だけを書き込むライター
+
+    storage_facilities の record_hash 列を前回の状態として読み込み、
+    ハッシュが変わった（または新規の）物件だけを
+      - storage_facilities にupsert（最新状態の更新）
+      - storage_facility_history に変更イベントとして追加
+    する。変化のない物件には一切書き込まない。
+    掲載終了（前回あって今回ない物件）はスクレイピング範囲が分からないため扱わない。
+    batch_size件ごとに履歴を先に書き込み、成功したときだけ状態（record_hash）を書き込む。
+    履歴の書き込みに失敗した物件は状態も更新しないため、次回も変更として検出され履歴が書き直される。
+
+    SupabaseBatchWriter と同じく add / add_many / flush / summary を持つ
+    """
+
+    def __init__(self, table_name="storage_facilities", history_table="storage_facility_history",
+                 batch_size=500, max_retries=3, backoff=1.0, verbose=False, client=None, snapshot_date=None):
+        self.table_name = table_name
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.verbose = verbose
+        self.client = client
+        self.snapshot_date = snapshot_date or datetime.date.today().isoformat()
+        self.state_writer = SupabaseBatchWriter(table_name, batch_size=batch_size, max_retries=max_retries,
+                                                backoff=backoff, verbose=verbose, client=client)
+        self.history_writer = SupabaseBatchWriter(
+            history_table, batch_size=batch_size, key_columns=FACILITY_KEY_COLUMNS + ("date",),
+            max_retries=max_retries, backoff=backoff, verbose=verbose, client=client
+        )
+        self.known_hashes = None
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+        # 書き込み待ちの (状態の行, 履歴の行)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def load_known_hashes(self):
+        """
+        storage_facilities から (building_id, unit) → record_hash を読み込む
+        失敗したページは指数バックオフでmax_retries回まで読み直し、それでも失敗したら例外を送出する
+        """
+        known = {}
+        start = 0
+        while True:
+            rows = self._select_with_retry(start)
+            for row in rows:
+                known[facility_key(row)] = row.get("record_hash")
+            if len(rows) < STATE_PAGE_SIZE:
+                break
+            start += STATE_PAGE_SIZE
+
+        if self.verbose:
+            print(f"- 前回の状態を{len(known)}件読み込みました")
+        self.known_hashes = known
+        return known
+
+    def _select_with_retry(self, start):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = (
+                    self._get_client().table(self.table_name)
+                    .select(",".join(FACILITY_KEY_COLUMNS) + ",record_hash")
+                    .range(start, start + STATE_PAGE_SIZE - 1)
+                    .execute()
+                )
+                return result.data or []
+            except Exception as e:
+                if attempt > self.max_retries:
+                    raise RuntimeError(f"前回の状態を読み込めませんでした（{self.table_name}）: {str(e)}") from e
+                wait = self.backoff * (2 ** (attempt - 1))
+                if self.verbose:
+                    print(f"- 前回の状態の読み込みに失敗しました。{wait:.1f}秒後に再試行します: {str(e)}")
+                time.sleep(wait)
+
+    def add(self, record):
+        if self.known_hashes is None:
+            self.load_known_hashes()
+
+        if not record.get(FACILITY_KEY_COLUMNS[0]):
+            # 物件IDのない行は保存されないため新規・変更として数えず、state_writerのskippedに数える
+            self.state_writer.add(record)
+            return
+
+        key = facility_key(record)
+        hash_value = record_hash(record)
+        if key not in self.known_hashes:
+            change_type = "new"
+        elif self.known_hashes[key] == hash_value:
+            self.counts["unchanged"] += 1
+            return
+        else:
+            # record_hashがNULLの既存行（ハッシュ導入前の行）も変更として扱う
+            change_type = "changed"
+        self.counts[change_type] += 1
+        self.known_hashes[key] = hash_value
+
+        self.pending.append((
+            {**record, "record_hash": hash_value},
+            build_history_event(record, change_type, self.snapshot_date, hash_value),
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+
+    def flush(self):
+        """履歴を書き込み、成功したら状態を書き込む。状態を書き込めた件数を返す"""
+        if not self.pending:
+            return 0
+        pending, self.pending = self.pending, []
+
+        history_failed = self.history_writer.failed_count
+        self.history_writer.add_many(history for _, history in pending)
+        self.history_writer.flush()
+        if self.history_writer.failed_count > history_failed:
+            # 状態を書き込まなければ次回もハッシュが変わった物件として履歴を書き直せる
+            print(f"- 履歴を書き込めなかったため{len(pending)}件の状態を更新しませんでした")
+            return 0
+
+        saved = self.state_writer.saved_count
+        self.state_writer.add_many(state for state, _ in pending)
+        self.state_writer.flush()
+        return self.state_writer.saved_count - saved
+
+    def summary(self):
+        summary = self.state_writer.summary()
+        # 履歴を書き込めなかった物件（状態も更新していない）は失敗として数える
+        summary["failed"] += self.history_writer.summary()["failed"]
+        # 変化のない物件は書き込み不要のため保存済みとして数える
+        summary["saved"] += self.counts["unchanged"]
+        summary.update(self.counts)
+        summary["history_batches"] = self.history_writer.summary()["batches"]
+        return summary
+
+    def _get_client(self):
+        if self.client is None:
+            from src.auth.auth import get_supabase_client
+            self.client = get_supabase_client()
+        return self.client
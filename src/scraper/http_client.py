@@ -0,0 +1,171 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+
+from src.scraper.metrics import REQUEST_SECONDS, RESPONSE_BYTES
+
+# User-Agentを設定してブロックを回避
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 30
+
+# 共有セッションとキャッシュの設定（configure_httpで変更）
+_session = None
+_session_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+_cache = None
+_offline = False
+
+
+def __getattr__(name):
+    # requestsは最初に通信するときまで読み込まない（--helpなどでは読み込まない）ため、
+    # requestsの例外を基底にする名前はモジュール属性として参照されたときに解決する
+    if name == "RequestException":
+        from requests.exceptions import RequestException
+        return RequestException
+    if name == "OfflineCacheMiss":
+        return _offline_cache_miss_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@lru_cache(maxsize=None)
+def _offline_cache_miss_class():
+    from requests.exceptions import RequestException
+
+    class OfflineCacheMiss(RequestException):
+        """オフライン再生モードでキャッシュにないURLを要求した"""
+
+    return OfflineCacheMiss
+
+
+class ResponseCache:
+    """
+    URLをキーにしたディスク上のレスポンスキャッシュ
+    本文を<sha256>.html、ETag/Last-Modifiedなどのメタ情報を<sha256>.jsonに保存する
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, ext):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+
+    def get(self, url):
+        """(メタ情報, 本文) を返す。キャッシュになければNone"""
+        meta_path = self._path(url, "json")
+        body_path = self._path(url, "html")
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, encoding="utf-8") as f:
+            body = f.read()
+        return meta, body
+
+    def put(self, url, response):
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        }
+        self._write(self._path(url, "html"), response.text)
+        self._write(self._path(url, "json"), json.dumps(meta, ensure_ascii=False))
+
+    def _write(self, path, text):
+        # 並列取得中でも壊れたファイルを読まないように一時ファイルから置き換える
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def configure_http(pool_size=None, cache_dir=None, offline=False):
+    """
+    共有セッションの接続プールサイズ、レスポンスキャッシュ、オフライン再生モードを設定する
+    offline=Trueの場合はネットワークにアクセスせずキャッシュ済みのHTMLだけを返す
+    """
+    global _session, _pool_size, _cache, _offline
+    if offline and not cache_dir:
+        raise ValueError("オフライン再生モードにはキャッシュディレクトリの指定が必要です")
+
+    with _session_lock:
+        if pool_size and pool_size != _pool_size:
+            _pool_size = pool_size
+            if _session is not None:
+                _session.close()
+                _session = None
+        _cache = ResponseCache(cache_dir) if cache_dir else None
+        _offline = offline
+
+
+def is_offline():
+    return _offline
+
+
+def get_session():
+    """keep-aliveで接続を使い回す共有セッションを返す"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def fetch_html(url, rate_limiter=None, timeout=DEFAULT_TIMEOUT):
+    """
+    URLのHTMLを文字列で取得する
+    キャッシュがあれば条件付きGETを送り、304の場合はキャッシュの本文を返す
+    """
+    from requests.exceptions import RequestException
+
+    cached = _cache.get(url) if _cache is not None else None
+
+    if _offline:
+        if cached is None:
+            raise _offline_cache_miss_class()(f"キャッシュにないURLです: {url}")
+        RESPONSE_BYTES.inc(len(cached[1].encode("utf-8")), result="cache")
+        return cached[1]
+
+    headers = {}
+    if cached is not None:
+        meta = cached[0]
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    if rate_limiter is not None:
+        rate_limiter.acquire(url)
+
+    started = time.perf_counter()
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, result="not_modified")
+            return cached[1]
+        response.raise_for_status()  # エラーがあれば例外を発生させる
+    except RequestException:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, result="error")
+        raise
+    REQUEST_SECONDS.observe(time.perf_counter() - started, result="ok")
+    RESPONSE_BYTES.inc(len(response.content), result="ok")
+
+    if _cache is not None:
+        _cache.put(url, response)
+    return response.text
@@ -0,0 +1,227 @@
+import bisect
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 秒単位のヒストグラムのデフォルトの区切り（上限を含む）
+DEFAULT_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """ラベルごとに値を加算するカウンター"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(_label_key(self.labelnames, labels), 0)
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    def to_dict(self):
+        with self.lock:
+            return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in self.values.items()]
+
+    def prometheus_lines(self):
+        with self.lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                    for key, value in self.values.items()]
+
+
+class Histogram:
+    """ラベルごとに観測値の分布（区切りごとの件数・合計・最小・最大）を記録するヒストグラム"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0, "min": value, "max": value}
+                self.series[key] = series
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["count"] += 1
+            series["sum"] += value
+            series["min"] = min(series["min"], value)
+            series["max"] = max(series["max"], value)
+
+    @contextmanager
+    def time(self, **labels):
+        """withブロックの経過時間（秒）を記録する"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+
+    def to_dict(self):
+        with self.lock:
+            return [
+                {
+                    "labels": dict(zip(self.labelnames, key)),
+                    "count": series["count"],
+                    "sum": series["sum"],
+                    "mean": series["sum"] / series["count"],
+                    "min": series["min"],
+                    "max": series["max"],
+                    "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), _cumulative(series["counts"]))},
+                }
+                for key, series in self.series.items()
+            ]
+
+    def prometheus_lines(self):
+        lines = []
+        with self.lock:
+            for key, series in self.series.items():
+                for bound, count in zip(self.buckets + (float("inf"),), _cumulative(series["counts"])):
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    labels = _format_labels(self.labelnames + ("le",), key + (le,))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """メトリクスをまとめ、JSONのレポートとPrometheusのテキスト形式で書き出す"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.started_at = datetime.datetime.now(datetime.UTC)
+        self.started = time.perf_counter()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_SECONDS_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"メトリクス名が重複しています: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def reset(self):
+        """計測値を消して計測開始時刻を今にする（1回の実行ごとに呼ぶ）"""
+        for metric in self.metrics.values():
+            metric.reset()
+        self.started_at = datetime.datetime.now(datetime.UTC)
+        self.started = time.perf_counter()
+
+    def report(self, extra=None):
+        """実行レポート（開始・終了時刻、経過時間、各メトリクスの値）"""
+        report = {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            "wall_seconds": time.perf_counter() - self.started,
+        }
+        report.update(extra or {})
+        report["metrics"] = {
+            name: {"type": metric.kind, "help": metric.help_text, "series": metric.to_dict()}
+            for name, metric in self.metrics.items()
+        }
+        return report
+
+    def to_prometheus(self):
+        """Prometheusのテキスト形式（node_exporterのtextfile collectorで読み込める）"""
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help_text}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path, extra=None):
+        _write_text(path, json.dumps(self.report(extra), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path):
+        _write_text(path, self.to_prometheus())
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, key):
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _cumulative(counts):
+    total = 0
+    result = []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+def _write_text(path, text):
+    # 書き込み途中のファイルを読まれないように一時ファイルから置き換える
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# スクレイピング処理全体で共有するメトリクス
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "trunkroom_scraper_request_seconds", "HTTPリクエストの所要時間（秒）", ("result",))
+RESPONSE_BYTES = REGISTRY.counter(
+    "trunkroom_scraper_response_bytes_total", "ダウンロードしたレスポンス本文のバイト数", ("result",))
+PARSE_SECONDS = REGISTRY.histogram(
+    "trunkroom_scraper_parse_seconds", "一覧ページ1ページの解析時間（秒）", ("backend",))
+FACILITIES = REGISTRY.counter(
+    "trunkroom_scraper_facilities_total", "区ごとに抽出した物件数", ("ward",))
+PARSE_FAILURES = REGISTRY.counter(
+    "trunkroom_scraper_parse_failures_total", "項目ごとの抽出失敗数（値が見つからない・読み取れない）", ("field",))
+DB_WRITE_SECONDS = REGISTRY.histogram(
+    "trunkroom_scraper_db_write_seconds", "DBへの1バッチの書き込み時間（再試行を含む、秒）", ("table", "result"))
+DB_ROWS = REGISTRY.counter(
+    "trunkroom_scraper_db_rows_total", "DBへの書き込み行数", ("table", "result"))
+STAGE_SECONDS = REGISTRY.histogram(
+    "trunkroom_scraper_stage_seconds", "区ごとの処理段階の所要時間（秒）", ("stage",))
+ERRORS = REGISTRY.counter(
+    "trunkroom_scraper_errors_total", "処理を中断したエラーの数", ("stage",))
@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from src.scraper.parsers import parse_listing_page, resolve_backend
+
+# ワーカー1つあたりの受け付け待ちページ数（これを超えると取得側のスレッドが待機する）
+PENDING_PAGES_PER_WORKER = 2
+
+
+class ParsePool:
+    """
+    一覧ページの解析を複数プロセスで行うワーカープール
+
+    取得側のスレッドが生のHTMLをsubmit()で渡し、解析結果（ListingPage）のFutureを受け取る。
+    HTMLの解析はCPUを使うためスレッドではGILで並列にならないが、
+    プロセスに分けることでコア数に応じて解析のスループットが上がる。
+    取得側は結果を待たずに次のページを取得できるため、取得（通信）と解析が重なる。
+    プールに渡して解析が終わっていないページの数はmax_pendingまでに制限し（有界のキュー）、
+    解析が追いつかないときはsubmit()で取得側を待たせる（HTMLがメモリに溜まり続けない）
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * PENDING_PAGES_PER_WORKER
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        # 取得側のスレッドが動いている中でforkするとデッドロックのおそれがあるため、spawnでワーカーを起動する
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def submit(self, html, page_url, backend=None, limit=None, verbose=False):
+        """
+        ワーカープロセスに一覧ページの解析を依頼し、ListingPageのFutureを返す
+        解析待ちのページがmax_pendingに達していれば、どれかの解析が終わるまで待つ
+        """
+        # バックエンド名の誤りは子プロセスに渡す前にここで検出する
+        backend = resolve_backend(backend)
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(parse_listing_page, html, page_url, backend, limit, verbose)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def parse(self, html, page_url, backend=None, limit=None, verbose=False):
+        """ワーカープロセスで一覧ページを解析し、結果が返るまで待つ（parse_listing_pageと同じ戻り値）"""
+        return self.submit(html, page_url, backend, limit, verbose).result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,438 @@
+import html as html_lib
+import importlib.util
+import re
+from collections import namedtuple
+from functools import lru_cache
+from types import SimpleNamespace
+from urllib.parse import urljoin
+
+from src.scraper.extract import parse_price_range, parse_size_range
+
+# lxmlは既定のバックエンド（bs4）では使わないため、有無だけを確認し、読み込みはlxmlでの解析時まで遅らせる
+# （lxmlがない環境ではBeautifulSoupのバックエンドを使う）
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+
+# ページャーで「次ページ」を表すリンクテキスト
+NEXT_PAGE_LABELS = ("次へ", "次", "次のページ", "次へ>", ">", "»", "›")
+
+# rel="next"を持つlink / a要素と、そのhref（解析前に次ページを見つけるための簡易な走査に使う）
+_REL_NEXT_TAG_RE = re.compile(r"""<(?:link|a)\b[^>]*\brel\s*=\s*["']?[^"'>]*\bnext\b[^>]*>""", re.IGNORECASE)
+_HREF_RE = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+# 特徴アイコンのクラス名と物件データのキー
+FEATURE_KEYS = (
+    ("alltime", "has_alltime"),            # 24時間利用可能
+    ("parking", "has_parking"),            # 駐車場
+    ("elevator", "has_elevator"),          # エレベーター
+    ("airconditioner", "has_airconditioner"),  # 空調設備
+    ("ventilator", "has_ventilator"),      # 換気設備
+    ("security", "has_security"),          # 防犯設備
+)
+
+# パーサーバックエンド
+#   bs4:  BeautifulSoup(html.parser)で1パス抽出（デフォルト。従来の抽出処理と同じ結果になる）
+#   lxml: lxml + 事前コンパイルしたXPathで1パス抽出（高速だが、入れ子の崩れたHTMLでは
+#         libxml2が要素を閉じ直すため結果が異なる場合がある。例: <p>駅 <div>徒歩5分</div></p>）
+#         lxmlは任意の依存（pip install trunkroom-data[lxml]）で、--parser lxmlを指定したときだけ使う
+PARSER_BACKENDS = ("bs4", "lxml")
+DEFAULT_BACKEND = "auto"
+
+# 抽出結果が従来の処理と一致することを保証するバックエンド（フィクスチャとの照合で失敗扱いにする）
+EXACT_BACKENDS = ("bs4",)
+
+# 一覧ページの解析結果
+# properties: 物件データのリスト, next_url: 次ページのURL, element_count: ページ内のdiv.specの数
+# parse_failures: 項目ごとの抽出失敗数（値が見つからない・読み取れない）
+ListingPage = namedtuple("ListingPage", ["properties", "next_url", "element_count", "parse_failures"], defaults=(None,))
+
+
+def resolve_backend(backend=None):
+    """バックエンド名を解決する（auto/Noneはbs4。lxmlがインストールされていても自動では選ばない）"""
+    if backend in (None, "", DEFAULT_BACKEND):
+        return "bs4"
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"不明なパーサーバックエンドです: {backend}（{', '.join(PARSER_BACKENDS)}）")
+    if backend == "lxml" and not HAS_LXML:
+        raise ValueError("lxmlがインストールされていません（pip install trunkroom-data[lxml]）")
+    return backend
+
+
+def parse_listing_page(html, page_url, backend=None, limit=None, verbose=False):
+    """
+    一覧ページのHTMLから物件データと次ページのURLを抽出する
+    limitを指定すると先頭からlimit件のdiv.specだけを処理する
+    どのバックエンドでも同じ物件データ（dict）を返す
+    """
+    parse = _BACKEND_PARSERS[resolve_backend(backend)]
+    return parse(html, page_url, limit, verbose)
+
+
+def verify_backends(html, page_url, expected=None, backends=None):
+    """
+    各バックエンドの抽出結果が期待値と一致するかを確認し、一致しないバックエンド名のリストを返す
+    expected: {"properties", "next_url", "element_count"}（フィクスチャの期待値。
+        benchmarks/fixtures/expected.json）。省略するとbs4の結果を期待値にする
+    """
+    if expected is None:
+        page = parse_listing_page(html, page_url, backend="bs4")
+        expected = {"properties": page.properties, "next_url": page.next_url, "element_count": page.element_count}
+    expected = (expected["properties"], expected["next_url"], expected["element_count"])
+    mismatched = []
+    for backend in backends or available_backends():
+        if tuple(parse_listing_page(html, page_url, backend=backend)[:3]) != expected:
+            mismatched.append(backend)
+    return mismatched
+
+
+def available_backends():
+    """この環境で使えるバックエンド名のリスト"""
+    return [backend for backend in PARSER_BACKENDS if backend != "lxml" or HAS_LXML]
+
+
+def _limit_elements(elements, limit):
+    if limit is not None and limit > 0:
+        return elements[:limit]
+    return elements
+
+
+def _build_property_data(building_id, name, price_text, size_text, address_text, access_text,
+                         location_type, feature_classes, detail_url=None, failures=None):
+    """
+    抽出したテキストから物件データを組み立てる
+    値は従来の抽出処理と同じで、キーはそれにbuilding_id（先頭）とdetail_url（末尾）を加えたもの
+    failuresに辞書を渡すと、見つからない・読み取れない項目の数を項目名ごとに加算する
+    """
+    price = parse_price_range(price_text)
+    size = parse_size_range(size_text)
+    min_price, max_price = price or (0, 0)
+    min_size, max_size = size or (0.0, 0.0)
+
+    if failures is not None:
+        for field, failed in (
+            ("building_id", not building_id),
+            ("name", name == "不明"),
+            ("price", price is None),
+            ("size", size is None),
+            ("address", not address_text),
+            ("access", not access_text),
+            ("location_type", location_type == "不明"),
+        ):
+            if failed:
+                failures[field] = failures.get(field, 0) + 1
+
+    # 見つからなかったらデフォルト値を設定
+    features = {key: False for _, key in FEATURE_KEYS}
+    for classes in feature_classes:
+        if not classes:
+            continue
+        for feature_class, key in FEATURE_KEYS:
+            if feature_class in classes:
+                features[key] = 'disabled' not in classes
+                break
+
+    property_data = {
+        "building_id": building_id,
+        "name": name,
+        "address": address_text,
+        "location_type": location_type,
+        "access": access_text,
+        "min_size": min_size,
+        "max_size": max_size,
+        "min_price": min_price,
+        "max_price": max_price,
+    }
+    property_data.update(features)
+    property_data["detail_url"] = detail_url
+    return property_data
+
+
+def _detail_url(page_url, href):
+    """物件名のリンク先（詳細ページ）の絶対URL（リンクがなければNone）"""
+    if not href:
+        return None
+    return urljoin(page_url, href) if page_url else href
+
+
+def _location_type_from(classes, text_func):
+    if 'indoor' in classes:
+        return "屋内"
+    if 'outdoor' in classes:
+        return "屋外"
+    return text_func()
+
+
+def _print_extract_error(e):
+    import traceback
+    print(f"物件情報の抽出中にエラー: {str(e)}")
+    print(traceback.format_exc())
+
+
+# ========= bs4: BeautifulSoupで1パス抽出 ==========
+
+def _parse_with_bs4(html, page_url, limit, verbose):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 文書を先頭から1回だけ走査し、各コンテナの直前のh3・detailListTitleを記録する
+    last_h3 = None
+    last_title = None
+    contexts = {}
+    property_elements = []
+    for tag in soup.find_all(True):
+        if tag.name == 'h3':
+            last_h3 = tag
+        elif tag.name == 'div':
+            classes = tag.get('class') or ()
+            if 'detailListContents' in classes:
+                contexts[id(tag)] = (last_h3, last_title)
+            if 'detailListTitle' in classes:
+                last_title = tag
+            if 'spec' in classes:
+                property_elements.append(tag)
+
+    properties = []
+    failures = {}
+    for element in _limit_elements(property_elements, limit):
+        try:
+            building_id = element.get('data-building_id', '')
+            property_container = element.find_parent('div', class_='detailListContents')
+            if not property_container and verbose:
+                print(f"物件ID {building_id} のコンテナが見つかりません")
+                continue
+            h3_element, detail_list_title = contexts.get(id(property_container), (None, None))
+
+            name = "不明"
+            detail_url = None
+            if h3_element:
+                a_element = h3_element.find('a')
+                name = (a_element or h3_element).text.strip()
+                detail_url = _detail_url(page_url, a_element.get('href')) if a_element else None
+
+            location_type = "不明"
+            if detail_list_title:
+                type_element = detail_list_title.find('div', class_='type')
+                if type_element:
+                    location_type = _location_type_from(type_element.get('class', []),
+                                                        lambda: type_element.get_text(strip=True))
+
+            option_div = None
+            if property_container:
+                option_div = property_container.find('div', class_='detailListOption')
+                if not option_div and property_container.parent:
+                    option_div = property_container.parent.find('div', class_='detailListOption')
+            features_list = option_div.find('ul') if option_div else None
+            feature_classes = [li.get('class', []) for li in features_list.find_all('li')] if features_list else []
+
+            properties.append(_build_property_data(
+                building_id,
+                name,
+                _bs4_text(element, "dl.fee", "dd span"),
+                _bs4_text(element, "dl.breadth", "dd span"),
+                _bs4_text(element, "dl.address", "dd span") or "",
+                _bs4_text(element, "dl.access", "dd p") or "",
+                location_type,
+                feature_classes,
+                detail_url,
+                failures,
+            ))
+        except Exception as e:
+            if verbose:
+                _print_extract_error(e)
+
+    return ListingPage(properties, _bs4_next_page_url(soup, page_url), len(property_elements), failures)
+
+
+def _bs4_text(element, dl_selector, text_selector):
+    """dl要素内のテキストを取得（dlまたはテキスト要素がなければNone）"""
+    dl_element = element.select_one(dl_selector)
+    if not dl_element:
+        return None
+    text_element = dl_element.select_one(text_selector)
+    if not text_element:
+        return None
+    return text_element.text.strip()
+
+
+def _bs4_next_page_url(soup, current_url):
+    """一覧ページのページネーションから次ページのURLを取得（なければNone）"""
+    link = soup.select_one('link[rel~="next"], a[rel~="next"]')
+
+    # rel="next"がない場合はページャーのリンクテキストで判定
+    if not link:
+        for a_element in soup.select(".pagination a, .pager a, .paging a, .pageNav a"):
+            if a_element.get_text(strip=True) in NEXT_PAGE_LABELS:
+                link = a_element
+                break
+
+    if not link or not link.get('href'):
+        return None
+    return urljoin(current_url, link['href'])
+
+
+def scan_next_page_url(html, page_url):
+    """
+    HTMLを解析せずに rel="next" のリンクから次ページのURLを探す（なければNone）
+    ワーカープロセスで解析している間に次のページを先に取得するための見込みで、
+    ページャーのリンクテキストは見ないため、解析結果のnext_urlと照合してから使う
+    """
+    for tag in _REL_NEXT_TAG_RE.finditer(html):
+        href = _HREF_RE.search(tag.group(0))
+        if href:
+            value = next(group for group in href.groups() if group is not None)
+            if value:
+                return urljoin(page_url, html_lib.unescape(value))
+    return None
+
+
+# ========= lxml: 事前コンパイルしたXPathで1パス抽出 ==========
+
+def _class_predicate(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+@lru_cache(maxsize=None)
+def _lxml_xpaths():
+    """lxmlを読み込み、解析に使うXPathをコンパイルする（最初にlxmlで解析するときに1回だけ）"""
+    from lxml import etree
+
+    return SimpleNamespace(
+        etree=etree,
+        first_a=etree.XPath(".//a"),
+        type=etree.XPath(f".//div[{_class_predicate('type')}]"),
+        option=etree.XPath(f".//div[{_class_predicate('detailListOption')}]"),
+        ul=etree.XPath(".//ul"),
+        li=etree.XPath(".//li"),
+        dl={name: etree.XPath(f".//dl[{_class_predicate(name)}]") for name in ("fee", "breadth", "address", "access")},
+        dd_span=etree.XPath(".//dd//span"),
+        dd_p=etree.XPath(".//dd//p"),
+        next_rel=etree.XPath("//link[contains(concat(' ', normalize-space(@rel), ' '), ' next ')]"
+                             " | //a[contains(concat(' ', normalize-space(@rel), ' '), ' next ')]"),
+        pager_links=etree.XPath(
+            "//*[" + " or ".join(_class_predicate(name) for name in ("pagination", "pager", "paging", "pageNav")) + "]//a"
+        ),
+    )
+
+
+def _parse_with_lxml(html, page_url, limit, verbose):
+    xp = _lxml_xpaths()
+    parser = xp.etree.HTMLParser(encoding="utf-8")
+    root = xp.etree.fromstring(html.encode("utf-8"), parser)
+    if root is None:
+        return ListingPage([], None, 0)
+
+    # 文書を先頭から1回だけ走査し、各コンテナの直前のh3・detailListTitleを記録する
+    last_h3 = None
+    last_title = None
+    contexts = {}
+    property_elements = []
+    for el in root.iter():
+        tag = el.tag
+        if tag == 'h3':
+            last_h3 = el
+        elif tag == 'div':
+            classes = _classes(el)
+            if 'detailListContents' in classes:
+                contexts[el] = (last_h3, last_title)
+            if 'detailListTitle' in classes:
+                last_title = el
+            if 'spec' in classes:
+                property_elements.append(el)
+
+    properties = []
+    failures = {}
+    for element in _limit_elements(property_elements, limit):
+        try:
+            building_id = element.get('data-building_id', '')
+            property_container = None
+            for ancestor in element.iterancestors('div'):
+                if 'detailListContents' in _classes(ancestor):
+                    property_container = ancestor
+                    break
+            if property_container is None and verbose:
+                print(f"物件ID {building_id} のコンテナが見つかりません")
+                continue
+            h3_element, detail_list_title = contexts.get(property_container, (None, None))
+
+            name = "不明"
+            detail_url = None
+            if h3_element is not None:
+                a_elements = xp.first_a(h3_element)
+                name = _lxml_text(a_elements[0] if a_elements else h3_element).strip()
+                detail_url = _detail_url(page_url, a_elements[0].get('href')) if a_elements else None
+
+            location_type = "不明"
+            if detail_list_title is not None:
+                type_elements = xp.type(detail_list_title)
+                if type_elements:
+                    type_element = type_elements[0]
+                    location_type = _location_type_from(_classes(type_element),
+                                                        lambda: _lxml_stripped_text(type_element))
+
+            option_div = None
+            if property_container is not None:
+                option_divs = xp.option(property_container)
+                if not option_divs and property_container.getparent() is not None:
+                    option_divs = xp.option(property_container.getparent())
+                option_div = option_divs[0] if option_divs else None
+            features_lists = xp.ul(option_div) if option_div is not None else []
+            feature_classes = [_classes(li) for li in xp.li(features_lists[0])] if features_lists else []
+
+            properties.append(_build_property_data(
+                building_id,
+                name,
+                _lxml_dl_text(element, "fee", xp.dd_span),
+                _lxml_dl_text(element, "breadth", xp.dd_span),
+                _lxml_dl_text(element, "address", xp.dd_span) or "",
+                _lxml_dl_text(element, "access", xp.dd_p) or "",
+                location_type,
+                feature_classes,
+                detail_url,
+                failures,
+            ))
+        except Exception as e:
+            if verbose:
+                _print_extract_error(e)
+
+    return ListingPage(properties, _lxml_next_page_url(root, page_url), len(property_elements), failures)
+
+
+def _classes(el):
+    return el.get('class', '').split()
+
+
+def _lxml_text(el):
+    return "".join(el.itertext())
+
+
+def _lxml_stripped_text(el):
+    return "".join(text.strip() for text in el.itertext())
+
+
+def _lxml_dl_text(element, dl_class, text_xpath):
+    dl_elements = _lxml_xpaths().dl[dl_class](element)
+    if not dl_elements:
+        return None
+    text_elements = text_xpath(dl_elements[0])
+    if not text_elements:
+        return None
+    return _lxml_text(text_elements[0]).strip()
+
+
+def _lxml_next_page_url(root, current_url):
+    links = _lxml_xpaths().next_rel(root)
+    link = links[0] if links else None
+    if link is None:
+        for a_element in _lxml_xpaths().pager_links(root):
+            if _lxml_stripped_text(a_element) in NEXT_PAGE_LABELS:
+                link = a_element
+                break
+    if link is None or not link.get('href'):
+        return None
+    return urljoin(current_url, link.get('href'))
+
+
+_BACKEND_PARSERS = {
+    "bs4": _parse_with_bs4,
+    "lxml": _parse_with_lxml,
+}
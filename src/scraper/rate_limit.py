@@ -0,0 +1,57 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレートリミッタ
+    rps: 1秒あたりに補充されるトークン数（= 平均リクエスト数/秒）
+    burst: バケットの容量（連続で許可するリクエスト数）
+    """
+
+    def __init__(self, rps, burst=1):
+        if rps <= 0:
+            raise ValueError("rpsは0より大きい値を指定してください")
+        self.rps = float(rps)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得できるまで待機し、待機した秒数を返す"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rps)
+                self.updated_at = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                wait = (1.0 - self.tokens) / self.rps
+            time.sleep(wait)
+            waited += wait
+
+
+class HostRateLimiter:
+    """
+    ホストごとにトークンバケットを持つレートリミッタ
+    複数スレッドから同じホストへアクセスしても合計がrpsを超えないようにする
+    """
+
+    def __init__(self, rps, burst=1):
+        self.rps = rps
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rps, self.burst)
+                self.buckets[host] = bucket
+        return bucket.acquire()
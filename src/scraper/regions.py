@@ -0,0 +1,88 @@
+import json
+import os
+from collections import namedtuple
+
+# スクレイピング対象の地域
+# name: 区市町村名（結果の区名・Parquetのパーティションに使う）
+# prefecture: URLの都道府県部分（例: tokyo）
+# slug: URLの区市町村部分（例: chuo-city）
+Region = namedtuple("Region", ["name", "prefecture", "slug"])
+
+LISTING_URL_TEMPLATE = "https://www.japantrunkroom.com/{prefecture}/{slug}/"
+
+# 組み込みの地域セット
+BUILTIN_REGION_SETS = {
+    "tokyo23": [Region(name, "tokyo", slug) for name, slug in (
+        ("千代田区", "chiyoda-city"),
+        ("中央区", "chuo-city"),
+        ("港区", "minato-city"),
+        ("新宿区", "shinjuku-city"),
+        ("文京区", "bunkyo-city"),
+        ("台東区", "taito-city"),
+        ("墨田区", "sumida-city"),
+        ("江東区", "koto-city"),
+        ("品川区", "shinagawa-city"),
+        ("目黒区", "meguro-city"),
+        ("大田区", "ota-city"),
+        ("世田谷区", "setagaya-city"),
+        ("渋谷区", "shibuya-city"),
+        ("中野区", "nakano-city"),
+        ("杉並区", "suginami-city"),
+        ("豊島区", "toshima-city"),
+        ("北区", "kita-city"),
+        ("荒川区", "arakawa-city"),
+        ("板橋区", "itabashi-city"),
+        ("練馬区", "nerima-city"),
+        ("足立区", "adachi-city"),
+        ("葛飾区", "katsushika-city"),
+        ("江戸川区", "edogawa-city"),
+    )],
+}
+DEFAULT_REGION_SET = "tokyo23"
+
+
+def listing_url(region):
+    """地域の一覧ページ（1ページ目）のURL"""
+    return LISTING_URL_TEMPLATE.format(prefecture=region.prefecture, slug=region.slug)
+
+
+def load_regions(spec=DEFAULT_REGION_SET):
+    """
+    スクレイピング対象の地域を {地域名: Region} で返す（指定した順番を保つ）
+    specは組み込みの地域セット名かJSONファイルのパスで、カンマ区切りで複数指定できる
+    （例: "tokyo23,regions/kanagawa.json"）
+
+    JSONファイルの形式:
+        {"regions": [{"name": "横浜市西区", "prefecture": "kanagawa", "slug": "..."}, ...]}
+    トップレベルが配列でもよい。prefectureを省略した項目にはファイルの"prefecture"を使う
+    """
+    regions = {}
+    for part in str(spec or DEFAULT_REGION_SET).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        for region in _load_region_set(part):
+            if region.name in regions:
+                raise ValueError(f"地域名が重複しています: {region.name}")
+            regions[region.name] = region
+    return regions
+
+
+def _load_region_set(spec):
+    if spec in BUILTIN_REGION_SETS:
+        return BUILTIN_REGION_SETS[spec]
+    if not os.path.exists(spec):
+        raise ValueError(f"不明な地域セットです: {spec}（組み込み: {', '.join(BUILTIN_REGION_SETS)}、またはJSONファイルのパス）")
+
+    with open(spec, encoding="utf-8") as f:
+        data = json.load(f)
+    default_prefecture = data.get("prefecture") if isinstance(data, dict) else None
+    items = data.get("regions", []) if isinstance(data, dict) else data
+
+    regions = []
+    for item in items:
+        prefecture = item.get("prefecture") or default_prefecture
+        if not item.get("name") or not item.get("slug") or not prefecture:
+            raise ValueError(f"地域の定義にname / slug / prefectureがありません: {item}")
+        regions.append(Region(item["name"], prefecture, item["slug"]))
+    return regions
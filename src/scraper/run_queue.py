@@ -0,0 +1,201 @@
+import datetime
+import json
+import sqlite3
+import threading
+import uuid
+
+# 実行記録（SQLite）のデフォルトの保存先
+DEFAULT_RUN_DB = "scrape_runs.sqlite"
+
+# 1つのページを取得・解析する最大試行回数と、再試行までの待機時間（秒、試行ごとに倍）
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 5.0
+
+# 作業項目の状態
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS work_items (
+    run_id TEXT NOT NULL,
+    ward TEXT NOT NULL,
+    page_no INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    consumed INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    saved INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, ward, page_no)
+);
+"""
+
+
+def _now():
+    return datetime.datetime.now(datetime.UTC).isoformat()
+
+
+class RunQueue:
+    """
+    スクレイピングの実行（run）と、区・一覧ページ単位の作業項目をSQLiteに記録するキュー
+
+    作業項目は1つの一覧ページに対応し、pending / done / failed の状態を持つ。
+    取得・解析に成功したページは物件データ（result）ごとdoneにし、
+    DB・Parquetへの保存が済んだらsavedを立てる。
+    途中で止まった実行はrun_idを指定して再開でき、doneのページは取得し直さない。
+    スレッドから同時に使えるように、操作はロックで直列化する
+    """
+
+    def __init__(self, path=DEFAULT_RUN_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def create_run(self, wards, params=None):
+        """
+        新しい実行を作成し、各区の1ページ目を作業項目に登録する
+        wards: (区名, URL) のリスト（この順番で結果をまとめる）
+        """
+        run_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        params = dict(params or {})
+        params["wards"] = [list(ward) for ward in wards]
+        now = _now()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (run_id, created_at, status, params) VALUES (?, ?, 'running', ?)",
+                (run_id, now, json.dumps(params, ensure_ascii=False)),
+            )
+            self.conn.executemany(
+                "INSERT INTO work_items (run_id, ward, page_no, url, status, updated_at) VALUES (?, ?, 1, ?, ?, ?)",
+                [(run_id, ward_name, url, PENDING, now) for ward_name, url in wards],
+            )
+        return run_id
+
+    def get_run(self, run_id):
+        """実行の情報を返す（paramsは辞書に戻す）。存在しなければNone"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run["params"] = json.loads(run["params"])
+        return run
+
+    def reset_failed(self, run_id):
+        """再開時に、失敗したままの作業項目を試行回数0からやり直せるように戻す"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE work_items SET status = ?, attempts = 0, updated_at = ? WHERE run_id = ? AND status = ?",
+                (PENDING, _now(), run_id, FAILED),
+            )
+            self.conn.execute("UPDATE runs SET status = 'running', finished_at = NULL WHERE run_id = ?", (run_id,))
+        return cursor.rowcount
+
+    def next_item(self, run_id, ward, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """区の未完了の作業項目のうちページ番号が最も小さいものを返す（なければNone）"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM work_items WHERE run_id = ? AND ward = ? AND status != ? AND attempts < ? "
+                "ORDER BY page_no LIMIT 1",
+                (run_id, ward, DONE, max_attempts),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def ward_progress(self, run_id, ward):
+        """区の処理済みページのURLと、ページをまたいで数えた物件数（件数制限用）を返す"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url, status, consumed FROM work_items WHERE run_id = ? AND ward = ?", (run_id, ward)
+            ).fetchall()
+        urls = {row["url"] for row in rows}
+        consumed = sum(row["consumed"] for row in rows if row["status"] == DONE)
+        return urls, consumed
+
+    def mark_done(self, run_id, ward, page_no, properties, consumed=0, next_url=None):
+        """ページを完了にして物件データを記録し、次の一覧ページがあれば作業項目に追加する"""
+        now = _now()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE work_items SET status = ?, attempts = attempts + 1, last_error = NULL, consumed = ?, "
+                "result = ?, updated_at = ? WHERE run_id = ? AND ward = ? AND page_no = ?",
+                (DONE, consumed, json.dumps(properties, ensure_ascii=False), now, run_id, ward, page_no),
+            )
+            if next_url:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO work_items (run_id, ward, page_no, url, status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, ward, page_no + 1, next_url, PENDING, now),
+                )
+
+    def mark_failed(self, run_id, ward, page_no, error):
+        """ページの失敗を記録し、これまでの試行回数を返す"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE work_items SET status = ?, attempts = attempts + 1, last_error = ?, updated_at = ? "
+                "WHERE run_id = ? AND ward = ? AND page_no = ?",
+                (FAILED, str(error), _now(), run_id, ward, page_no),
+            )
+            row = self.conn.execute(
+                "SELECT attempts FROM work_items WHERE run_id = ? AND ward = ? AND page_no = ?",
+                (run_id, ward, page_no),
+            ).fetchone()
+        return row["attempts"]
+
+    def results(self, run_id, ward):
+        """
+        区の完了済みページの物件データをページ順に返す
+        戻り値は (物件データのリスト, そのうちDB・Parquetに未保存の物件データのリスト)。
+        未保存のリストの要素は1つ目のリストの要素と同じオブジェクト
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT result, saved FROM work_items WHERE run_id = ? AND ward = ? AND status = ? ORDER BY page_no",
+                (run_id, ward, DONE),
+            ).fetchall()
+        properties = []
+        unsaved = []
+        for row in rows:
+            page_properties = json.loads(row["result"])
+            properties.extend(page_properties)
+            if not row["saved"]:
+                unsaved.extend(page_properties)
+        return properties, unsaved
+
+    def mark_saved(self, run_id, ward):
+        """区の完了済みページをDB・Parquetへ保存済みにする"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE work_items SET saved = 1, updated_at = ? WHERE run_id = ? AND ward = ? AND status = ?",
+                (_now(), run_id, ward, DONE),
+            )
+
+    def finish_run(self, run_id):
+        """
+        実行を終了する。失敗したページ・未保存のページが残っていればincomplete、なければcompleted
+        戻り値は (状態, 失敗したページ数)
+        """
+        with self.lock, self.conn:
+            failed = self.conn.execute(
+                "SELECT COUNT(*) FROM work_items WHERE run_id = ? AND (status != ? OR saved = 0)", (run_id, DONE)
+            ).fetchone()[0]
+            status = "completed" if failed == 0 else "incomplete"
+            self.conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?", (status, _now(), run_id)
+            )
+        return status, failed
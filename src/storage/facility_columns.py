@@ -0,0 +1,188 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.scraper.facility import FIELD_NAMES, FLAG_FIELDS, Facility
+
+# 文字列の列（辞書エンコードしてコード配列 + カテゴリで持つ）
+STRING_COLUMNS = ("building_id", "name", "address", "location_type", "access", "detail_url", "status", "ward", "scrape_date")
+
+# 数値の列と型
+NUMERIC_COLUMNS = {
+    "min_size": np.float64,
+    "max_size": np.float64,
+    "min_price": np.int32,
+    "max_price": np.int32,
+    "latitude": np.float64,
+    "longitude": np.float64,
+}
+
+# 欠損値（文字列はコード-1、数値はNaN。価格は抽出失敗時と同じ0）
+_NUMERIC_MISSING = {"min_size": 0.0, "max_size": 0.0, "min_price": 0, "max_price": 0, "latitude": np.nan, "longitude": np.nan}
+
+
+class FacilityColumns:
+    """
+    物件データを列ごとのNumPy配列で持つコンテナ
+
+    - 文字列の列（物件ID・名前・住所など）は辞書エンコードし、int32のコード配列と重複のないカテゴリで持つ。
+      日次のスナップショットを何日分も持っても同じ文字列は1回しか保持しない
+    - 広さ・賃料・緯度経度は型を決めたNumPy配列（賃料はint32）
+    - 6つの特徴フラグ（has_*）は1物件1バイトのビットフィールド（uint8）
+
+    pandasとの変換では、文字列の列はコード配列をそのまま使うCategoricalに、
+    数値の列は配列を共有する列になる（ビットフィールドの展開だけはコピーが必要）
+
+    例:
+        columns = FacilityColumns.from_pandas(store.read(start_date="2025-01-01"))
+        vacant_indoor = columns.has("has_airconditioner") & (columns.string("status") == "空室")
+        df = columns.to_pandas()
+    """
+
+    def __init__(self, codes, categories, numeric, flags):
+        self.codes = codes
+        self.categories = categories
+        self.numeric = numeric
+        self.flags = flags
+
+    def __len__(self):
+        return len(self.flags)
+
+    @classmethod
+    def from_records(cls, records, ward=None, scrape_date=None):
+        """物件データ（辞書またはFacility）のリストから作成する"""
+        records = [record.to_dict() if isinstance(record, Facility) else record for record in records]
+        data = {name: [record.get(name) for record in records] for name in STRING_COLUMNS + tuple(NUMERIC_COLUMNS)}
+        if ward is not None:
+            data["ward"] = [ward] * len(records)
+        if scrape_date is not None:
+            data["scrape_date"] = [str(scrape_date)] * len(records)
+
+        codes = {}
+        categories = {}
+        for name in STRING_COLUMNS:
+            codes[name], categories[name] = _encode(pd.Series(data[name], dtype=object))
+        numeric = {
+            name: pd.Series(data[name], dtype=float).fillna(_NUMERIC_MISSING[name]).to_numpy().astype(dtype)
+            for name, dtype in NUMERIC_COLUMNS.items()
+        }
+        flags = np.zeros(len(records), dtype=np.uint8)
+        for bit, name in enumerate(FLAG_FIELDS):
+            flags |= np.fromiter((bool(record.get(name)) for record in records), dtype=bool, count=len(records)).astype(np.uint8) << bit
+        return cls(codes, categories, numeric, flags)
+
+    @classmethod
+    def from_pandas(cls, df):
+        """
+        DataFrame（SnapshotStore.readの戻り値など）から作成する
+        カテゴリ型の列はコード配列を、欠損のない数値の列は配列をそのまま使う
+        """
+        codes = {}
+        categories = {}
+        for name in STRING_COLUMNS:
+            column = df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+            codes[name], categories[name] = _encode(column)
+
+        numeric = {}
+        for name, dtype in NUMERIC_COLUMNS.items():
+            if name in df.columns:
+                values = df[name]
+                if values.isna().any():
+                    values = values.fillna(_NUMERIC_MISSING[name])
+                numeric[name] = values.to_numpy(dtype=dtype, copy=False)
+            else:
+                numeric[name] = np.full(len(df), _NUMERIC_MISSING[name], dtype=dtype)
+
+        flags = np.zeros(len(df), dtype=np.uint8)
+        for bit, name in enumerate(FLAG_FIELDS):
+            if name in df.columns:
+                flags |= df[name].fillna(False).to_numpy(dtype=bool).astype(np.uint8) << bit
+        return cls(codes, categories, numeric, flags)
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        複数のコンテナを連結する（日ごとのスナップショットを積み上げる用途）
+        カテゴリは和集合にまとめ、各コード配列を付け替える
+        """
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.from_records([])
+        codes = {}
+        categories = {}
+        for name in STRING_COLUMNS:
+            merged = pd.Index(np.concatenate([part.categories[name] for part in parts])).unique()
+            remapped = []
+            for part in parts:
+                mapping = merged.get_indexer(part.categories[name]).astype(np.int32)
+                part_codes = part.codes[name]
+                remapped.append(np.where(part_codes >= 0, mapping[part_codes] if len(mapping) else -1, -1).astype(np.int32))
+            codes[name] = np.concatenate(remapped)
+            categories[name] = merged.to_numpy(dtype=object)
+        numeric = {name: np.concatenate([part.numeric[name] for part in parts]) for name in NUMERIC_COLUMNS}
+        flags = np.concatenate([part.flags for part in parts])
+        return cls(codes, categories, numeric, flags)
+
+    def string(self, name):
+        """文字列の列をCategoricalで返す（コード配列はコピーしない）"""
+        return pd.Categorical.from_codes(self.codes[name], categories=pd.Index(self.categories[name], dtype=object), validate=False)
+
+    def has(self, flag):
+        """特徴フラグ（例: "has_parking"）のbool配列を返す"""
+        return (self.flags & (1 << FLAG_FIELDS.index(flag))) != 0
+
+    def to_pandas(self, expand_flags=True):
+        """
+        DataFrameに変換する
+        expand_flags=Falseの場合は6つのhas_*列の代わりにビットフィールドをflags列として返す（コピーなし）
+        """
+        data = {}
+        for name in FIELD_NAMES + ("ward", "scrape_date"):
+            if name in STRING_COLUMNS:
+                data[name] = self.string(name)
+            elif name in NUMERIC_COLUMNS:
+                data[name] = self.numeric[name]
+            elif name in FLAG_FIELDS and expand_flags:
+                data[name] = self.has(name)
+        if not expand_flags:
+            data["flags"] = self.flags
+        return pd.DataFrame(data, copy=False)
+
+    def record(self, index):
+        """index行目をFacilityで返す"""
+        values = {}
+        for name in FIELD_NAMES:
+            if name in STRING_COLUMNS:
+                code = self.codes[name][index]
+                values[name] = self.categories[name][code] if code >= 0 else None
+            elif name in NUMERIC_COLUMNS:
+                value = self.numeric[name][index].item()
+                values[name] = None if value != value else value
+            else:
+                values[name] = bool(self.flags[index] & (1 << FLAG_FIELDS.index(name)))
+        return Facility.from_dict(values)
+
+    def records(self):
+        """全行をFacilityで順に返す"""
+        for index in range(len(self)):
+            yield self.record(index)
+
+    @property
+    def nbytes(self):
+        """配列とカテゴリ（文字列本体を含む）のおおよそのメモリ使用量（バイト）"""
+        total = self.flags.nbytes + sum(array.nbytes for array in self.numeric.values())
+        for name in STRING_COLUMNS:
+            total += self.codes[name].nbytes + self.categories[name].nbytes
+            total += sum(sys.getsizeof(value) for value in self.categories[name])
+        return total
+
+
+def _encode(column):
+    """列をint32のコード配列（欠損は-1）とカテゴリの配列に辞書エンコードする"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories.astype(str).to_numpy(dtype=object)
+        return column.cat.codes.to_numpy().astype(np.int32, copy=False), categories
+    values = column.astype(object).where(column.notna(), None)
+    codes, uniques = pd.factorize(values.map(lambda value: value if value is None else str(value)), use_na_sentinel=True)
+    return codes.astype(np.int32, copy=False), np.asarray(uniques, dtype=object)
@@ -0,0 +1,288 @@
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from src.geo.geocode import address_keys
+
+# ローカルキャッシュ（SQLite）のデフォルトの保存先
+DEFAULT_CACHE_PATH = "trunkroom_cache.sqlite"
+
+# Supabaseから1リクエストで読み込む行数
+SYNC_PAGE_SIZE = 1000
+
+# 読み込み時に同期する間隔（秒）。これより新しければ同期せずローカルだけで返す
+DEFAULT_SYNC_INTERVAL = 15 * 60
+
+# 同期に失敗したテーブルを次に同期するまでの待ち時間（秒）。その間は手元のデータ（空でも）で応答する
+SYNC_RETRY_BACKOFF = 5 * 60
+
+# 同期するテーブル: Supabaseのテーブル名 → (ローカルのテーブル名, キー列)
+SYNC_TABLES = {
+    "storage_facilities": ("facilities", ("building_id", "unit")),
+    "storage_facility_history": ("facility_history", ("building_id", "unit", "date")),
+}
+
+# 差分同期の目印にする列（upsertのたびに更新される）
+WATERMARK_COLUMN = "updated_at"
+
+# ローカルのスキーマのバージョン（変わったら作り直して全件同期し直す）
+SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facilities (
+    building_id TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    ward TEXT,
+    latitude REAL,
+    longitude REAL,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (building_id, unit)
+);
+CREATE INDEX IF NOT EXISTS facilities_ward ON facilities (ward);
+CREATE INDEX IF NOT EXISTS facilities_location ON facilities (latitude, longitude);
+CREATE TABLE IF NOT EXISTS facility_history (
+    building_id TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    date TEXT NOT NULL,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (building_id, unit, date)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL,
+    retry_at REAL
+);
+"""
+
+
+class LocalFacilityCache:
+    """
+    Supabaseの物件テーブル・履歴テーブルを手元のSQLiteに複製し、読み込みをローカルで行うキャッシュ
+
+    同期はupdated_at（upsertのたびに更新される）の最大値を目印（watermark）にして、
+    それ以降の行だけを取得する差分同期。読み込み時にsync_interval秒以上同期していなければ同期する。
+    Supabaseに接続できない・遅い場合でも、手元のデータで応答する
+
+    例:
+        cache = LocalFacilityCache()
+        df = cache.facilities_by_ward("港区")
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, client=None, sync_interval=DEFAULT_SYNC_INTERVAL, verbose=False):
+        self.path = path
+        self.client = client
+        self.sync_interval = sync_interval
+        self.verbose = verbose
+        self.sync_lock = threading.Lock()
+        self.last_error = None
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # キャッシュなので古いスキーマのテーブルは作り直す（次の読み込みで全件同期される）
+                conn.executescript("DROP TABLE IF EXISTS facilities; DROP TABLE IF EXISTS facility_history; "
+                                   "DROP TABLE IF EXISTS sync_state;")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def _connect(self):
+        # Streamlitはセッションごとにスレッドが異なるため、操作ごとに接続を開いて閉じる
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_client(self):
+        if self.client is None:
+            from src.auth.auth import get_supabase_client
+            self.client = get_supabase_client()
+        return self.client
+
+    # ========= 同期 ==========
+
+    def sync(self, tables=None):
+        """
+        Supabaseから前回の同期以降に作成・更新された行を取得してローカルに反映する
+        戻り値は {テーブル名: 取得した行数}。失敗したテーブルはNone（ローカルのデータはそのまま）
+        """
+        with self.sync_lock:
+            return self._sync_tables(tables or list(SYNC_TABLES))
+
+    def _sync_tables(self, tables):
+        counts = {}
+        for table_name in tables:
+            try:
+                counts[table_name] = self._sync_table(table_name)
+                self.last_error = None
+            except Exception as e:
+                counts[table_name] = None
+                self.last_error = e
+                self._record_sync_failure(table_name)
+                print(f"{table_name}の同期に失敗しました（ローカルのデータを使います）: {str(e)}")
+        return counts
+
+    def _record_sync_failure(self, table_name):
+        """失敗した時刻からSYNC_RETRY_BACKOFF秒は同期し直さないよう記録する（watermarkはそのまま）"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sync_state (table_name, retry_at) VALUES (?, ?) "
+                "ON CONFLICT (table_name) DO UPDATE SET retry_at = excluded.retry_at",
+                (table_name, time.time() + SYNC_RETRY_BACKOFF),
+            )
+
+    def sync_if_stale(self):
+        """
+        最後の同期からsync_interval秒以上経っていれば同期する
+        一度でも同期を試みたテーブルはバックグラウンドで同期し、呼び出し元は待たずに手元のデータを読む
+        （Supabaseが遅くても画面の表示は遅くならない）。一度も同期を試みていないテーブルだけはその場で同期する。
+        同期に失敗したテーブルはSYNC_RETRY_BACKOFF秒の間は同期し直さず、手元のデータ（空でも）で応答する
+        """
+        if self.sync_interval is None:
+            return
+        with self._connect() as conn:
+            rows = conn.execute("SELECT table_name, synced_at, retry_at FROM sync_state").fetchall()
+        now = time.time()
+        synced = {row["table_name"]: row["synced_at"] or 0 for row in rows}
+        retry_at = {row["table_name"]: row["retry_at"] or 0 for row in rows}
+        stale = [table for table in SYNC_TABLES
+                 if now - synced.get(table, 0) >= self.sync_interval and now >= retry_at.get(table, 0)]
+        if not stale:
+            return
+
+        # 同期中なら重ねて同期しない
+        if not self.sync_lock.acquire(blocking=False):
+            return
+        if all(table in synced for table in stale):
+            threading.Thread(target=self._sync_in_background, args=(stale,), daemon=True).start()
+            return
+        try:
+            self._sync_tables(stale)
+        finally:
+            self.sync_lock.release()
+
+    def _sync_in_background(self, tables):
+        try:
+            self._sync_tables(tables)
+        finally:
+            self.sync_lock.release()
+
+    def _sync_table(self, table_name):
+        local_table, key_columns = SYNC_TABLES[table_name]
+        watermark = self.watermark(table_name)
+        client = self._get_client()
+
+        total = 0
+        start = 0
+        latest = watermark
+        while True:
+            query = client.table(table_name).select("*")
+            # 同じupdated_atの行が途中で切れないよう境界を含めて取得する（upsertなので重複しても問題ない）
+            if watermark:
+                query = query.gte(WATERMARK_COLUMN, watermark)
+            rows = query.order(WATERMARK_COLUMN).range(start, start + SYNC_PAGE_SIZE - 1).execute().data or []
+            if rows:
+                self._upsert_rows(local_table, key_columns, rows)
+                total += len(rows)
+                latest = max([latest or ""] + [row.get(WATERMARK_COLUMN) or "" for row in rows]) or None
+            if len(rows) < SYNC_PAGE_SIZE:
+                break
+            start += SYNC_PAGE_SIZE
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (table_name, watermark, synced_at, retry_at) VALUES (?, ?, ?, NULL)",
+                (table_name, latest, time.time()),
+            )
+        if self.verbose:
+            print(f"{table_name}: {total}行を同期しました（watermark: {latest}）")
+        return total
+
+    def _upsert_rows(self, local_table, key_columns, rows):
+        records = []
+        for row in rows:
+            key = [str(row.get(column) or "") for column in key_columns]
+            data = json.dumps(row, ensure_ascii=False, default=str)
+            if local_table == "facilities":
+                records.append(key + [_ward_of(row.get("address")), _to_float(row.get("latitude")),
+                                      _to_float(row.get("longitude")), row.get(WATERMARK_COLUMN), data])
+            else:
+                records.append(key + [row.get(WATERMARK_COLUMN), data])
+        placeholders = ",".join("?" * len(records[0]))
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {local_table} VALUES ({placeholders})", records)
+
+    def watermark(self, table_name):
+        """テーブルの同期済みのupdated_atの最大値（未同期ならNone）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT watermark FROM sync_state WHERE table_name = ?", (table_name,)).fetchone()
+        return row["watermark"] if row else None
+
+    def last_synced_at(self):
+        """最後に同期に成功した日時（未同期ならNone）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MIN(synced_at) FROM sync_state").fetchone()
+        return datetime.datetime.fromtimestamp(row[0]) if row and row[0] else None
+
+    # ========= 読み込み ==========
+
+    def facilities_by_ward(self, ward: str) -> pd.DataFrame:
+        """区（市区町村）の物件を返す（区画の行を含む。建物単位の行はunitが空文字）"""
+        self.sync_if_stale()
+        return self._query_facilities("ward = ?", (ward,))
+
+    def facilities_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> pd.DataFrame:
+        """緯度経度の範囲（両端を含む）にある物件を返す"""
+        self.sync_if_stale()
+        return self._query_facilities(
+            "latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?", (min_lat, max_lat, min_lon, max_lon)
+        )
+
+    def facility_history(self, building_id: str, unit: str = "") -> pd.DataFrame:
+        """物件（区画）の履歴を日付順に返す"""
+        self.sync_if_stale()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM facility_history WHERE building_id = ? AND unit = ? ORDER BY date",
+                (str(building_id), unit or ""),
+            ).fetchall()
+        return _to_frame(rows)
+
+    def wards(self) -> list[str]:
+        """キャッシュにある区（市区町村）の一覧"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT ward FROM facilities WHERE ward IS NOT NULL ORDER BY ward").fetchall()
+        return [row["ward"] for row in rows]
+
+    def _query_facilities(self, where, params):
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT data FROM facilities WHERE {where} ORDER BY building_id, unit", params).fetchall()
+        return _to_frame(rows)
+
+
+def _to_frame(rows):
+    return pd.DataFrame([json.loads(row["data"]) for row in rows])
+
+
+def _ward_of(address):
+    """住所から区（市区町村）名を取り出す"""
+    for level, key in address_keys(address or ""):
+        if level == "city":
+            return key
+    return None
+
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
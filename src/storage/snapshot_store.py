@@ -0,0 +1,174 @@
+import datetime
+import os
+import uuid
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# 物件データの列と型（パーティション列 scrape_date / ward はファイルのパスに持つ）
+FACILITY_SCHEMA = pa.schema([
+    ("building_id", pa.string()),
+    ("name", pa.string()),
+    ("address", pa.string()),
+    ("location_type", pa.dictionary(pa.int8(), pa.string())),
+    ("access", pa.string()),
+    ("min_size", pa.float64()),
+    ("max_size", pa.float64()),
+    ("min_price", pa.int64()),
+    ("max_price", pa.int64()),
+    ("has_alltime", pa.bool_()),
+    ("has_parking", pa.bool_()),
+    ("has_elevator", pa.bool_()),
+    ("has_airconditioner", pa.bool_()),
+    ("has_ventilator", pa.bool_()),
+    ("has_security", pa.bool_()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("status", pa.dictionary(pa.int8(), pa.string())),
+])
+
+PARTITION_SCHEMA = pa.schema([
+    ("scrape_date", pa.string()),
+    ("ward", pa.string()),
+])
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class SnapshotStore:
+    """
+    スクレイピング結果をスクレイピング日・区でパーティション分割したParquetに保存するストア
+
+    root/scrape_date=YYYY-MM-DD/ward=<区名>/part-<uuid>.parquet
+
+    append() は新しいファイルを追加するだけなので既存データを読み直さない。
+    read() は列の射影と日付・区の条件をpyarrowに渡すため、
+    必要なパーティション・列だけを読み込む（CSVを全件読み直して型変換する必要がない）。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def append(self, properties, ward, scrape_date=None):
+        """区の物件データを1ファイルとして追加する。書き込んだパスを返す（0件ならNone）"""
+        properties = list(properties)
+        if not properties:
+            return None
+        scrape_date = _date_str(scrape_date or datetime.date.today())
+
+        table = pa.Table.from_pylist(
+            [{field.name: prop.get(field.name) for field in FACILITY_SCHEMA} for prop in properties],
+            schema=FACILITY_SCHEMA,
+        )
+        directory = os.path.join(self.root, f"scrape_date={scrape_date}", f"ward={ward}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+        pq.write_table(table, path, compression="zstd")
+        return path
+
+    def appender(self, ward, scrape_date=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """1件ずつ受け取りchunk_size件ごとにファイルを追加するライターを返す"""
+        return SnapshotAppender(self, ward, scrape_date, chunk_size)
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet",
+                          partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"))
+
+    def read(self, columns=None, start_date=None, end_date=None, wards=None, filter=None):
+        """
+        条件に合う物件データをDataFrameで返す
+        columns: 読み込む列（Noneなら全列）
+        start_date / end_date: スクレイピング日の範囲（両端を含む）
+        wards: 区名のリスト
+        filter: 追加の条件（pyarrow.dataset の式。例: ds.field("min_price") < 5000）
+        """
+        df = self.read_table(columns, start_date, end_date, wards, filter).to_pandas()
+        # パーティション列はカテゴリ型で返す（区・日付ごとの集計でメモリを節約する）
+        for column in ("ward", "scrape_date"):
+            if column in df.columns:
+                df[column] = df[column].astype("category")
+        return df
+
+    def read_columns(self, columns=None, start_date=None, end_date=None, wards=None, filter=None):
+        """
+        条件に合う物件データをFacilityColumns（列ごとのNumPy配列）で返す
+        何か月分ものスナップショットをまとめてメモリに載せる分析向け
+        """
+        from src.storage.facility_columns import FacilityColumns
+
+        return FacilityColumns.from_pandas(self.read(columns, start_date, end_date, wards, filter))
+
+    def read_table(self, columns=None, start_date=None, end_date=None, wards=None, filter=None):
+        if not self.dates():
+            table = pa.Table.from_pylist([], schema=_full_schema())
+            return table.select(columns) if columns else table
+
+        expression = None
+        for condition in (
+            ds.field("scrape_date") >= _date_str(start_date) if start_date else None,
+            ds.field("scrape_date") <= _date_str(end_date) if end_date else None,
+            ds.field("ward").isin(list(wards)) if wards else None,
+            filter,
+        ):
+            if condition is not None:
+                expression = condition if expression is None else expression & condition
+
+        return self.dataset().to_table(columns=columns, filter=expression)
+
+    def dates(self):
+        """保存済みのスクレイピング日の一覧（昇順）"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name.split("=", 1)[1] for name in os.listdir(self.root)
+            if name.startswith("scrape_date=")
+        )
+
+
+class SnapshotAppender:
+    """SnapshotStore.appender() が返すライター（add / add_many / flush を持つ）"""
+
+    def __init__(self, store, ward, scrape_date, chunk_size):
+        self.store = store
+        self.ward = ward
+        self.scrape_date = scrape_date
+        self.chunk_size = max(1, chunk_size)
+        self.buffer = []
+        self.written_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def add(self, prop):
+        self.buffer.append(prop)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def add_many(self, props):
+        for prop in props:
+            self.add(prop)
+
+    def flush(self):
+        if self.buffer:
+            self.store.append(self.buffer, self.ward, self.scrape_date)
+            self.written_count += len(self.buffer)
+            self.buffer = []
+
+
+def _date_str(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+def _full_schema():
+    schema = FACILITY_SCHEMA
+    for field in PARTITION_SCHEMA:
+        schema = schema.append(field)
+    return schema
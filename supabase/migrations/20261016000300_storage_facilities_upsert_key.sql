@@ -0,0 +1,17 @@
+-- 物件テーブルを (building_id, unit) でupsertできるようにする
+-- SupabaseBatchWriter は on_conflict=building_id,unit でupsertするため、同じ列のユニーク制約が必要
+-- created_at: 初めて掲載を確認した日時（挿入時だけDBのデフォルトで設定する）
+-- updated_at: 最後に確認した日時（upsertのたびにライターが設定する。ローカルキャッシュの差分同期の目印）
+
+alter table storage_facilities
+    add column if not exists building_id text,
+    add column if not exists unit text not null default '',
+    add column if not exists updated_at timestamptz not null default now();
+
+alter table storage_facilities
+    alter column created_at set default now();
+
+alter table storage_facilities
+    add constraint storage_facilities_building_id_unit_key unique (building_id, unit);
+
+create index if not exists storage_facilities_updated_at_idx on storage_facilities (updated_at);
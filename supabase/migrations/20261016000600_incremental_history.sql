@@ -0,0 +1,24 @@
+-- 変化した物件だけを書き込む --incremental 用の列と履歴テーブル
+-- record_hash: 変更検知の対象項目のハッシュ値（NULLの既存行は次回の実行で「変更」として扱う）
+
+alter table storage_facilities
+    add column if not exists record_hash text;
+
+create table if not exists storage_facility_history (
+    building_id text not null,
+    unit text not null default '',
+    date date not null,
+    change_type text not null,
+    status text,
+    price integer,
+    min_price integer,
+    max_price integer,
+    min_size double precision,
+    max_size double precision,
+    record_hash text,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now(),
+    constraint storage_facility_history_building_id_unit_date_key unique (building_id, unit, date)
+);
+
+create index if not exists storage_facility_history_updated_at_idx on storage_facility_history (updated_at);
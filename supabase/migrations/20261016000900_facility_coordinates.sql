@@ -0,0 +1,7 @@
+-- ジオコーディング（--geocode-table）で付与する緯度経度の列
+
+alter table storage_facilities
+    add column if not exists latitude double precision,
+    add column if not exists longitude double precision;
+
+create index if not exists storage_facilities_location_idx on storage_facilities (latitude, longitude);
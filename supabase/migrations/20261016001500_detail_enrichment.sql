@@ -0,0 +1,7 @@
+-- 一覧ページの詳細ページURLと、詳細ページから取得する空室状況（--details）の列
+-- detail_url: 物件名のリンク先（一覧ページの行はすべてこの列を持つため --details なしでも必要）
+-- status: 空室状況（空室 / 満室）。建物単位の行は区画のどれかが空室なら空室、区画の行（unit）は区画ごとの値
+
+alter table storage_facilities
+    add column if not exists detail_url text,
+    add column if not exists status text;